@@ -3,24 +3,41 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import time
 import uvicorn
-import joblib
 import numpy as np
 import json
-import requests
-from datetime import datetime
 import os
+import sys
+import threading
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from soil_cache import SpatialSoilCache
+from crop_tiles import load_tiles_from_env
+from weather_client import WeatherClient, CircuitBreaker
+from crop_model import FusedCropModel, multioutput_probability_matrix
+from crop_workers import load_model_file, run_on_each_worker, start_worker_pool, split_batch
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend", "modules"))
+from model_registry import ModelRegistry, ModelNotReadyError, MODEL_DIR
+from instrumentation import configure_logging, instrument_app, stage, TimedJSONResponse
+from result_cache import model_file_version
 
 # Load environment variables
 load_dotenv()
 
+log = configure_logging("crop")
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Crop Recommendation API",
     description="API for recommending crops based on location coordinates",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=TimedJSONResponse
 )
 
 # Enable CORS
@@ -48,6 +65,37 @@ class RecommendationResponse(BaseModel):
     crop_recommendations: List[CropRecommendation]
     process_log: List[str]
 
+class BatchLocationRequest(BaseModel):
+    locations: List[LocationRequest]
+    top_n: int = 5
+
+class BatchRecommendationItem(BaseModel):
+    location: Dict[str, Any]
+    soil_characteristics: Dict[str, Any]
+    crop_recommendations: List[CropRecommendation]
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[BatchRecommendationItem]
+    process_log: List[str]
+
+# Maximum number of locations accepted by /recommend/batch
+max_batch_size = int(os.getenv('MAX_BATCH_SIZE', '10000'))
+
+# Bounded executor for CPU-bound model inference, so it never blocks the event loop.
+# In "process" serving mode it is replaced at startup by forked worker processes
+# that share the loaded models copy-on-write.
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('INFERENCE_WORKERS', '4')),
+    thread_name_prefix='inference'
+)
+crop_serving_mode = os.getenv('CROP_SERVING_MODE', 'thread')
+crop_process_workers = int(os.getenv('CROP_PROCESS_WORKERS', str(os.cpu_count() or 1)))
+
+# Per-stage deadlines for /recommend, in seconds
+soil_stage_timeout = float(os.getenv('SOIL_STAGE_TIMEOUT', '5'))
+crop_stage_timeout = float(os.getenv('CROP_STAGE_TIMEOUT', '5'))
+weather_stage_timeout = float(os.getenv('WEATHER_STAGE_TIMEOUT', '2'))
+
 # Global variables for loaded models
 soil_models = None
 soil_encoders = None
@@ -55,36 +103,180 @@ soil_scaler = None
 cat_model = None
 scaler_cat = None
 mlb = None
+fused_crop_model = None
 weather_api_key = os.getenv('WEATHER_API_KEY')
 
-# Load all models at startup
+# Shared weather client, created at startup when an API key is configured
+weather_client = None
+
+# Soil prediction cache (SOIL_CACHE_SIZE=0 disables it)
+soil_cache = None
+soil_cache_resolution = float(os.getenv('SOIL_CACHE_RESOLUTION', '0.01'))
+soil_cache_size = int(os.getenv('SOIL_CACHE_SIZE', '100000'))
+soil_cache_snapshot = os.getenv('SOIL_CACHE_SNAPSHOT')
+
+# Precomputed soil/crop tiles (CROP_TILES=<prefix>), None when not configured
+crop_tiles = None
+
+# Model artifacts, from MODEL_DIR/Region_wise_crop unless CROP_MODELS_DIR is set
+models_dir = os.getenv('CROP_MODELS_DIR', os.path.join(MODEL_DIR, 'Region_wise_crop'))
+CROP_MODEL_FILES = {
+    'soil_models': 'soil_prediction_models.pkl',
+    'soil_encoders': 'soil_level_encoders.pkl',
+    'soil_scaler': 'soil_feature_scaler.pkl',
+    'cat_model': 'crop_recommender_model.pkl',
+    'scaler_cat': 'crop_feature_scaler.pkl',
+    'mlb': 'crop_multilabel_binarizer.pkl'
+}
+
+def setup_crop_service():
+    """Set up everything that depends on the loaded model files"""
+    global soil_models, soil_encoders, soil_scaler, cat_model, scaler_cat, mlb, soil_cache, crop_tiles
+    global fused_crop_model
+
+    # Model files are read in parallel by the registry
+    soil_models = models.get('soil_models')
+    soil_encoders = models.get('soil_encoders')
+    soil_scaler = models.get('soil_scaler')
+    cat_model = models.get('cat_model')
+    scaler_cat = models.get('scaler_cat')
+    mlb = models.get('mlb')
+
+    log.info("All models loaded")
+
+    # Restructure the crop recommender once so each request is a single matrix call
+    fused_crop_model = build_fused_crop_model(cat_model)
+
+    # Set up the soil prediction cache, warm from the last snapshot if any. Cached
+    # answers depend on the soil models, their feature scaler and the label encoders
+    if soil_cache_size > 0:
+        soil_cache = SpatialSoilCache(
+            resolution=soil_cache_resolution,
+            max_size=soil_cache_size,
+            snapshot_path=soil_cache_snapshot,
+            signature="|".join(
+                model_file_version(os.path.join(models_dir, CROP_MODEL_FILES[name]))
+                for name in ('soil_models', 'soil_scaler', 'soil_encoders')
+            )
+        )
+        loaded = soil_cache.load_snapshot()
+        log.info("Soil cache ready", extra={"cells_from_snapshot": loaded})
+
+    # Memory-map precomputed tiles, if configured
+    crop_tiles = load_tiles_from_env()
+    if crop_tiles is not None:
+        log.info("Crop tiles loaded", extra=crop_tiles.info())
+    return True
+
+models = ModelRegistry()
+for name, filename in CROP_MODEL_FILES.items():
+    models.register(name, functools.partial(
+        load_model_file, os.path.join(models_dir, filename), mmap=crop_serving_mode == 'process'))
+models.register('crop_service', setup_crop_service)
+
+# Request and stage metrics on /metrics. In process serving mode the model stages
+# run in the worker processes and are not counted here; request latency still is.
+instrument_app(app, "crop", registry=models)
+
+# Load all models at startup, in the background
 @app.on_event("startup")
 async def load_models():
-    global soil_models, soil_encoders, soil_scaler, cat_model, scaler_cat, mlb
-    
+    global inference_executor
+
+    models.start()
+
+    # Fork inference workers once everything is loaded, so they inherit it
+    if crop_serving_mode == 'process':
+        try:
+            await models.wait(timeout=None)
+        except ModelNotReadyError as e:
+            log.error("Error loading models", extra={"error": str(e)})
+            raise e
+        # Fork copies only this thread: let the loader threads exit and stop the
+        # (idle) thread executor first, so no other thread is mid-way through a lock
+        for thread in threading.enumerate():
+            if thread.name.startswith('load-'):
+                thread.join()
+        inference_executor.shutdown(wait=True)
+        inference_executor = start_worker_pool(crop_process_workers)
+        log.info("Started inference worker processes", extra={"workers": crop_process_workers})
+
+async def wait_for_models():
+    """Wait for a service that is still loading; 503 if it takes too long or failed"""
     try:
-        # Set the models directory path
-        models_dir = r"backend\models\Region_wise_crop"
-        
-        # Load soil prediction models
-        soil_models = joblib.load(os.path.join(models_dir, 'soil_prediction_models.pkl'))
-        soil_encoders = joblib.load(os.path.join(models_dir, 'soil_level_encoders.pkl'))
-        soil_scaler = joblib.load(os.path.join(models_dir, 'soil_feature_scaler.pkl'))
-        
-        # Load crop recommendation models
-        cat_model = joblib.load(os.path.join(models_dir, 'crop_recommender_model.pkl'))
-        scaler_cat = joblib.load(os.path.join(models_dir, 'crop_feature_scaler.pkl'))
-        mlb = joblib.load(os.path.join(models_dir, 'crop_multilabel_binarizer.pkl'))
-        
-        print("All models loaded successfully")
+        await models.wait('crop_service')
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# Build and check the fused crop probability model
+def build_fused_crop_model(model, n_probe=64, seed=0):
+    """
+    Build a FusedCropModel and check it against the MultiOutputClassifier on
+    probe feature rows. Returns None (use the classifier directly) if the
+    rankings differ or the model cannot be restructured.
+    """
+    try:
+        fused = FusedCropModel(model)
     except Exception as e:
-        print(f"Error loading models: {str(e)}")
-        raise e
+        log.warning("Fused crop model unavailable", extra={"error": str(e)})
+        return None
+
+    # Probe rows: scaled locations plus every combination of soil distributions
+    rng = np.random.default_rng(seed)
+    npk = list(NPK_LEVEL_DISTRIBUTIONS.values()) + [UNKNOWN_LEVEL_DISTRIBUTION]
+    ph = list(PH_LEVEL_DISTRIBUTIONS.values()) + [UNKNOWN_LEVEL_DISTRIBUTION]
+    X_probe = np.hstack([
+        rng.normal(size=(n_probe, 2)),
+        np.array(npk)[rng.integers(len(npk), size=n_probe)],
+        np.array(npk)[rng.integers(len(npk), size=n_probe)],
+        np.array(npk)[rng.integers(len(npk), size=n_probe)],
+        np.array(ph)[rng.integers(len(ph), size=n_probe)]
+    ])
+
+    if not fused.matches(model, X_probe):
+        log.warning("Fused crop model does not match the classifier on probe rows; not using it")
+        return None
+
+    log.info("Fused crop model ready", extra={
+        "mode": fused.mode, "usable_outputs": int(fused.valid_outputs.size), "outputs": fused.n_outputs
+    })
+    return fused
+
+# Persist the soil cache on shutdown. In process serving mode the cache that fills up
+# lives in the workers (each has its own), so their cells are merged into this
+# process's copy first and saved as one snapshot. Runs before the pool is shut down
+# (shutdown handlers run in registration order).
+def export_soil_cache():
+    return soil_cache.export()
+
+@app.on_event("shutdown")
+async def save_soil_cache():
+    if soil_cache is None or not soil_cache.snapshot_path:
+        return
+    try:
+        if crop_serving_mode == 'process' and models.status()["ready"]:
+            for entries in await asyncio.to_thread(run_on_each_worker, inference_executor, export_soil_cache):
+                soil_cache.merge(entries)
+        soil_cache.save_snapshot()
+        log.info("Soil cache snapshot saved", extra={"entries": soil_cache.stats()["size"]})
+    except Exception as e:
+        log.error("Error saving soil cache snapshot", extra={"error": str(e)})
 
 # Predict soil characteristics based on location
+@stage("soil")
 def predict_soil_characteristics(latitude, longitude):
     """
-    Predict soil characteristics (N, P, K, pH levels) based on location
+    Predict soil characteristics (N, P, K, pH levels) based on location.
+    With the soil cache enabled the prediction is made for the centre of the
+    grid cell containing the location.
+    """
+    if soil_cache is not None:
+        return soil_cache.get_or_predict(latitude, longitude, predict_soil_characteristics_uncached)
+    return predict_soil_characteristics_uncached(latitude, longitude)
+
+def predict_soil_characteristics_uncached(latitude, longitude):
+    """
+    Run the soil models for one location, bypassing the cache
     """
     # Prepare input data
     input_location = np.array([[latitude, longitude]])
@@ -104,40 +296,106 @@ def predict_soil_characteristics(latitude, longitude):
         
         # Store in predictions dictionary
         predictions[level] = level_name
-    
+
+    return predictions
+
+# Predict soil characteristics for many locations at once
+@stage("soil")
+def predict_soil_characteristics_batch(latitudes, longitudes):
+    """
+    Predict soil characteristics (N, P, K, pH levels) for N locations.
+    Every scaler, soil model and encoder runs once over the whole (N, 2) matrix.
+    Returns a dict mapping each soil level to an array of N level names.
+    """
+    if soil_cache is not None:
+        return soil_cache.get_or_predict_batch(latitudes, longitudes, predict_soil_characteristics_batch_uncached)
+    return predict_soil_characteristics_batch_uncached(latitudes, longitudes)
+
+def predict_soil_characteristics_batch_uncached(latitudes, longitudes):
+    """
+    Run the soil models for N locations, bypassing the cache
+    """
+    soil_codes = predict_soil_codes_batch(latitudes, longitudes)
+    return {
+        level: soil_encoders[level].inverse_transform(codes)
+        for level, codes in soil_codes.items()
+    }
+
+def predict_soil_codes_batch(latitudes, longitudes):
+    """
+    Run the soil models for N locations and return the encoded levels
+    (indices into soil_encoders[level].classes_) for each soil level
+    """
+    # Prepare input data as one (N, 2) matrix
+    input_locations = np.column_stack([
+        np.asarray(latitudes, dtype=float),
+        np.asarray(longitudes, dtype=float)
+    ])
+
+    # Scale all inputs in one call
+    input_scaled = soil_scaler.transform(input_locations)
+
+    predictions = {}
+
+    for level in soil_encoders.keys():
+        # Predict encoded levels for every row
+        predictions[level] = np.asarray(soil_models[level].predict(input_scaled))
+
     return predictions
 
+# Create the pooled weather client
+@app.on_event("startup")
+async def start_weather_client():
+    global weather_client
+
+    if not weather_api_key:
+        return
+
+    weather_client = WeatherClient(
+        api_key=weather_api_key,
+        base_url=os.getenv('WEATHER_API_URL', 'https://api.weatherapi.com'),
+        timeout=float(os.getenv('WEATHER_TIMEOUT', '10')),
+        resolution=float(os.getenv('WEATHER_CACHE_RESOLUTION', '0.05')),
+        cache_ttl=float(os.getenv('WEATHER_CACHE_TTL', '600')),
+        max_connections=int(os.getenv('WEATHER_MAX_CONNECTIONS', '20')),
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv('WEATHER_BREAKER_FAILURES', '5')),
+            reset_timeout=float(os.getenv('WEATHER_BREAKER_RESET', '30'))
+        )
+    )
+    await weather_client.start()
+
+@app.on_event("shutdown")
+async def close_weather_client():
+    if weather_client is not None:
+        await weather_client.close()
+
+@app.on_event("shutdown")
+async def shutdown_inference_executor():
+    inference_executor.shutdown(wait=False)
+
 # Get weather data
+@stage("weather")
 async def get_weather_data(latitude, longitude):
     """
     Fetch weather data from a weather API for a specific location
     """
-    if not weather_api_key:
-        return None
-        
-    url = f"https://api.weatherapi.com/v1/current.json?key={weather_api_key}&q={latitude},{longitude}"
-    try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Extract relevant weather information
-            weather_data = {
-                "lat": latitude,
-                "lon": longitude,
-                "temperature": data["current"]["temp_c"],
-                "humidity": data["current"]["humidity"],
-                "description": data["current"]["condition"]["text"],
-                "wind_speed": data["current"]["wind_kph"] / 3.6,  # Convert to m/s
-                "rainfall": data["current"]["precip_mm"],
-                "timestamp": datetime.now().isoformat()
-            }
-            return weather_data
-        else:
-            return None
-    except Exception as e:
-        print(f"Error fetching weather data: {e}")
+    if weather_client is None:
         return None
+    return await weather_client.get(latitude, longitude)
+
+# Numeric distributions used for each soil level
+NPK_LEVEL_DISTRIBUTIONS = {
+    'High': (0.7, 0.2, 0.1),    # (high, medium, low)
+    'Medium': (0.3, 0.6, 0.1),  # (high, medium, low)
+    'Low': (0.1, 0.2, 0.7),     # (high, medium, low)
+}
+PH_LEVEL_DISTRIBUTIONS = {
+    'Acidic': (0.7, 0.2, 0.1),    # (acidic, neutral, alkaline)
+    'Neutral': (0.1, 0.8, 0.1),   # (acidic, neutral, alkaline)
+    'Alkaline': (0.1, 0.2, 0.7),  # (acidic, neutral, alkaline)
+}
+UNKNOWN_LEVEL_DISTRIBUTION = (0.33, 0.33, 0.34)  # balanced if unknown
 
 # Convert soil level to distribution
 def convert_level_to_distribution(level, is_ph=False):
@@ -145,25 +403,58 @@ def convert_level_to_distribution(level, is_ph=False):
     Convert categorical soil level to numeric distribution
     """
     if not is_ph:
-        # For NPK levels
-        if level == 'High':
-            return (0.7, 0.2, 0.1)  # (high, medium, low)
-        elif level == 'Medium':
-            return (0.3, 0.6, 0.1)  # (high, medium, low)
-        elif level == 'Low':
-            return (0.1, 0.2, 0.7)  # (high, medium, low)
-        else:
-            return (0.33, 0.33, 0.34)  # balanced if unknown
+        # For NPK levels (high, medium, low)
+        return NPK_LEVEL_DISTRIBUTIONS.get(level, UNKNOWN_LEVEL_DISTRIBUTION)
     else:
         # For pH levels (acidic, neutral, alkaline)
-        if level == 'Acidic':
-            return (0.7, 0.2, 0.1)  # (acidic, neutral, alkaline)
-        elif level == 'Neutral':
-            return (0.1, 0.8, 0.1)  # (acidic, neutral, alkaline)
-        elif level == 'Alkaline':
-            return (0.1, 0.2, 0.7)  # (acidic, neutral, alkaline)
-        else:
-            return (0.33, 0.33, 0.34)  # balanced if unknown
+        return PH_LEVEL_DISTRIBUTIONS.get(level, UNKNOWN_LEVEL_DISTRIBUTION)
+
+# Convert an array of soil levels to an (N, 3) distribution matrix
+def convert_levels_to_distributions(levels, is_ph=False):
+    """
+    Vectorized convert_level_to_distribution: maps N level names to an (N, 3) array
+    """
+    levels = np.asarray(levels)
+    if levels.size == 0:
+        return np.empty((0, 3))
+
+    # Map each distinct level once, then broadcast back to every row
+    unique_levels, inverse = np.unique(levels, return_inverse=True)
+    table = np.array([convert_level_to_distribution(level, is_ph=is_ph) for level in unique_levels])
+    return table[inverse.reshape(-1)]
+
+# Select the top N columns of every row of a probability matrix
+def select_top_n(prob_matrix, top_n):
+    """
+    Return (indices, probabilities) of the top_n largest entries of each row,
+    ordered by probability descending and column index ascending on ties
+    (the same order a stable descending sort gives). Entries equal to -inf
+    are never selected.
+    """
+    n_rows, n_cols = prob_matrix.shape
+    n_valid = int(np.isfinite(prob_matrix).all(axis=0).sum()) if n_rows else 0
+    k = min(top_n, n_valid)
+    if k <= 0:
+        empty = np.empty((n_rows, 0))
+        return empty.astype(int), empty
+
+    # Partial selection of the k largest entries per row
+    top_idx = np.argpartition(-prob_matrix, k - 1, axis=1)[:, :k]
+    top_prob = np.take_along_axis(prob_matrix, top_idx, axis=1)
+
+    # Rows where ties straddle the cut could have picked a different tied
+    # column than a stable sort would; resolve those rows exactly
+    kth = top_prob.min(axis=1, keepdims=True)
+    tied = (prob_matrix >= kth).sum(axis=1) > k
+    if tied.any():
+        top_idx[tied] = np.argsort(-prob_matrix[tied], axis=1, kind='stable')[:, :k]
+        top_prob = np.take_along_axis(prob_matrix, top_idx, axis=1)
+
+    # Order the k selected entries: probability descending, then column index
+    order = np.lexsort((top_idx, -top_prob), axis=-1)
+    top_idx = np.take_along_axis(top_idx, order, axis=1)
+    top_prob = np.take_along_axis(top_prob, order, axis=1)
+    return top_idx, top_prob
 
 # Recommend crops based on soil characteristics and location
 def recommend_crops(latitude, longitude, 
@@ -172,71 +463,156 @@ def recommend_crops(latitude, longitude,
     """
     Recommend crops based on location and soil characteristics
     """
-    # Prepare input features
-    # Convert location to scaled format
-    loc_input = np.array([[latitude, longitude]])
-    scaled_loc = scaler_cat.transform(loc_input)
-    
-    # Create feature vector with soil characteristics distributions
-    features = []
-    
-    # Add scaled location
-    features.extend(scaled_loc[0])
-    
-    # Add one-hot encoded distributions for N levels (High, Medium, Low)
-    features.extend([
-        nitrogen_levels[0],     # N_High
-        nitrogen_levels[1],     # N_Medium  
-        nitrogen_levels[2]      # N_Low
-    ])
-    
-    # Add one-hot encoded distributions for P levels
-    features.extend([
-        phosphorous_levels[0],  # P_High
-        phosphorous_levels[1],  # P_Medium
-        phosphorous_levels[2]   # P_Low
-    ])
-    
-    # Add one-hot encoded distributions for K levels
-    features.extend([
-        potassium_levels[0],    # K_High
-        potassium_levels[1],    # K_Medium
-        potassium_levels[2]     # K_Low
-    ])
-    
-    # Add one-hot encoded distributions for pH levels
-    features.extend([
-        ph_levels[0],           # pH_Acidic
-        ph_levels[1],           # pH_Neutral
-        ph_levels[2]            # pH_Alkaline
-    ])
-    
-    # Convert to numpy array and reshape for prediction
-    X_pred = np.array(features).reshape(1, -1)
-    
-    # Predict probability for each crop using the categorical model
-    crop_probabilities = cat_model.predict_proba(X_pred)
-    
+    # Single location is a batch of one
+    return recommend_crops_batch(
+        [latitude], [longitude],
+        nitrogen_levels=np.array([nitrogen_levels]),
+        phosphorous_levels=np.array([phosphorous_levels]),
+        potassium_levels=np.array([potassium_levels]),
+        ph_levels=np.array([ph_levels]),
+        top_n=top_n
+    )[0]
+
+# Build the (N, n_crops) crop probability matrix
+def predict_crop_probabilities(X_pred):
+    """
+    Return an (N, n_crops) matrix of class-1 (presence of crop) probabilities
+    for X_pred. Crops whose classifier only saw a single class get -inf so
+    they are never recommended.
+    """
+    if fused_crop_model is not None:
+        return fused_crop_model.predict_proba_matrix(X_pred)
+    return multioutput_probability_matrix(cat_model, X_pred)
+
+# Recommend crops for many locations at once
+def recommend_crops_batch(latitudes, longitudes,
+                          nitrogen_levels, phosphorous_levels, potassium_levels, ph_levels,
+                          top_n=5):
+    """
+    Recommend crops for N locations. Soil level arguments are (N, 3)
+    distribution matrices. Returns a list of N lists of (crop, probability).
+    """
+    top_idx, top_prob = recommend_crop_indices_batch(
+        latitudes, longitudes,
+        nitrogen_levels, phosphorous_levels, potassium_levels, ph_levels,
+        top_n=top_n
+    )
+
     # Get the classes (crops) from the MultiLabelBinarizer
     crop_names = mlb.classes_
-    
-    # Create list of (crop, probability) pairs
-    crop_prob_pairs = []
-    
-    # For each classifier in the MultiOutputClassifier
-    for i, proba_list in enumerate(crop_probabilities):
-        # If the crop has a probability > 0 for class 1 (presence of crop)
-        if len(proba_list[0]) > 1:  # Make sure we have probabilities for both classes
-            # Get probability for class 1 (presence of crop)
-            prob = proba_list[0][1]
-            crop_name = crop_names[i]
-            crop_prob_pairs.append((crop_name, prob))
-    
-    # Sort by probability in descending order
-    crop_prob_pairs.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top N recommendations
-    return crop_prob_pairs[:top_n]
+    return [
+        list(zip(crop_names[row_idx].tolist(), row_prob.tolist()))
+        for row_idx, row_prob in zip(top_idx, top_prob)
+    ]
+
+@stage("crop")
+def recommend_crop_indices_batch(latitudes, longitudes,
+                                 nitrogen_levels, phosphorous_levels, potassium_levels, ph_levels,
+                                 top_n=5):
+    """
+    Same as recommend_crops_batch but returns (N, k) arrays of crop indices
+    into mlb.classes_ and their probabilities
+    """
+    # Scale all locations in one call
+    loc_input = np.column_stack([
+        np.asarray(latitudes, dtype=float),
+        np.asarray(longitudes, dtype=float)
+    ])
+    scaled_loc = scaler_cat.transform(loc_input)
+
+    # Feature matrix: scaled location, then N, P, K and pH distributions
+    X_pred = np.hstack([
+        scaled_loc,
+        np.asarray(nitrogen_levels, dtype=float),     # N_High, N_Medium, N_Low
+        np.asarray(phosphorous_levels, dtype=float),  # P_High, P_Medium, P_Low
+        np.asarray(potassium_levels, dtype=float),    # K_High, K_Medium, K_Low
+        np.asarray(ph_levels, dtype=float)            # pH_Acidic, pH_Neutral, pH_Alkaline
+    ])
+
+    prob_matrix = predict_crop_probabilities(X_pred)
+    return select_top_n(prob_matrix, top_n)
+
+# Soil level distributions for the crop recommender
+def soil_level_distributions(soil_predictions, n):
+    """
+    Convert arrays of predicted soil levels into the (N, 3) distribution
+    matrices recommend_crops_batch expects, using the same defaults as
+    /recommend when a level is missing
+    """
+    def levels(name, default):
+        if name in soil_predictions:
+            return soil_predictions[name]
+        return np.full(n, default, dtype=object)
+
+    return {
+        "nitrogen_levels": convert_levels_to_distributions(levels('N_level', 'Medium')),
+        "phosphorous_levels": convert_levels_to_distributions(levels('P_level', 'Medium')),
+        "potassium_levels": convert_levels_to_distributions(levels('K_level', 'Low')),
+        "ph_levels": convert_levels_to_distributions(levels('pH_level', 'Neutral'), is_ph=True)
+    }
+
+# Full location -> soil -> crops pipeline for many locations
+def recommend_crops_for_locations(latitudes, longitudes, top_n=5):
+    """
+    Run soil prediction and crop recommendation for N locations.
+    Returns (soil_characteristics, recommendations), one entry per location.
+    """
+    n = len(latitudes)
+    soil_predictions = predict_soil_characteristics_batch(latitudes, longitudes)
+
+    recommendations = recommend_crops_batch(
+        latitudes, longitudes,
+        **soil_level_distributions(soil_predictions, n),
+        top_n=top_n
+    )
+
+    soil_columns = {level: values.tolist() for level, values in soil_predictions.items()}
+    soil_characteristics = [
+        {level: values[i] for level, values in soil_columns.items()}
+        for i in range(n)
+    ]
+    return soil_characteristics, recommendations
+
+# Run a CPU-bound function on the bounded inference executor
+async def run_inference(fn, *args, **kwargs):
+    """
+    Run model inference off the event loop thread
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(fn, *args, **kwargs))
+
+# Await one pipeline stage under its deadline and measure it
+async def run_stage(awaitable, timeout):
+    """
+    Returns (result, elapsed_ms). Raises asyncio.TimeoutError when the stage
+    misses its deadline; a timeout of None means no deadline.
+    """
+    start = time.perf_counter()
+    if timeout is not None:
+        timeout = max(timeout, 0)
+    result = await asyncio.wait_for(awaitable, timeout=timeout)
+    return result, (time.perf_counter() - start) * 1000
+
+# Crop recommendation steps 3-4 for one location
+def recommend_crops_from_soil(latitude, longitude, soil_predictions, top_n=5):
+    """
+    Convert soil levels to distributions and recommend crops
+    """
+    # Step 3: Convert soil levels to distributions for crop recommender
+    n_level_dist = convert_level_to_distribution(soil_predictions.get('N_level', 'Medium'))
+    p_level_dist = convert_level_to_distribution(soil_predictions.get('P_level', 'Medium'))
+    k_level_dist = convert_level_to_distribution(soil_predictions.get('K_level', 'Low'))
+    ph_level_dist = convert_level_to_distribution(soil_predictions.get('pH_level', 'Neutral'), is_ph=True)
+
+    # Step 4: Get crop recommendations
+    return recommend_crops(
+        latitude, longitude,
+        nitrogen_levels=n_level_dist,
+        phosphorous_levels=p_level_dist,
+        potassium_levels=k_level_dist,
+        ph_levels=ph_level_dist,
+        top_n=top_n
+    )
 
 @app.post("/recommend", response_model=RecommendationResponse)
 async def get_crop_recommendations(request: LocationRequest):
@@ -247,6 +623,10 @@ async def get_crop_recommendations(request: LocationRequest):
     - Soil characteristics based on the location
     - Weather data for the location
     - Crop recommendations based on the soil and location
+
+    The weather fetch runs concurrently with model inference, which runs on
+    the inference executor. Each stage has its own deadline; weather data that
+    arrives after its deadline is dropped.
     """
     results = {
         "location": {
@@ -258,68 +638,194 @@ async def get_crop_recommendations(request: LocationRequest):
         "crop_recommendations": [],
         "process_log": []
     }
-    
-    # Step 1: Predict soil characteristics from location
+    await wait_for_models()
+    pipeline_start = time.perf_counter()
+
+    # Step 2 starts first so the network wait overlaps inference
+    weather_task = asyncio.create_task(get_weather_data(request.lat, request.lon))
+
     try:
-        soil_predictions = predict_soil_characteristics(request.lat, request.lon)
-        results["soil_characteristics"] = soil_predictions
-        results["process_log"].append("Soil characteristics predicted from location model")
-    except Exception as e:
-        error_msg = f"Error predicting soil characteristics: {str(e)}"
-        results["process_log"].append(error_msg)
-        raise HTTPException(status_code=500, detail=error_msg)
-    
-    # Step 2: Get weather data
+        # Precomputed tiles answer steps 1, 3 and 4 with one lookup when they cover the location
+        tile_answer = crop_tiles.lookup(request.lat, request.lon) if crop_tiles is not None else None
+        if tile_answer is not None:
+            soil_predictions, recommendations = tile_answer
+            results["soil_characteristics"] = soil_predictions
+            results["process_log"].append("Soil characteristics and crop recommendations read from precomputed tiles")
+        else:
+            # Step 1: Predict soil characteristics from location
+            try:
+                soil_predictions, elapsed = await run_stage(
+                    run_inference(predict_soil_characteristics, request.lat, request.lon),
+                    soil_stage_timeout
+                )
+                results["soil_characteristics"] = soil_predictions
+                results["process_log"].append(f"Soil characteristics predicted from location model ({elapsed:.1f} ms)")
+            except asyncio.TimeoutError:
+                error_msg = f"Soil prediction exceeded its {soil_stage_timeout}s deadline"
+                results["process_log"].append(error_msg)
+                raise HTTPException(status_code=504, detail=error_msg)
+            except Exception as e:
+                error_msg = f"Error predicting soil characteristics: {str(e)}"
+                results["process_log"].append(error_msg)
+                raise HTTPException(status_code=500, detail=error_msg)
+
+            # Steps 3-4: Convert soil levels and get crop recommendations
+            try:
+                recommendations, elapsed = await run_stage(
+                    run_inference(recommend_crops_from_soil, request.lat, request.lon, soil_predictions),
+                    crop_stage_timeout
+                )
+                results["process_log"].append(f"Crop recommendations generated successfully ({elapsed:.1f} ms)")
+            except asyncio.TimeoutError:
+                error_msg = f"Crop recommendation exceeded its {crop_stage_timeout}s deadline"
+                results["process_log"].append(error_msg)
+                raise HTTPException(status_code=504, detail=error_msg)
+            except Exception as e:
+                error_msg = f"Error generating crop recommendations: {str(e)}"
+                results["process_log"].append(error_msg)
+                raise HTTPException(status_code=500, detail=error_msg)
+
+        results["crop_recommendations"] = [
+            {"crop": crop, "confidence": float(conf)}
+            for crop, conf in recommendations
+        ]
+    except BaseException:
+        weather_task.cancel()
+        raise
+
+    # Step 2: Collect weather data if it arrives within its deadline (measured from the pipeline start)
+    weather_budget = weather_stage_timeout - (time.perf_counter() - pipeline_start)
     try:
-        weather_data = await get_weather_data(request.lat, request.lon)
+        weather_data, _ = await run_stage(weather_task, weather_budget)
+        elapsed = (time.perf_counter() - pipeline_start) * 1000
         if weather_data:
             results["weather_data"] = weather_data
-            results["process_log"].append("Weather data retrieved successfully")
+            results["process_log"].append(f"Weather data retrieved successfully ({elapsed:.1f} ms)")
         else:
-            results["process_log"].append("Weather data not available")
+            results["process_log"].append(f"Weather data not available ({elapsed:.1f} ms)")
+    except asyncio.TimeoutError:
+        results["process_log"].append(f"Weather data dropped: not ready within its {weather_stage_timeout}s deadline")
     except Exception as e:
         results["process_log"].append(f"Weather data retrieval failed: {str(e)}")
-    
-    # Step 3: Convert soil levels to distributions for crop recommender
+
+    results["process_log"].append(f"Pipeline completed in {(time.perf_counter() - pipeline_start) * 1000:.1f} ms")
+    return results
+
+# Batch recommendations for /recommend/batch (runs on the inference executor)
+def recommend_batch(latitudes, longitudes, top_n=5):
+    """
+    Returns (soil_characteristics, recommendations, process_log) for N locations
+    """
+    n = len(latitudes)
+    soil_characteristics = [None] * n
+    recommendations = [None] * n
+    process_log = []
+
+    # Locations covered by precomputed tiles are answered by lookup
+    live = list(range(n))
+    if crop_tiles is not None and top_n > crop_tiles.top_k:
+        process_log.append(f"Precomputed tiles not used: they hold {crop_tiles.top_k} crops, {top_n} requested")
+    elif crop_tiles is not None:
+        live = []
+        for i in range(n):
+            tile_answer = crop_tiles.lookup(latitudes[i], longitudes[i], top_n=top_n)
+            if tile_answer is None:
+                live.append(i)
+            else:
+                soil_characteristics[i], recommendations[i] = tile_answer
+        process_log.append(f"{n - len(live)} locations read from precomputed tiles")
+
+    # Everything else goes through the models in one batch
+    if live:
+        live_soil, live_recommendations = recommend_crops_for_locations(
+            [latitudes[i] for i in live], [longitudes[i] for i in live], top_n=top_n
+        )
+        for i, soil, crops in zip(live, live_soil, live_recommendations):
+            soil_characteristics[i] = soil
+            recommendations[i] = crops
+
+    process_log.append(f"Crop recommendations generated for {len(live)} locations")
+    return soil_characteristics, recommendations, process_log
+
+@app.post("/recommend/batch", response_model=BatchRecommendationResponse)
+async def get_batch_crop_recommendations(request: BatchLocationRequest):
+    """
+    Get crop recommendations for many coordinates in one call
+
+    Every model runs once over the whole batch (once per chunk when the batch
+    is split across inference worker processes). Weather data is not fetched
+    for batch requests.
+    """
+    if len(request.locations) > max_batch_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch of {len(request.locations)} locations exceeds the limit of {max_batch_size}"
+        )
+    await wait_for_models()
+
+    latitudes = [location.lat for location in request.locations]
+    longitudes = [location.lon for location in request.locations]
+
+    # Spread large batches over the inference worker processes
+    n_chunks = crop_process_workers if crop_serving_mode == 'process' else 1
+    chunks = split_batch(len(latitudes), n_chunks)
+
     try:
-        n_level_dist = convert_level_to_distribution(soil_predictions.get('N_level', 'Medium'))
-        p_level_dist = convert_level_to_distribution(soil_predictions.get('P_level', 'Medium'))
-        k_level_dist = convert_level_to_distribution(soil_predictions.get('K_level', 'Low'))
-        ph_level_dist = convert_level_to_distribution(soil_predictions.get('pH_level', 'Neutral'), is_ph=True)
-        
-        # Step 4: Get crop recommendations
-        recommendations = recommend_crops(
-            request.lat, request.lon,
-            nitrogen_levels=n_level_dist,
-            phosphorous_levels=p_level_dist,
-            potassium_levels=k_level_dist,
-            ph_levels=ph_level_dist,
-            top_n=5
+        chunk_results, elapsed = await run_stage(
+            asyncio.gather(*[
+                run_inference(recommend_batch, latitudes[start:stop], longitudes[start:stop], top_n=request.top_n)
+                for start, stop in chunks
+            ]),
+            None
         )
-        
-        results["crop_recommendations"] = [
-            {"crop": crop, "confidence": float(conf)} 
-            for crop, conf in recommendations
-        ]
-        results["process_log"].append("Crop recommendations generated successfully")
-        
     except Exception as e:
-        error_msg = f"Error generating crop recommendations: {str(e)}"
-        results["process_log"].append(error_msg)
+        error_msg = f"Error generating batch crop recommendations: {str(e)}"
         raise HTTPException(status_code=500, detail=error_msg)
-    
-    return results
 
-@app.get("/health")
-async def health_check():
-    """API health check endpoint"""
-    model_status = all([soil_models, soil_encoders, soil_scaler, cat_model, scaler_cat, mlb])
+    soil_characteristics, recommendations, process_log = [], [], []
+    for chunk_soil, chunk_recommendations, chunk_log in chunk_results:
+        soil_characteristics.extend(chunk_soil)
+        recommendations.extend(chunk_recommendations)
+        process_log.extend(chunk_log)
+    process_log.append(f"Batch inference took {elapsed:.1f} ms over {len(chunks)} chunk(s)")
+
+    results = [
+        {
+            "location": {"latitude": lat, "longitude": lon},
+            "soil_characteristics": soil,
+            "crop_recommendations": [
+                {"crop": crop, "confidence": float(conf)}
+                for crop, conf in crops
+            ]
+        }
+        for lat, lon, soil, crops in zip(latitudes, longitudes, soil_characteristics, recommendations)
+    ]
+
     return {
-        "status": "healthy", 
-        "models_loaded": model_status,
-        "weather_api_available": weather_api_key is not None
+        "results": results,
+        "process_log": process_log
     }
 
+@app.get("/health")
+async def health_check():
+    """API health check endpoint (503 until the models have loaded)"""
+    model_status = models.status()
+    return JSONResponse(
+        status_code=200 if model_status["ready"] else 503,
+        content={
+            "status": "healthy" if model_status["ready"] else model_status["state"],
+            "models_loaded": model_status["ready"],
+            "models": model_status,
+            "weather_api_available": weather_api_key is not None,
+            "weather": weather_client.metrics() if weather_client is not None else None,
+            # In process serving mode each worker has its own cache
+            "soil_cache": ("per-worker" if crop_serving_mode == 'process' else soil_cache.stats())
+                if soil_cache is not None else None,
+            "crop_tiles": crop_tiles.info() if crop_tiles is not None else None,
+            "serving_mode": crop_serving_mode
+        }
+    )
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -327,6 +833,7 @@ async def root():
         "message": "Crop Recommendation API",
         "endpoints": {
             "POST /recommend": "Get crop recommendations for coordinates",
+            "POST /recommend/batch": "Get crop recommendations for many coordinates at once",
             "GET /health": "Check API health status"
         }
     }
@@ -0,0 +1,84 @@
+# Analytics API over the daily price rollups (price_rollups.py)
+#
+#   POST /analytics/summary      per-district stats of a commodity over a date range
+#   POST /analytics/daily        day-by-day rollups of one (state, district, commodity)
+#   POST /analytics/top-markets  markets ranked by mean spread or modal price
+
+from typing import Optional
+
+from fastapi import APIRouter
+from pydantic import BaseModel
+
+from instrumentation import stage
+from price_rollups import format_day
+
+
+class RangeQuery(BaseModel):
+    commodity: str
+    state: Optional[str] = None
+    district: Optional[str] = None
+    start_date: Optional[str] = None  # YYYY-MM-DD, default end_date - days + 1
+    end_date: Optional[str] = None    # YYYY-MM-DD, default latest date in the data
+    days: Optional[int] = None        # default 30
+
+class TopMarketsQuery(RangeQuery):
+    k: int = 10
+    by: str = "spread"  # "spread" or "modal_price"
+    ascending: bool = False
+
+
+def create_analytics_router(get_rollups):
+    """Routes under /analytics; get_rollups() returns the current PriceRollups"""
+    router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+    def resolve(query):
+        rollups = get_rollups()
+        try:
+            return rollups, rollups.date_range(query.start_date, query.end_date, query.days)
+        except ValueError:
+            return rollups, None
+
+    def range_fields(date_range):
+        return {"start_date": format_day(date_range[0]), "end_date": format_day(date_range[1])}
+
+    @router.post("/summary")
+    @stage("analytics")
+    def summary(query: RangeQuery):
+        """Per-district stats of a commodity over a date range"""
+        rollups, date_range = resolve(query)
+        if date_range is None:
+            return {"error": "Dates must be YYYY-MM-DD."}
+        return {"commodity": query.commodity, **range_fields(date_range),
+                "districts": rollups.summaries(query.commodity, *date_range, query.state, query.district)}
+
+    @router.post("/daily")
+    @stage("analytics")
+    def daily(query: RangeQuery):
+        """Day-by-day rollups of one (state, district, commodity)"""
+        if query.state is None or query.district is None:
+            return {"error": "state and district are required."}
+        rollups, date_range = resolve(query)
+        if date_range is None:
+            return {"error": "Dates must be YYYY-MM-DD."}
+        rollup = rollups.district(query.state, query.district, query.commodity)
+        if rollup is None:
+            return {"error": "No data found for given input."}
+        return {"state": query.state, "district": query.district, "commodity": query.commodity,
+                **range_fields(date_range), "days": rollup.daily(*date_range)}
+
+    @router.post("/top-markets")
+    @stage("analytics")
+    def top_markets(query: TopMarketsQuery):
+        """Markets ranked by mean spread (max_price - min_price) or modal price"""
+        if query.by not in ("spread", "modal_price"):
+            return {"error": "by must be spread or modal_price."}
+        if query.k < 1:
+            return {"error": "k must be at least 1."}
+        rollups, date_range = resolve(query)
+        if date_range is None:
+            return {"error": "Dates must be YYYY-MM-DD."}
+        return {"commodity": query.commodity, "by": query.by, **range_fields(date_range),
+                "markets": rollups.top_markets(query.commodity, *date_range, query.k, query.by,
+                                               query.ascending, query.state, query.district)}
+
+    return router
@@ -1,34 +1,146 @@
 # running script for price prediction using FastAPI
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import pandas as pd
 import numpy as np
 import joblib
+import io
+import os
+import sys
+import threading
+import time
+from price_index import clean_price_frame
+from price_forecast import forecast_dates, price_windows, recursive_forecast
+from price_journal import PriceJournal
+from price_snapshot import compact_snapshot, load_price_data
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "modules"))
+from model_registry import ModelRegistry, ModelNotReadyError, REPO_ROOT, MODEL_WAIT_TIMEOUT, resolve_artifact
+from instrumentation import configure_logging, instrument_app, stage, TimedJSONResponse
+from result_cache import PredictionCache, model_file_version
+from analytics import create_analytics_router
+
+log = configure_logging("price")
 
 # -------------------------------
 # Load Model & Encoders
 # -------------------------------
-model = joblib.load(r"C:\Users\Nitesh\OneDrive\Desktop\SIH25\TODO_LIST_TRY\backend\models\market_price\xgboost_price_model.pkl")
-encoders = joblib.load(r"C:\Users\Nitesh\OneDrive\Desktop\SIH25\TODO_LIST_TRY\backend\models\market_price\encoders.pkl")
+def load_price_model():
+    model_path = resolve_artifact(os.path.join("market_price", "xgboost_price_model.pkl"), env_var="PRICE_MODEL_PATH")
+    model = joblib.load(model_path)
+    forecast_cache.set_model_version(model_file_version(model_path))
+    return model
+
+def load_encoders():
+    encoders = joblib.load(resolve_artifact(os.path.join("market_price", "encoders.pkl"), env_var="PRICE_ENCODERS_PATH"))
+
+    # Encoder lookups as plain dicts: label -> code (same codes LabelEncoder.transform gives)
+    return {
+        column: {label: code for code, label in enumerate(encoder.classes_)}
+        for column, encoder in encoders.items()
+    }
 
 # -------------------------------
 # Load Historical Data
 # -------------------------------
-df = pd.read_csv(r"C:\Users\Nitesh\OneDrive\Desktop\SIH25\TODO_LIST_TRY\backend\database\market_price_6_days.csv")
+csv_path = os.getenv("PRICE_CSV_PATH", os.path.join(REPO_ROOT, "backend", "database", "market_price_6_days.csv"))
+snapshot_dir = os.getenv("PRICE_SNAPSHOT_DIR", csv_path + ".snapshot")
 
-# Clean arrival_date (handle "-" and "/")
-df["arrival_date"] = df["arrival_date"].astype(str).str.replace("-", "/", regex=False)
-df["arrival_date"] = pd.to_datetime(df["arrival_date"], format="%d/%m/%Y", errors="coerce")
+# Rows ingested while the service runs (see price_journal.py). Every worker polls
+# the journal for the rows other workers ingested; once the rows since the
+# snapshot's journal offset exceed PRICE_COMPACT_JOURNAL_BYTES they are folded
+# into the snapshot so a start does not replay them
+price_journal = PriceJournal(os.getenv("PRICE_INGEST_JOURNAL", csv_path + ".ingested.csv"))
+JOURNAL_POLL_SECONDS = float(os.getenv("PRICE_JOURNAL_POLL_SECONDS", "5"))
+COMPACT_JOURNAL_BYTES = int(os.getenv("PRICE_COMPACT_JOURNAL_BYTES", str(16 << 20)))
 
-# Drop duplicates and unnecessary columns
-df = df.drop(columns=["variety", "grade"], errors="ignore").drop_duplicates()
-df = df.sort_values(by=["state", "district", "commodity", "arrival_date"])
+def load_price_history():
+    # Load the compiled columnar snapshot when it matches the CSV; otherwise parse
+    # and clean the CSV (arrival_date "-"/"/", duplicates, unnecessary columns),
+    # build the index (state, district, commodity) -> per-market model inputs and
+    # the analytics rollups, and write the snapshot for the next start. Then replay
+    # the journal from the snapshot's offset. All of it runs under the journal lock,
+    # so workers starting together build the snapshot once and never see it mid-write
+    with price_journal.locked():
+        price_history, price_index, price_rollups, snapshot_meta, price_data_source = load_price_data(
+            csv_path, snapshot_dir
+        )
+        price_journal.offset = price_journal.compacted = snapshot_meta["journal_offset"] if snapshot_meta else 0
+        replayed = price_journal.catch_up(lambda rows: price_index.ingest(rows, on_added=price_rollups.ingest))
+    log.info("Loaded price history", extra={"rows": len(price_history), "source": price_data_source,
+                                            "journal_rows": replayed, "rollup_keys": price_rollups.stats()["keys"]})
+    return price_history, price_index, price_rollups, snapshot_meta
+
+def follow_journal():
+    """Background: apply rows other workers journaled, compact the journal into the snapshot"""
+    try:
+        _, price_index, rollups, snapshot_meta = models.get("price_data")
+    except ModelNotReadyError:
+        return
+    while True:
+        time.sleep(JOURNAL_POLL_SECONDS)
+        try:
+            if price_journal.size() != price_journal.offset:
+                with price_journal.locked():
+                    price_journal.catch_up(lambda rows: price_index.ingest(rows, on_added=rollups.ingest))
+            if snapshot_meta and price_journal.offset - price_journal.compacted >= COMPACT_JOURNAL_BYTES:
+                with price_journal.locked():
+                    price_journal.catch_up(lambda rows: price_index.ingest(rows, on_added=rollups.ingest))
+                    start = time.perf_counter()
+                    compacted = compact_snapshot(snapshot_dir, snapshot_meta, price_index, rollups,
+                                                 price_journal.offset)
+                if compacted is None:
+                    # The snapshot was rebuilt from a changed CSV; the next start replays the journal
+                    snapshot_meta = None
+                    log.warning("Snapshot changed, not compacting the ingest journal")
+                    continue
+                price_journal.compacted = compacted
+                log.info("Compacted ingest journal", extra={**price_journal.stats(),
+                                                            "seconds": round(time.perf_counter() - start, 3)})
+        except Exception:
+            log.exception("Following the ingest journal failed")
+
+# Multi-day forecasts keyed on their exact inputs (a market's feature row and last
+# modal prices, from one immutable MarketSnapshot), so a market's next record, or a
+# late row for a date that is already known, simply gives a new key
+MAX_FORECAST_DAYS = int(os.getenv("MAX_FORECAST_DAYS", "14"))
+forecast_cache = PredictionCache(None, max_size=int(os.getenv("FORECAST_CACHE_SIZE", "4096")), name="forecasts")
+
+# Model, encoders and price history load in parallel in the background at startup
+models = ModelRegistry()
+models.register("price_model", load_price_model)
+models.register("encoders", load_encoders)
+models.register("price_data", load_price_history)
 
 # -------------------------------
 # FastAPI Setup
 # -------------------------------
-app = FastAPI(title="Commodity Price Prediction")
+app = FastAPI(title="Commodity Price Prediction", default_response_class=TimedJSONResponse)
+instrument_app(app, "price", registry=models)
+app.include_router(create_analytics_router(lambda: models.get("price_data", timeout=MODEL_WAIT_TIMEOUT)[2]))
+
+@app.on_event("startup")
+def start_model_loading():
+    models.start()
+    threading.Thread(target=follow_journal, name="price-journal", daemon=True).start()
+
+@app.exception_handler(ModelNotReadyError)
+async def model_not_ready(request: Request, exc: ModelNotReadyError):
+    return JSONResponse(status_code=503, content={"error": str(exc)})
+
+@app.get("/health")
+def health():
+    # 503 until everything has loaded, so load balancers hold traffic back
+    status = models.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={"status": "ok" if status["ready"] else status["state"], "models": status,
+                 "forecast_cache": forecast_cache.stats(), "ingest_journal": price_journal.stats()}
+    )
 
 class PriceRequest(BaseModel):
     state: str
@@ -36,67 +148,206 @@ class PriceRequest(BaseModel):
     commodity: str
     top_n_markets: int = 3  # default top 3 markets
 
-@app.post("/predict")
-def predict_price(req: PriceRequest):
-    # Filter dataset for given inputs
-    subset = df[
-        (df["state"].str.lower() == req.state.lower()) &
-        (df["district"].str.lower() == req.district.lower()) &
-        (df["commodity"].str.lower() == req.commodity.lower())
+class PriceBatchRequest(BaseModel):
+    requests: List[PriceRequest]
+
+class ForecastRequest(BaseModel):
+    state: str
+    district: str
+    commodity: str
+    horizon_days: int = 7
+    top_n_markets: Optional[int] = None  # default every market in the district
+
+@stage("features")
+def collect_price_inputs(req: PriceRequest):
+    """
+    Returns (entry, markets, feature rows) for one request, or None if there
+    is no data for it. Markets with insufficient history or unseen
+    categories are skipped.
+    """
+    encoder_codes = models.get("encoders", timeout=MODEL_WAIT_TIMEOUT)
+    _, price_index, _, _ = models.get("price_data", timeout=MODEL_WAIT_TIMEOUT)
+
+    # Look up precomputed per-market inputs for the given inputs
+    entry = price_index.lookup(req.state, req.district, req.commodity)
+    if entry is None:
+        return None
+
+    # Encode the request's categorical features once
+    state_enc = encoder_codes["state"].get(req.state)
+    district_enc = encoder_codes["district"].get(req.district)
+    commodity_enc = encoder_codes["commodity"].get(req.commodity)
+
+    markets, rows = [], []
+
+    # Markets reporting on latest date
+    for market in entry.latest_markets[:req.top_n_markets]:
+        if market.n_records < 2:
+            continue  # skip markets with insufficient history
+
+        market_enc = encoder_codes["market"].get(market.market)
+        if state_enc is None or district_enc is None or commodity_enc is None or market_enc is None:
+            continue  # skip unseen categories
+
+        # Model input (lag and rolling features are precomputed)
+        markets.append(market)
+        rows.append([state_enc, district_enc, market_enc, commodity_enc,
+                     market.min_price, market.max_price,
+                     market.lag_1, market.lag_2, market.rolling_mean_3])
+
+    return entry, markets, rows
+
+def format_price_response(req: PriceRequest, entry, markets, predictions):
+    results = [
+        {
+            "market": market.market,
+            "predicted_next_day_price": round(float(predicted_price), 2),
+            "latest_min_price": round(market.min_price, 2),
+            "latest_max_price": round(market.max_price, 2),
+            "last_known_date": str(market.last_known_date.date())
+        }
+        for market, predicted_price in zip(markets, predictions)
     ]
 
-    if subset.empty:
+    return {
+        "state": req.state,
+        "district": req.district,
+        "commodity": req.commodity,
+        "prediction_date": str((entry.latest_date + pd.Timedelta(days=1)).date()),
+        "markets": results
+    }
+
+@stage("inference")
+def predict_rows(rows):
+    """One model.predict call over all feature rows"""
+    if not rows:
+        return np.empty(0)
+    model = models.get("price_model", timeout=MODEL_WAIT_TIMEOUT)
+    return model.predict(np.array(rows, dtype=float))
+
+@app.post("/predict")
+def predict_price(req: PriceRequest):
+    inputs = collect_price_inputs(req)
+    if inputs is None:
         return {"error": "No data found for given input."}
 
-    # Latest available date
-    latest_date = subset["arrival_date"].max()
+    # Predict every market in one call
+    entry, markets, rows = inputs
+    return format_price_response(req, entry, markets, predict_rows(rows))
 
-    # Markets reporting on latest date
-    latest_subset = subset[subset["arrival_date"] == latest_date]
-    markets = latest_subset["market"].unique()[:req.top_n_markets]
+@app.post("/predict/batch")
+def predict_price_batch(batch: PriceBatchRequest):
+    """
+    Forecasts for many (state, district, commodity) requests from a single
+    model invocation
+    """
+    collected = [collect_price_inputs(req) for req in batch.requests]
+
+    # Stack every request's rows into one matrix
+    all_rows = [row for inputs in collected if inputs is not None for row in inputs[2]]
+    predictions = predict_rows(all_rows)
 
     results = []
+    offset = 0
+    for req, inputs in zip(batch.requests, collected):
+        if inputs is None:
+            results.append({"error": "No data found for given input."})
+            continue
+        entry, markets, rows = inputs
+        results.append(format_price_response(req, entry, markets, predictions[offset:offset + len(rows)]))
+        offset += len(rows)
 
-    for market in markets:
-        market_data = subset[subset["market"] == market].tail(3)  # last 3 records
-        if len(market_data) < 2:
-            continue  # skip markets with insufficient history
+    return {"results": results}
 
-        latest = market_data.iloc[-1]
+@stage("forecast")
+def forecast_market_prices(req: ForecastRequest, markets, rows):
+    """
+    horizon_days of predicted prices for each market, from the cache where
+    possible. The remaining markets are forecast together, one model.predict
+    per day over all of them.
+    """
+    cache_keys = [
+        (forecast_cache.model_version, "forecast", tuple(row), market.recent_prices)
+        for market, row in zip(markets, rows)
+    ]
 
-        # Encode categorical features
-        try:
-            state_enc = encoders["state"].transform([req.state])[0]
-            district_enc = encoders["district"].transform([req.district])[0]
-            commodity_enc = encoders["commodity"].transform([req.commodity])[0]
-            market_enc = encoders["market"].transform([market])[0]
-        except ValueError:
-            continue  # skip unseen categories
+    forecasts = [forecast_cache.get(cache_key) for cache_key in cache_keys]
+    missing = [i for i, cached in enumerate(forecasts) if cached is None or len(cached) < req.horizon_days]
+    if missing:
+        model = models.get("price_model", timeout=MODEL_WAIT_TIMEOUT)
+        windows = price_windows([markets[i].recent_prices for i in missing])
 
-        # Lag and rolling features
-        lag_1 = market_data.iloc[-1]["modal_price"]
-        lag_2 = market_data.iloc[-2]["modal_price"]
-        rolling_mean_3 = market_data["modal_price"].mean()
+        start = time.perf_counter()
+        computed = recursive_forecast(model, [rows[i] for i in missing], windows, req.horizon_days)
+        seconds = (time.perf_counter() - start) / len(missing)
 
-        # Prepare input for model
-        X_input = np.array([[state_enc, district_enc, market_enc, commodity_enc,
-                             latest["min_price"], latest["max_price"], lag_1, lag_2, rolling_mean_3]])
+        for i, forecast in zip(missing, computed.tolist()):
+            forecasts[i] = forecast
+            forecast_cache.put(cache_keys[i], forecast, seconds)
 
-        # Predict
-        predicted_price = model.predict(X_input)[0]
+    return [forecast[:req.horizon_days] for forecast in forecasts]
 
-        results.append({
-            "market": market,
-            "predicted_next_day_price": round(float(predicted_price), 2),
-            "latest_min_price": round(float(latest["min_price"]), 2),
-            "latest_max_price": round(float(latest["max_price"]), 2),
-            "last_known_date": str(latest["arrival_date"].date())
-        })
+@app.post("/forecast")
+def forecast_price(req: ForecastRequest):
+    """Daily price forecasts for the next horizon_days in every market of a district"""
+    if not 1 <= req.horizon_days <= MAX_FORECAST_DAYS:
+        return {"error": f"horizon_days must be between 1 and {MAX_FORECAST_DAYS}."}
+
+    inputs = collect_price_inputs(req)
+    if inputs is None:
+        return {"error": "No data found for given input."}
+
+    entry, markets, rows = inputs
+    dates = forecast_dates(entry.latest_date, req.horizon_days)
+    results = [
+        {
+            "market": market.market,
+            "last_known_date": str(market.last_known_date.date()),
+            "latest_modal_price": round(market.lag_1, 2),
+            "forecast": [
+                {"date": date, "predicted_price": round(float(price), 2)}
+                for date, price in zip(dates, forecast)
+            ]
+        }
+        for market, forecast in zip(markets, forecast_market_prices(req, markets, rows))
+    ]
 
     return {
         "state": req.state,
         "district": req.district,
         "commodity": req.commodity,
-        "prediction_date": str((latest_date + pd.Timedelta(days=1)).date()),
+        "horizon_days": req.horizon_days,
         "markets": results
     }
+
+@stage("ingest")
+def ingest_csv_batch(body: bytes):
+    """Parse, clean and ingest one CSV batch"""
+    batch = clean_price_frame(pd.read_csv(io.BytesIO(body)))
+    _, price_index, rollups, _ = models.get("price_data", timeout=MODEL_WAIT_TIMEOUT)
+
+    def journal_and_roll_up(rows):
+        price_journal.append(rows)
+        rollups.ingest(rows)
+
+    # Apply what other workers ingested first, so duplicates across workers are caught
+    with price_journal.locked():
+        price_journal.catch_up(lambda rows: price_index.ingest(rows, on_added=rollups.ingest))
+        return price_index.ingest(batch, on_added=journal_and_roll_up)
+
+@app.post("/ingest")
+async def ingest_prices(request: Request):
+    """
+    Append a batch of new daily price rows (CSV in the request body, same
+    columns as the history file) while the service runs. Duplicate rows are
+    ignored; new rows are appended to the ingest journal, so they survive a
+    restart and reach the other workers, and the lag features of the
+    affected markets and their analytics rollups are updated in place.
+    """
+    body = await request.body()
+    try:
+        return await run_in_threadpool(ingest_csv_batch, body)
+    except ModelNotReadyError:
+        raise
+    except Exception as e:
+        return {"error": f"Could not ingest batch: {str(e)}"}
@@ -0,0 +1,32 @@
+# Push new daily mandi price CSV files into a running price prediction API
+#
+#   python ingest_prices.py new_prices_2025-09-12.csv --url http://localhost:8000/ingest
+#
+# The API journals ingested rows next to the history CSV (price_journal.py),
+# so they survive restarts and reach all workers of that host.
+
+import argparse
+import json
+import urllib.request
+
+
+def ingest_file(path, url):
+    with open(path, "rb") as f:
+        body = f.read()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "text/csv"}, method="POST")
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest daily mandi price CSV batches")
+    parser.add_argument("files", nargs="+", help="CSV files with the history file's columns")
+    parser.add_argument("--url", default="http://localhost:8000/ingest", help="Ingest endpoint of the API")
+    args = parser.parse_args()
+
+    for path in args.files:
+        print(f"{path}: {ingest_file(path, args.url)}")
+
+
+if __name__ == "__main__":
+    main()
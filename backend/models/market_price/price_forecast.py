@@ -0,0 +1,62 @@
+# Multi-step price forecasts: the next-day model applied recursively
+
+import numpy as np
+import pandas as pd
+
+# Columns of the model's feature rows (see collect_price_inputs in app.py)
+MIN_PRICE, MAX_PRICE, LAG_1, LAG_2, ROLLING_MEAN_3 = 4, 5, 6, 7, 8
+
+
+def price_windows(recent_prices):
+    """
+    (n, 3) matrix of each market's last three modal prices, oldest first,
+    NaN-padded on the left for markets with fewer records
+    """
+    windows = np.full((len(recent_prices), 3), np.nan)
+    for row, prices in enumerate(recent_prices):
+        prices = list(prices)[-3:]
+        if prices:
+            windows[row, 3 - len(prices):] = prices
+    return windows
+
+
+def recursive_forecast(model, features, windows, horizon):
+    """
+    Forecast horizon days for every row of features at once.
+
+    features is the (n, 9) next-day model input of n markets and windows
+    their last three modal prices (price_windows). Each step is one
+    model.predict over all n rows; its predictions become the next step's
+    lag_1, the old lag_1 becomes lag_2 and rolling_mean_3 is recomputed
+    over the shifted window. min_price and max_price are not forecast, so
+    they move with the predicted modal price (the latest spread is kept).
+    Returns an (n, horizon) array.
+    """
+    X = np.array(features, dtype=float)
+    window = np.array(windows, dtype=float)
+    forecast = np.empty((len(X), horizon))
+    if len(X) == 0:
+        return forecast
+
+    for step in range(horizon):
+        predicted = np.asarray(model.predict(X), dtype=float)
+        forecast[:, step] = predicted
+        if step == horizon - 1:
+            break
+
+        change = np.nan_to_num(predicted - X[:, LAG_1])
+        X[:, MIN_PRICE] += change
+        X[:, MAX_PRICE] += change
+        X[:, LAG_2] = X[:, LAG_1]
+        X[:, LAG_1] = predicted
+
+        window[:, :2] = window[:, 1:]
+        window[:, 2] = predicted
+        counts = (~np.isnan(window)).sum(axis=1)
+        X[:, ROLLING_MEAN_3] = np.where(counts > 0, np.nansum(window, axis=1) / np.maximum(counts, 1), np.nan)
+    return forecast
+
+
+def forecast_dates(start, horizon):
+    """The horizon calendar days after start, as ISO date strings"""
+    return [str((start + pd.Timedelta(days=step)).date()) for step in range(1, horizon + 1)]
@@ -0,0 +1,328 @@
+# In-memory index over the mandi price history used by the price prediction API
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Columns kept after cleaning; rows are duplicates when all of them match
+PRICE_COLUMNS = ["state", "district", "market", "commodity", "arrival_date",
+                 "min_price", "max_price", "modal_price"]
+
+
+def clean_price_frame(df):
+    """
+    Normalize a raw mandi price CSV frame: parse arrival_date (handles "-"
+    and "/"), drop variety/grade and duplicate rows
+    """
+    df = df.copy()
+    df["arrival_date"] = df["arrival_date"].astype(str).str.replace("-", "/", regex=False)
+    df["arrival_date"] = pd.to_datetime(df["arrival_date"], format="%d/%m/%Y", errors="coerce")
+    return df.drop(columns=["variety", "grade"], errors="ignore").drop_duplicates()
+
+
+def row_hashes(df):
+    """
+    64-bit hash of every row over PRICE_COLUMNS, normalized so the same
+    record hashes the same whether it came from the history or a new batch
+    (e.g. integer vs float prices)
+    """
+    frame = pd.DataFrame({col: df[col].astype(str) for col in ("state", "district", "market", "commodity")})
+    frame["arrival_date"] = df["arrival_date"].astype("datetime64[ns]")
+    for col in ("min_price", "max_price", "modal_price"):
+        frame[col] = df[col].astype(float)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _in_sorted(sorted_values, values):
+    # Membership test of values in a sorted array
+    if sorted_values.size == 0:
+        return np.zeros(len(values), dtype=bool)
+    positions = np.searchsorted(sorted_values, values)
+    positions[positions == sorted_values.size] = 0
+    return sorted_values[positions] == values
+
+
+def normalize_key(state, district, commodity):
+    """Lowercase (state, district, commodity) lookup key"""
+    return (state.lower(), district.lower(), commodity.lower())
+
+
+def _nanmean(values):
+    # Mean ignoring NaN, like pandas Series.mean()
+    values = values[~np.isnan(values)]
+    return float(values.mean()) if values.size else float("nan")
+
+
+# Marker pandas uses for NaT in int64 nanosecond dates
+NAT = np.iinfo(np.int64).min
+
+
+def _record_order(record):
+    # Records are (date_ns, min_price, max_price, modal_price, seq);
+    # sort by date with NaT last (as DataFrame.sort_values does), then arrival order
+    return (record[0] == NAT, record[0], record[4])
+
+
+def _snapshot(market, tail):
+    """MarketSnapshot from a market's last (up to) 3 records, oldest first"""
+    last = tail[-1]
+    return MarketSnapshot(
+        market=market,
+        n_records=len(tail),
+        min_price=float(last[1]),
+        max_price=float(last[2]),
+        lag_1=float(last[3]),
+        lag_2=float(tail[-2][3]) if len(tail) > 1 else float("nan"),
+        rolling_mean_3=_nanmean(np.array([record[3] for record in tail], dtype=float)),
+        last_known_date=pd.Timestamp(np.datetime64(int(last[0]), "ns")),
+        recent_prices=tuple(float(record[3]) for record in tail)
+    )
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    """Model inputs for one market, taken from its last (up to) 3 records"""
+    market: str
+    n_records: int
+    min_price: float       # of the latest record
+    max_price: float       # of the latest record
+    lag_1: float           # latest modal_price
+    lag_2: float           # modal_price of the record before (NaN if missing)
+    rolling_mean_3: float  # mean modal_price of the last 3 records
+    last_known_date: pd.Timestamp
+    recent_prices: Tuple[float, ...]  # modal_price of the last 3 records, oldest first
+
+
+@dataclass(frozen=True)
+class PriceKeyEntry:
+    """Everything predict_price needs for one (state, district, commodity)"""
+    latest_date: pd.Timestamp
+    # Markets reporting on latest_date, in the order they appear in the data
+    latest_markets: Tuple[MarketSnapshot, ...]
+    # Row range of this key in MarketPriceIndex.order
+    row_range: Tuple[int, int]
+
+
+class MarketPriceIndex:
+    """
+    Index from lowercase (state, district, commodity) to precomputed
+    per-market model inputs, so a request is a dict lookup plus a slice.
+
+    df must already be cleaned and sorted the way the API sorts it
+    (state, district, commodity, arrival_date). Row order within a key is
+    preserved, so the "last 3 records" of a market are the same rows the
+    original DataFrame filtering picked.
+
+    New daily batches are added with ingest(), which only touches the keys
+    present in the batch and replaces their entries one dict assignment at a
+    time, so readers never wait and always see a complete entry.
+    """
+
+    def __init__(self, df):
+        n = len(df)
+        self.version = 0
+        self._lock = threading.Lock()
+        self._next_seq = n
+
+        # Hashes of every row seen so far, for deduplicating ingested batches:
+        # a sorted array for the initial history plus a set for ingested rows
+        self._seen_base = np.unique(row_hashes(df)) if n else np.empty(0, dtype=np.uint64)
+        self._seen_new = set()
+        positions = np.arange(n)
+
+        # Lowercase-normalized categorical codes for the lookup key
+        lower = {col: df[col].astype(str).str.lower() for col in ("state", "district", "commodity")}
+        valid = (df["state"].notna() & df["district"].notna() & df["commodity"].notna()).to_numpy()
+        key_frame = pd.DataFrame(lower)
+        key_codes = key_frame.groupby(list(lower), sort=False).ngroup().to_numpy()
+        key_codes = np.where(valid, key_codes, -1)
+        market_codes, market_names = pd.factorize(df["market"])
+
+        # Presorted order: key, then market, then original row order
+        self.order = np.lexsort((positions, market_codes, key_codes))
+
+        dates = df["arrival_date"].to_numpy()
+        dates_ns = dates.astype("datetime64[ns]").view(np.int64)
+        min_prices = df["min_price"].to_numpy(dtype=float)
+        max_prices = df["max_price"].to_numpy(dtype=float)
+        modal_prices = df["modal_price"].to_numpy(dtype=float)
+
+        # Latest date per key
+        latest_by_code = pd.Series(dates).groupby(key_codes).max()
+
+        # Group boundaries of (key, market) runs in the presorted order
+        sorted_keys = key_codes[self.order]
+        sorted_markets = market_codes[self.order]
+        breaks = np.flatnonzero((np.diff(sorted_keys) != 0) | (np.diff(sorted_markets) != 0)) + 1
+        starts = np.concatenate(([0], breaks)) if n else np.array([], dtype=int)
+        stops = np.concatenate((breaks, [n])) if n else np.array([], dtype=int)
+
+        key_breaks = np.flatnonzero(np.diff(sorted_keys) != 0) + 1
+        key_starts = np.concatenate(([0], key_breaks)) if n else np.array([], dtype=int)
+        key_stops = np.concatenate((key_breaks, [n])) if n else np.array([], dtype=int)
+        key_ranges = {int(sorted_keys[s]): (int(s), int(e)) for s, e in zip(key_starts, key_stops)}
+
+        # Lowercase key tuple of each key code
+        key_tuples = {}
+        first_rows = pd.Series(positions).groupby(key_codes).first()
+        for key_code, first in first_rows.items():
+            if key_code >= 0:
+                key_tuples[key_code] = (lower["state"].iat[first], lower["district"].iat[first],
+                                        lower["commodity"].iat[first])
+
+        # Last (up to) 3 records of each (key, market) run, kept for incremental
+        # updates, and the snapshot built from them
+        self._tails = {}
+        snapshots = {}
+        for start, stop in zip(starts, stops):
+            key_code = int(sorted_keys[start])
+            if key_code < 0 or sorted_markets[start] < 0:
+                continue
+            market = market_names[sorted_markets[start]]
+            tail = tuple(
+                (int(dates_ns[row]), float(min_prices[row]), float(max_prices[row]), float(modal_prices[row]), int(row))
+                for row in self.order[max(start, stop - 3):stop]
+            )
+            self._tails[(key_tuples[key_code], market)] = tail
+            snapshots[(key_code, int(sorted_markets[start]))] = _snapshot(market, tail)
+
+        # Markets reporting on each key's latest date, in data order
+        latest_markets = {}
+        is_latest = dates == latest_by_code.reindex(key_codes).to_numpy()
+        for position in np.flatnonzero(is_latest & (key_codes >= 0)):
+            key_code = int(key_codes[position])
+            markets = latest_markets.setdefault(key_code, {})
+            market_code = int(market_codes[position])
+            if market_code >= 0 and market_code not in markets:
+                markets[market_code] = snapshots[(key_code, market_code)]
+
+        # Final lookup table
+        self.entries: Dict[Tuple[str, str, str], PriceKeyEntry] = {}
+        for key_code, key in key_tuples.items():
+            self.entries[key] = PriceKeyEntry(
+                latest_date=pd.Timestamp(latest_by_code[key_code]),
+                latest_markets=tuple(latest_markets.get(key_code, {}).values()),
+                row_range=key_ranges[key_code]
+            )
+
+    def __len__(self):
+        return len(self.entries)
+
+    # The lock cannot be pickled; the two large arrays are stored next to the
+    # pickle by the snapshot code and attached again with attach_arrays()
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ("_lock", "order", "_seen_base"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self.order = np.empty(0, dtype=np.intp)
+        self._seen_base = np.empty(0, dtype=np.uint64)
+
+    def attach_arrays(self, order, seen_base):
+        """Restore the presorted order and seen-row hashes after unpickling"""
+        self.order = order
+        self._seen_base = seen_base
+
+    def lookup(self, state, district, commodity) -> Optional[PriceKeyEntry]:
+        """Entry for a (state, district, commodity), case-insensitive, or None"""
+        return self.entries.get(normalize_key(state, district, commodity))
+
+    # -------------------------------
+    # Incremental ingestion
+    # -------------------------------
+    def ingest(self, batch, on_added=None):
+        """
+        Add a cleaned batch of new rows (see clean_price_frame). Rows already
+        seen are dropped; the rolling state of the affected markets is updated
+        and each affected key's entry is swapped in. Cost depends only on the
+        size of the batch. on_added(rows) is called with the new rows under
+        the ingest lock, so views derived from the history see every row
+        exactly once; if it raises, the batch is not applied and its rows
+        are still new to a retry. Returns ingestion counters.
+        """
+        with self._lock:
+            received = len(batch)
+            hashes = row_hashes(batch) if received else np.empty(0, dtype=np.uint64)
+            in_base = _in_sorted(self._seen_base, hashes)
+            fresh, fresh_hashes = [], set()
+            for row_hash, seen in zip(hashes.tolist(), in_base.tolist()):
+                is_new = not seen and row_hash not in self._seen_new and row_hash not in fresh_hashes
+                if is_new:
+                    fresh_hashes.add(row_hash)
+                fresh.append(is_new)
+            batch = batch[fresh]
+            if on_added is not None:
+                on_added(batch)
+            self._seen_new.update(fresh_hashes)
+
+            # New records grouped by lookup key, in batch order
+            dates_ns = batch["arrival_date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+            updates = OrderedDict()
+            for (state, district, market, commodity), date_ns, min_price, max_price, modal_price in zip(
+                    batch[["state", "district", "market", "commodity"]].itertuples(index=False, name=None),
+                    dates_ns,
+                    batch["min_price"].to_numpy(dtype=float),
+                    batch["max_price"].to_numpy(dtype=float),
+                    batch["modal_price"].to_numpy(dtype=float)):
+                if pd.isna(state) or pd.isna(district) or pd.isna(commodity) or pd.isna(market):
+                    continue
+                record = (int(date_ns), float(min_price), float(max_price), float(modal_price), self._next_seq)
+                self._next_seq += 1
+                key = normalize_key(str(state), str(district), str(commodity))
+                updates.setdefault(key, []).append((market, record))
+
+            for key, records in updates.items():
+                self.entries[key] = self._updated_entry(key, records)
+
+            self.version += 1
+            return {
+                "received": received,
+                "duplicates": received - int(sum(fresh)),
+                "added": int(sum(fresh)),
+                "keys_updated": len(updates),
+                "version": self.version
+            }
+
+    def _updated_entry(self, key, records):
+        # Caller holds the lock
+        entry = self.entries.get(key)
+        latest_ns = entry.latest_date.value if entry is not None else NAT
+        latest_markets = OrderedDict((m.market, m) for m in entry.latest_markets) if entry is not None else OrderedDict()
+
+        # Roll each market's last-3 window forward
+        changed = set()
+        for market, record in records:
+            tail = self._tails.get((key, market), ())
+            self._tails[(key, market)] = tuple(sorted(tail + (record,), key=_record_order)[-3:])
+            changed.add(market)
+
+        # A newer date replaces the set of markets reporting on the latest date
+        batch_dates = [record[0] for _, record in records if record[0] != NAT]
+        if batch_dates:
+            batch_latest = max(batch_dates)
+            if latest_ns == NAT or batch_latest > latest_ns:
+                latest_ns = batch_latest
+                latest_markets = OrderedDict()
+            if batch_latest == latest_ns:
+                for market, record in records:
+                    if record[0] == latest_ns and market not in latest_markets:
+                        latest_markets[market] = None
+
+        for market in latest_markets:
+            if market in changed or latest_markets[market] is None:
+                latest_markets[market] = _snapshot(market, self._tails[(key, market)])
+
+        return PriceKeyEntry(
+            latest_date=pd.Timestamp(np.datetime64(int(latest_ns), "ns")),
+            latest_markets=tuple(latest_markets.values()),
+            row_range=entry.row_range if entry is not None else (0, 0)
+        )
@@ -0,0 +1,96 @@
+# Append-only journal of the price rows ingested while the service runs
+#
+# /ingest appends each batch's new rows here (PRICE_COLUMNS, no header,
+# dd/mm/YYYY dates) before it applies them, so that
+#   - a restart replays the rows ingested since the price snapshot last
+#     recorded a journal offset (see compact_snapshot in price_snapshot.py)
+#   - each worker process (uvicorn --workers N) applies the rows the other
+#     workers appended: before its own appends, and every few seconds from
+#     a background poll
+# Replaying a row twice is harmless: MarketPriceIndex.ingest drops rows it
+# has already seen.
+#
+# The journal is a local file locked with flock, so all workers ingesting
+# into one history must run on the same host (or share a filesystem with
+# working flock). To fold the journal into the history, append its rows to
+# the history CSV and delete the journal while the service is stopped.
+
+import fcntl
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from price_index import PRICE_COLUMNS, clean_price_frame
+
+
+class PriceJournal:
+    """
+    The journal file at path and how far this process has applied it.
+    read/catch_up/append must be called under locked().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0       # bytes of the journal applied by this process
+        self.compacted = 0    # journal offset recorded in the snapshot
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """Exclusive against the other threads of this process and other processes"""
+        with self._lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def read(self, offset):
+        """
+        (cleaned rows from byte offset on or None, offset after the last
+        complete line). A journal shorter than offset was replaced, so it is
+        read from the start.
+        """
+        if offset > self.size():
+            offset = 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return None, 0
+        data = data[:data.rfind(b"\n") + 1]  # a torn last line is rewritten by append
+        if not data:
+            return None, offset
+        rows = pd.read_csv(io.BytesIO(data), header=None, names=PRICE_COLUMNS)
+        return clean_price_frame(rows), offset + len(data)
+
+    def catch_up(self, apply):
+        """apply(rows) to the rows appended since this process last read; returns their number"""
+        rows, self.offset = self.read(self.offset)
+        if rows is None:
+            return 0
+        apply(rows)
+        return len(rows)
+
+    def append(self, rows):
+        """Append cleaned rows after catch_up(), durably"""
+        data = rows[PRICE_COLUMNS].to_csv(header=False, index=False, date_format="%d/%m/%Y").encode()
+        with open(self.path, "ab") as f:
+            f.truncate(self.offset)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset += len(data)
+
+    def stats(self):
+        return {"path": self.path, "bytes": self.size(), "applied": self.offset, "compacted": self.compacted}
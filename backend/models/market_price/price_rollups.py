@@ -0,0 +1,577 @@
+# Daily rollups of the mandi price history, behind the analytics API
+#
+# PriceRollups keeps, per (state, district, commodity), daily rollups of the
+# price rows: record count, modal price sum and median, lowest min_price,
+# highest max_price and spread (max_price - min_price) sum. The rows are kept
+# next to the rollups, sorted by (date, modal_price), for exact medians and
+# per-market rankings over any date range.
+#
+# A district's rollups are a few segments covering consecutive, disjoint day
+# ranges. An ingested batch rebuilds only the days it touches (usually just
+# the newest one) into a new segment, and trailing segments are merged as
+# they pile up, like the carries of a binary counter, so each row is copied
+# O(log n) times in its lifetime rather than on every ingest.
+#
+# The rollups are saved with the price snapshot (save/load): one .npy per
+# column, memory-mapped on load, so a start does not rebuild them.
+#
+# Queries over a commodity go through a CommodityView, which lays the
+# segments of all its districts end to end with running totals, so a
+# date-range query over hundreds of districts is a few vectorized calls.
+
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from price_index import normalize_key
+
+NS_PER_DAY = 86_400 * 10**9
+DEFAULT_RANGE_DAYS = 30
+# CommodityView.day_index packs (district number, day) into one int64
+DAY_BITS = 32
+DAY_OFFSET = 1 << (DAY_BITS - 1)
+
+# RollupSegment columns: one value per day, then one per row
+DAY_FIELDS = ("days", "count", "modal_sum", "modal_median", "spread_sum", "min_price", "max_price")
+ROW_FIELDS = ("row_market", "row_modal", "row_spread", "row_min", "row_max")
+FIELD_DTYPES = {field: np.int64 if field in ("days", "count", "row_market") else np.float64
+                for field in DAY_FIELDS + ROW_FIELDS}
+
+
+def _group_starts(*sorted_columns):
+    """Start of every run of equal values across the given sorted columns"""
+    n = len(sorted_columns[0])
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    changed = np.zeros(n - 1, dtype=bool)
+    for column in sorted_columns:
+        changed |= np.diff(column) != 0
+    return np.concatenate(([0], np.flatnonzero(changed) + 1))
+
+
+def _prefix(values):
+    return np.concatenate(([0], np.cumsum(values)))
+
+
+def _segment_medians(values, sizes):
+    """Median of each consecutive segment of values (segment sizes > 0)"""
+    segments = np.repeat(np.arange(len(sizes)), sizes)
+    values = values[np.lexsort((values, segments))]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    return (values[starts + (sizes - 1) // 2] + values[starts + sizes // 2]) / 2
+
+
+def _gather(starts, stops):
+    """Concatenation of the index ranges starts[i]:stops[i]"""
+    sizes = stops - starts
+    return np.arange(sizes.sum()) + np.repeat(starts - np.concatenate(([0], np.cumsum(sizes)[:-1])), sizes)
+
+
+def _concat(arrays, field):
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=FIELD_DTYPES[field])
+
+
+def _day(date):
+    return pd.Timestamp(date).value // NS_PER_DAY
+
+
+def format_day(day):
+    """Day number (days since 1970-01-01) as an ISO date string"""
+    return str(pd.Timestamp(int(day) * NS_PER_DAY, unit="ns").date())
+
+
+@dataclass(frozen=True)
+class RollupSegment:
+    """
+    Rollups of a range of days of one (state, district, commodity). The
+    arrays are views into the arrays of the pass that built them (or of the
+    memory-mapped snapshot) and are never modified.
+    """
+    days: np.ndarray          # sorted distinct days (days since 1970-01-01)
+    count: np.ndarray         # per day: records
+    modal_sum: np.ndarray
+    modal_median: np.ndarray
+    spread_sum: np.ndarray
+    min_price: np.ndarray     # per day: lowest min_price
+    max_price: np.ndarray     # per day: highest max_price
+    row_market: np.ndarray    # per row, sorted by (day, modal_price): market code
+    row_modal: np.ndarray
+    row_spread: np.ndarray
+    row_min: np.ndarray
+    row_max: np.ndarray
+
+    @property
+    def n_rows(self):
+        return len(self.row_modal)
+
+    def row_columns(self):
+        """Rows as (day, market code, modal, spread, min, max) arrays"""
+        return [np.repeat(self.days, self.count), self.row_market, self.row_modal,
+                self.row_spread, self.row_min, self.row_max]
+
+    def split(self, n_days):
+        """(first n_days days, the rest), as views"""
+        n_rows = int(np.sum(self.count[:n_days]))
+        return (
+            RollupSegment(*(getattr(self, field)[:n_days] for field in DAY_FIELDS),
+                          *(getattr(self, field)[:n_rows] for field in ROW_FIELDS)),
+            RollupSegment(*(getattr(self, field)[n_days:] for field in DAY_FIELDS),
+                          *(getattr(self, field)[n_rows:] for field in ROW_FIELDS))
+        )
+
+    @classmethod
+    def concat(cls, segments):
+        """One segment from consecutive segments (in day order)"""
+        return cls(*(np.concatenate([getattr(segment, field) for segment in segments])
+                     for field in DAY_FIELDS + ROW_FIELDS))
+
+
+@dataclass(frozen=True)
+class DistrictRollup:
+    """
+    Rollups of one (state, district, commodity): segments over consecutive,
+    disjoint day ranges, oldest first. Never modified: ingest builds a new
+    one and swaps it in, so readers always see a whole one.
+    """
+    state: str
+    district: str
+    commodity: str
+    segments: Tuple[RollupSegment, ...]
+
+    @property
+    def n_days(self):
+        return sum(len(segment.days) for segment in self.segments)
+
+    @property
+    def n_rows(self):
+        return sum(segment.n_rows for segment in self.segments)
+
+    def daily(self, start_day, end_day):
+        days = []
+        for segment in self.segments:
+            i = int(np.searchsorted(segment.days, start_day, side="left"))
+            j = int(np.searchsorted(segment.days, end_day, side="right"))
+            days.extend(
+                {
+                    "date": format_day(day),
+                    "records": count,
+                    "mean_modal_price": round(modal_sum / count, 2),
+                    "median_modal_price": round(median, 2),
+                    "min_price": round(min_price, 2),
+                    "max_price": round(max_price, 2),
+                    "mean_spread": round(spread_sum / count, 2)
+                }
+                for day, count, modal_sum, median, min_price, max_price, spread_sum in zip(
+                    segment.days[i:j].tolist(), segment.count[i:j].tolist(), segment.modal_sum[i:j].tolist(),
+                    segment.modal_median[i:j].tolist(), segment.min_price[i:j].tolist(),
+                    segment.max_price[i:j].tolist(), segment.spread_sum[i:j].tolist())
+            )
+        return days
+
+
+def build_rollups(key_codes, columns):
+    """
+    A RollupSegment per key code for many keys in one pass: one sort of all
+    rows by (key, day, modal_price), one reduceat over every (key, day)
+    group, then each key takes slices. columns are the rows' (day, market
+    code, modal, spread, min, max) arrays.
+    """
+    n = len(key_codes)
+    order = np.lexsort((columns[2], columns[0], key_codes))
+    key_codes = key_codes[order]
+    row_days, row_market, row_modal, row_spread, row_min, row_max = (column[order] for column in columns)
+
+    starts = _group_starts(key_codes, row_days)
+    if n:
+        count = np.diff(np.append(starts, n))
+        modal_median = (row_modal[starts + (count - 1) // 2] + row_modal[starts + count // 2]) / 2
+        modal_sum = np.add.reduceat(row_modal, starts)
+        spread_sum = np.add.reduceat(row_spread, starts)
+        min_price = np.minimum.reduceat(row_min, starts)
+        max_price = np.maximum.reduceat(row_max, starts)
+    days = row_days[starts]
+
+    # Day groups and rows of each key
+    key_starts = _group_starts(key_codes)
+    day_bounds = np.searchsorted(starts, np.append(key_starts, n)).tolist()
+    row_bounds = np.append(starts, n)[day_bounds].tolist()
+
+    segments = {}
+    for k, key_start in enumerate(key_starts.tolist()):
+        d0, d1 = day_bounds[k], day_bounds[k + 1]
+        r0, r1 = row_bounds[k], row_bounds[k + 1]
+        segments[int(key_codes[key_start])] = RollupSegment(
+            days[d0:d1], count[d0:d1], modal_sum[d0:d1], modal_median[d0:d1], spread_sum[d0:d1],
+            min_price[d0:d1], max_price[d0:d1],
+            row_market[r0:r1], row_modal[r0:r1], row_spread[r0:r1], row_min[r0:r1], row_max[r0:r1]
+        )
+    return segments
+
+
+def split_segments(segments, day):
+    """(segments before day, segments from day on), splitting the one that spans it"""
+    for i, segment in enumerate(segments):
+        if segment.days[-1] >= day:
+            cut = int(np.searchsorted(segment.days, day))
+            head, tail = segment.split(cut)
+            return segments[:i] + ((head,) if cut else ()), (tail,) + segments[i + 1:]
+    return segments, ()
+
+
+def merge_trailing(segments):
+    """
+    Merge the last segments while the newest is at least half the size of
+    the one before it, so sizes halve towards the end (at most ~log2(rows)
+    segments)
+    """
+    first, merged_rows = len(segments) - 1, segments[-1].n_rows
+    while first > 0 and 2 * merged_rows >= segments[first - 1].n_rows:
+        first -= 1
+        merged_rows += segments[first].n_rows
+    if first == len(segments) - 1:
+        return tuple(segments)
+    return tuple(segments[:first]) + (RollupSegment.concat(segments[first:]),)
+
+
+class CommodityView:
+    """
+    The DistrictRollups of one commodity laid end to end: day i of district
+    k is found with one searchsorted over (k, day) pairs, and sums over a
+    range of days come from running totals. The rows of day i start at
+    cum_count[i].
+    """
+
+    def __init__(self, rollups):
+        self.rollups = rollups
+        self.districts = {(rollup.state.lower(), rollup.district.lower()): k for k, rollup in enumerate(rollups)}
+        by_state = {}
+        for (state, _), k in self.districts.items():
+            by_state.setdefault(state, []).append(k)
+        self.by_state = {state: np.array(ks) for state, ks in by_state.items()}
+
+        def concat(field):
+            return _concat([getattr(segment, field) for rollup in rollups for segment in rollup.segments], field)
+
+        n_days = np.array([rollup.n_days for rollup in rollups])
+        self.day_index = (np.repeat(np.arange(len(rollups), dtype=np.int64), n_days) << DAY_BITS) | (concat("days") + DAY_OFFSET)
+        self.cum_count = _prefix(concat("count"))
+        self.cum_modal = _prefix(concat("modal_sum"))
+        self.cum_spread = _prefix(concat("spread_sum"))
+        # One extra element so reduceat can take ranges that end at the last day
+        self.min_price = np.append(concat("min_price"), np.inf)
+        self.max_price = np.append(concat("max_price"), -np.inf)
+        self.row_market = concat("row_market")
+        self.row_modal = concat("row_modal")
+        self.row_spread = concat("row_spread")
+
+    def select(self, state=None, district=None):
+        """District numbers for an optional state and district filter"""
+        if district is not None:
+            if state is None:
+                return np.array([k for (_, name), k in self.districts.items() if name == district.lower()], dtype=np.intp)
+            k = self.districts.get((state.lower(), district.lower()))
+            return np.array([k] if k is not None else [], dtype=np.intp)
+        if state is not None:
+            return self.by_state.get(state.lower(), np.empty(0, dtype=np.intp))
+        return np.arange(len(self.rollups))
+
+    def day_ranges(self, districts, start_day, end_day):
+        """(districts, i, j) with days[i:j] of each district in range, dropping empty ones"""
+        base = districts.astype(np.int64) << DAY_BITS
+        low = np.clip(start_day + DAY_OFFSET, 0, (1 << DAY_BITS) - 1)
+        high = np.clip(end_day + DAY_OFFSET, 0, (1 << DAY_BITS) - 1)
+        i = np.searchsorted(self.day_index, base | low, side="left")
+        j = np.searchsorted(self.day_index, base | high, side="right")
+        keep = j > i
+        return districts[keep], i[keep], j[keep]
+
+    def summaries(self, districts, start_day, end_day):
+        districts, i, j = self.day_ranges(districts, start_day, end_day)
+        if not len(districts):
+            return []
+        records = self.cum_count[j] - self.cum_count[i]
+        bounds = np.column_stack((i, j)).ravel()
+        rows = _gather(self.cum_count[i], self.cum_count[j])
+        columns = np.round([
+            (self.cum_modal[j] - self.cum_modal[i]) / records,
+            _segment_medians(self.row_modal[rows], records),
+            np.minimum.reduceat(self.min_price, bounds)[::2],
+            np.maximum.reduceat(self.max_price, bounds)[::2],
+            (self.cum_spread[j] - self.cum_spread[i]) / records
+        ], 2).tolist()
+        return [
+            {
+                "state": self.rollups[k].state,
+                "district": self.rollups[k].district,
+                "records": n,
+                "mean_modal_price": mean_modal,
+                "median_modal_price": median,
+                "min_price": min_price,
+                "max_price": max_price,
+                "mean_spread": mean_spread
+            }
+            for k, n, mean_modal, median, min_price, max_price, mean_spread in zip(
+                districts.tolist(), records.tolist(), *columns)
+        ]
+
+    def market_means(self, districts, start_day, end_day, by):
+        """(district numbers, market codes, means of `by`, records) per (district, market) in range"""
+        districts, i, j = self.day_ranges(districts, start_day, end_day)
+        records = self.cum_count[j] - self.cum_count[i]
+        rows = _gather(self.cum_count[i], self.cum_count[j])
+        values = (self.row_spread if by == "spread" else self.row_modal)[rows]
+        pairs = np.repeat(districts.astype(np.int64), records) << DAY_BITS | self.row_market[rows]
+        groups, inverse = np.unique(pairs, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(groups))
+        means = np.bincount(inverse, weights=values, minlength=len(groups)) / counts
+        return groups >> DAY_BITS, groups & ((1 << DAY_BITS) - 1), means, counts
+
+
+class PriceRollups:
+    """
+    Daily rollups of the price history per (state, district, commodity),
+    looked up by lowercase commodity, then (state, district).
+
+    Built in one pass over the cleaned history (build_rollups), or loaded
+    from a snapshot written by save(). ingest() adds new rows: for each key
+    in the batch, the days from the batch's earliest day on are rebuilt
+    with the same pass into a new trailing segment, so the cost depends on
+    the batch, not on the history. The CommodityView of an updated
+    commodity is rebuilt on its next query. Rows with a missing key,
+    market, date or price are left out.
+    """
+
+    def __init__(self, df=None):
+        self._lock = threading.Lock()
+        self.markets = []          # market code -> name
+        self._market_codes = {}    # name -> market code
+        self.by_commodity = {}
+        self._views = {}           # commodity -> (version, CommodityView)
+        self._versions = {}        # commodity -> ingest count
+        self.latest_day = None
+        self.version = 0
+        self.rows = 0
+        if df is None:
+            return
+
+        df = self._valid_rows(df)
+        lower = pd.DataFrame({col: df[col].astype(str).str.lower() for col in ("state", "district", "commodity")})
+        key_codes = lower.groupby(list(lower.columns), sort=False).ngroup().to_numpy()
+        first_rows = pd.Series(np.arange(len(df))).groupby(key_codes).first().to_numpy()
+        key_names = [tuple(names) for names in df[["state", "district", "commodity"]].astype(str).to_numpy()[first_rows]]
+        keys = lower.to_numpy()[first_rows]
+
+        columns = self._row_columns(df)
+        for key_code, segment in build_rollups(key_codes, columns).items():
+            state, district, commodity = keys[key_code]
+            self.by_commodity.setdefault(commodity, {})[(state, district)] = DistrictRollup(
+                *key_names[key_code], (segment,))
+
+        self.rows = len(df)
+        if self.rows:
+            self.latest_day = int(columns[0].max())
+
+    @staticmethod
+    def _valid_rows(df):
+        valid = df[["state", "district", "market", "commodity", "arrival_date",
+                    "min_price", "max_price", "modal_price"]].notna().all(axis=1)
+        return df[valid.to_numpy()]
+
+    def _row_columns(self, df):
+        """(day, market code, modal, spread, min, max) arrays of cleaned rows"""
+        codes, names = pd.factorize(df["market"].astype(str))
+        for market in names:
+            if market not in self._market_codes:
+                self._market_codes[market] = len(self.markets)
+                self.markets.append(market)
+        market_codes = np.array([self._market_codes[market] for market in names], dtype=np.int64)[codes]
+
+        min_price = df["min_price"].to_numpy(dtype=float)
+        max_price = df["max_price"].to_numpy(dtype=float)
+        return [
+            df["arrival_date"].to_numpy().astype("datetime64[ns]").view(np.int64) // NS_PER_DAY,
+            market_codes,
+            df["modal_price"].to_numpy(dtype=float),
+            max_price - min_price,
+            min_price,
+            max_price
+        ]
+
+    def ingest(self, batch):
+        """Add new (already deduplicated) cleaned rows; rebuilds only the days they touch"""
+        with self._lock:
+            batch = self._valid_rows(batch)
+            if not len(batch):
+                return
+            columns = self._row_columns(batch)
+
+            # Batch rows numbered by key
+            key_numbers, key_names, keys = {}, [], []
+            key_codes = np.empty(len(batch), dtype=np.intp)
+            for row, (state, district, commodity) in enumerate(
+                    batch[["state", "district", "commodity"]].astype(str).itertuples(index=False, name=None)):
+                key = normalize_key(state, district, commodity)
+                code = key_numbers.get(key)
+                if code is None:
+                    code = key_numbers[key] = len(keys)
+                    keys.append(key)
+                    current = self.by_commodity.get(key[2], {}).get(key[:2])
+                    key_names.append((current.state, current.district, current.commodity)
+                                     if current is not None else (state, district, commodity))
+                key_codes[row] = code
+            first_day = np.full(len(keys), np.iinfo(np.int64).max)
+            np.minimum.at(first_day, key_codes, columns[0])
+
+            # Each key keeps its segments before the batch's earliest day; the rows
+            # from that day on are rebuilt together with the batch
+            kept = []
+            all_codes, all_columns = [key_codes], [[column] for column in columns]
+            for code, (state, district, commodity) in enumerate(keys):
+                current = self.by_commodity.get(commodity, {}).get((state, district))
+                keep, redo = split_segments(current.segments if current is not None else (), first_day[code])
+                kept.append(keep)
+                for segment in redo:
+                    all_codes.append(np.full(segment.n_rows, code))
+                    for merged, column in zip(all_columns, segment.row_columns()):
+                        merged.append(column)
+
+            rebuilt = build_rollups(np.concatenate(all_codes), [np.concatenate(column) for column in all_columns])
+            for code, segment in rebuilt.items():
+                state, district, commodity = keys[code]
+                self.by_commodity.setdefault(commodity, {})[(state, district)] = DistrictRollup(
+                    *key_names[code], merge_trailing(kept[code] + (segment,)))
+            for commodity in {key[2] for key in keys}:
+                self._versions[commodity] = self._versions.get(commodity, 0) + 1
+
+            self.rows += len(batch)
+            batch_latest = int(columns[0].max())
+            self.latest_day = batch_latest if self.latest_day is None else max(self.latest_day, batch_latest)
+            self.version += 1
+
+    # -------------------------------
+    # Snapshot
+    # -------------------------------
+    def save(self, directory):
+        """
+        Write the rollups into directory: rollups_<column>.npy with every
+        district's segments end to end, and rollups.pkl with the rest
+        """
+        with self._lock:
+            rollups = [rollup for by_key in self.by_commodity.values() for rollup in by_key.values()]
+            state = {
+                "keys": [(rollup.state, rollup.district, rollup.commodity) for rollup in rollups],
+                "n_days": [rollup.n_days for rollup in rollups],
+                "n_rows": [rollup.n_rows for rollup in rollups],
+                "markets": list(self.markets),
+                "latest_day": self.latest_day,
+                "rows": self.rows
+            }
+        for field in DAY_FIELDS + ROW_FIELDS:
+            np.save(os.path.join(directory, f"rollups_{field}.npy"),
+                    _concat([getattr(segment, field) for rollup in rollups for segment in rollup.segments], field))
+        with open(os.path.join(directory, "rollups.pkl"), "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, directory):
+        """Rollups written by save(), with their columns memory-mapped"""
+        with open(os.path.join(directory, "rollups.pkl"), "rb") as f:
+            state = pickle.load(f)
+        # Plain ndarray views of the maps: slicing an np.memmap is much slower
+        arrays = {field: np.load(os.path.join(directory, f"rollups_{field}.npy"), mmap_mode="r").view(np.ndarray)
+                  for field in DAY_FIELDS + ROW_FIELDS}
+
+        rollups = cls()
+        rollups.markets = state["markets"]
+        rollups._market_codes = {market: code for code, market in enumerate(rollups.markets)}
+        rollups.latest_day = state["latest_day"]
+        rollups.rows = state["rows"]
+        day_bounds = _prefix(state["n_days"]).tolist()
+        row_bounds = _prefix(state["n_rows"]).tolist()
+        for k, (state_name, district, commodity) in enumerate(state["keys"]):
+            d0, d1, r0, r1 = day_bounds[k], day_bounds[k + 1], row_bounds[k], row_bounds[k + 1]
+            segment = RollupSegment(*(arrays[field][d0:d1] for field in DAY_FIELDS),
+                                    *(arrays[field][r0:r1] for field in ROW_FIELDS))
+            state_key, district_key, commodity_key = normalize_key(state_name, district, commodity)
+            rollups.by_commodity.setdefault(commodity_key, {})[(state_key, district_key)] = DistrictRollup(
+                state_name, district, commodity, (segment,))
+        return rollups
+
+    # -------------------------------
+    # Queries
+    # -------------------------------
+    def date_range(self, start_date=None, end_date=None, days=None):
+        """
+        (start_day, end_day), inclusive. end_date defaults to the latest date
+        in the data and start_date to `days` (default 30) days before it.
+        """
+        end_day = _day(end_date) if end_date else self.latest_day
+        if end_day is None:
+            end_day = 0
+        start_day = _day(start_date) if start_date else end_day - (days or DEFAULT_RANGE_DAYS) + 1
+        return start_day, end_day
+
+    def district(self, state, district, commodity) -> Optional[DistrictRollup]:
+        return self.by_commodity.get(commodity.lower(), {}).get((state.lower(), district.lower()))
+
+    def view(self, commodity) -> Optional[CommodityView]:
+        """CommodityView of a commodity, rebuilt if an ingest changed it since"""
+        commodity = commodity.lower()
+        version = self._versions.get(commodity, 0)
+        cached = self._views.get(commodity)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        rollups = self.by_commodity.get(commodity)
+        if not rollups:
+            return None
+        # Districts in (state, district) order whatever order they were added in,
+        # so summaries come out the same after ingests as after a rebuild
+        view = CommodityView(sorted(rollups.values(), key=lambda rollup: (rollup.state, rollup.district)))
+        self._views[commodity] = (version, view)
+        return view
+
+    def summaries(self, commodity, start_day, end_day, state=None, district=None):
+        """Per-district stats over a date range (districts without records in it are left out)"""
+        view = self.view(commodity)
+        if view is None:
+            return []
+        return view.summaries(view.select(state, district), start_day, end_day)
+
+    def top_markets(self, commodity, start_day, end_day, k, by="spread", ascending=False, state=None, district=None):
+        """The k markets with the highest (lowest if ascending) mean `by` over a date range"""
+        view = self.view(commodity)
+        if view is None:
+            return []
+        districts, markets, means, records = view.market_means(view.select(state, district), start_day, end_day, by)
+        if not len(means):
+            return []
+
+        ranked = means if ascending else -means
+        k = min(k, len(ranked))
+        top = np.argpartition(ranked, k - 1)[:k]
+        top = top[np.argsort(ranked[top], kind="stable")]
+        return [
+            {
+                "market": self.markets[markets[i]],
+                "state": view.rollups[districts[i]].state,
+                "district": view.rollups[districts[i]].district,
+                f"mean_{by}": round(float(means[i]), 2),
+                "records": int(records[i])
+            }
+            for i in top.tolist()
+        ]
+
+    def stats(self):
+        return {
+            "rows": self.rows,
+            "keys": sum(len(rollups) for rollups in self.by_commodity.values()),
+            "commodities": len(self.by_commodity),
+            "markets": len(self.markets),
+            "latest_date": format_day(self.latest_day) if self.latest_day is not None else None,
+            "version": self.version
+        }
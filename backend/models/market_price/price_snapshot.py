@@ -0,0 +1,246 @@
+# Columnar on-disk snapshot of the mandi price history and its index
+#
+# Layout of a snapshot directory:
+#   meta.json          format version, source CSV mtime/size/sha256, row count,
+#                      categorical dictionaries, journal offset
+#   <column>.npy       presorted columns: int32 codes for state/district/market/
+#                      commodity, int64 nanosecond arrival_date, float64 prices
+#   index_order.npy    MarketPriceIndex presorted order
+#   seen_hashes.npy    sorted row hashes used to deduplicate ingested batches
+#   index.pkl          the rest of MarketPriceIndex (per-key entries, per-market
+#                      last-3 windows); its size depends on the number of
+#                      markets, not on the number of days of history
+#   rollups_<column>.npy, rollups.pkl
+#                      PriceRollups (see PriceRollups.save)
+#
+# All .npy files are loaded with mmap_mode="r", so loading does not read them.
+#
+# The index and rollups also hold the rows of the ingest journal
+# (price_journal.py) up to the journal offset; compact_snapshot moves the
+# offset forward so a start replays only the rows ingested since.
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from price_index import MarketPriceIndex, clean_price_frame
+from price_rollups import PriceRollups
+
+SNAPSHOT_FORMAT_VERSION = 4
+CATEGORICAL_COLUMNS = ["state", "district", "market", "commodity"]
+PRICE_VALUE_COLUMNS = ["min_price", "max_price", "modal_price"]
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PriceHistory:
+    """
+    Typed, presorted columnar price history: categorical codes with their
+    dictionaries, int64 nanosecond dates and float64 prices
+    """
+
+    def __init__(self, codes, categories, dates_ns, prices):
+        self.codes = codes              # column -> int32 array (-1 = missing)
+        self.categories = categories    # column -> np.array of labels
+        self.dates_ns = dates_ns        # int64 array
+        self.prices = prices            # column -> float64 array
+
+    def __len__(self):
+        return len(self.dates_ns)
+
+    @classmethod
+    def from_frame(cls, df):
+        """From a cleaned DataFrame, keeping its row order"""
+        codes, categories = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            col_codes, col_categories = pd.factorize(df[col])
+            codes[col] = col_codes.astype(np.int32)
+            categories[col] = np.asarray(col_categories, dtype=object)
+        dates_ns = df["arrival_date"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        prices = {col: df[col].to_numpy(dtype=np.float64) for col in PRICE_VALUE_COLUMNS}
+        return cls(codes, categories, dates_ns, prices)
+
+    def to_frame(self):
+        """DataFrame view with the same columns clean_price_frame produces"""
+        data = {
+            col: pd.Categorical.from_codes(self.codes[col], categories=self.categories[col])
+            for col in CATEGORICAL_COLUMNS
+        }
+        data["arrival_date"] = np.asarray(self.dates_ns).view("datetime64[ns]")
+        for col in PRICE_VALUE_COLUMNS:
+            data[col] = self.prices[col]
+        return pd.DataFrame(data)
+
+
+def _csv_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"csv_mtime_ns": stat.st_mtime_ns, "csv_size": stat.st_size}
+
+
+def snapshot_is_current(snapshot_dir, csv_path):
+    """
+    True if the snapshot was built from the current CSV. A matching mtime and
+    size is trusted; otherwise the CSV's sha256 decides (and a match refreshes
+    the recorded mtime, e.g. after a copy or checkout).
+    """
+    meta_path = os.path.join(snapshot_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        return False
+
+    signature = _csv_signature(csv_path)
+    if meta.get("csv_mtime_ns") == signature["csv_mtime_ns"] and meta.get("csv_size") == signature["csv_size"]:
+        return True
+    if meta.get("csv_size") != signature["csv_size"] or meta.get("csv_sha256") != file_sha256(csv_path):
+        return False
+
+    meta.update(signature)
+    fd, tmp_path = tempfile.mkstemp(dir=snapshot_dir, prefix="meta.json.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+    return True
+
+
+def _make_tmp_dir(snapshot_dir):
+    # Unique per writer, next to the snapshot so the final rename stays on one filesystem
+    parent, name = os.path.split(os.path.abspath(snapshot_dir))
+    os.makedirs(parent, exist_ok=True)
+    return tempfile.mkdtemp(dir=parent, prefix=f"{name}.tmp-")
+
+
+def _replace_dir(tmp_dir, snapshot_dir):
+    # Move the old snapshot aside with a rename, so it is never seen half-deleted;
+    # processes that memory-mapped its files keep them until they unmap them
+    old_dir = None
+    if os.path.exists(snapshot_dir):
+        old_dir = tempfile.mkdtemp(dir=os.path.dirname(tmp_dir), prefix=f"{os.path.basename(snapshot_dir)}.old-")
+        os.replace(snapshot_dir, os.path.join(old_dir, "snapshot"))
+    os.replace(tmp_dir, snapshot_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def _write_state(tmp_dir, index, rollups, meta):
+    with open(os.path.join(tmp_dir, "index.pkl"), "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+    rollups.save(tmp_dir)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def write_snapshot(snapshot_dir, csv_path, history, index, rollups):
+    """Write history, index and rollups to snapshot_dir, replacing it atomically; returns its meta"""
+    tmp_dir = _make_tmp_dir(snapshot_dir)
+
+    for col in CATEGORICAL_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), history.codes[col])
+    np.save(os.path.join(tmp_dir, "arrival_date.npy"), history.dates_ns)
+    for col in PRICE_VALUE_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{col}.npy"), history.prices[col])
+    np.save(os.path.join(tmp_dir, "index_order.npy"), index.order)
+    np.save(os.path.join(tmp_dir, "seen_hashes.npy"), index._seen_base)
+
+    meta = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "n_rows": len(history),
+        "csv_sha256": file_sha256(csv_path),
+        "categories": {col: [str(c) for c in history.categories[col]] for col in CATEGORICAL_COLUMNS},
+        "journal_offset": 0,
+        **_csv_signature(csv_path)
+    }
+    _write_state(tmp_dir, index, rollups, meta)
+    _replace_dir(tmp_dir, snapshot_dir)
+    return meta
+
+
+def compact_snapshot(snapshot_dir, meta, index, rollups, journal_offset):
+    """
+    Replace the index and rollups of the snapshot described by meta (as
+    loaded) with ones that include the ingest journal up to journal_offset,
+    keeping its history columns. The caller keeps the index and rollups
+    from changing meanwhile. Returns the journal offset the snapshot now
+    records, or None if the snapshot was rebuilt from another CSV since.
+    """
+    meta_path = os.path.join(snapshot_dir, "meta.json")
+    try:
+        with open(meta_path) as f:
+            current = json.load(f)
+    except FileNotFoundError:
+        return None
+    if (current.get("format_version"), current.get("csv_sha256")) != (SNAPSHOT_FORMAT_VERSION, meta["csv_sha256"]):
+        return None
+    if current["journal_offset"] >= journal_offset:
+        return current["journal_offset"]
+
+    tmp_dir = _make_tmp_dir(snapshot_dir)
+    for name in os.listdir(snapshot_dir):
+        if name.endswith(".npy") and not name.startswith("rollups_"):
+            # Unchanged columns: hard links, so compaction does not copy the history
+            try:
+                os.link(os.path.join(snapshot_dir, name), os.path.join(tmp_dir, name))
+            except OSError:
+                shutil.copy2(os.path.join(snapshot_dir, name), os.path.join(tmp_dir, name))
+    _write_state(tmp_dir, index, rollups, {**current, "journal_offset": journal_offset})
+    _replace_dir(tmp_dir, snapshot_dir)
+    return journal_offset
+
+
+def read_snapshot(snapshot_dir):
+    """Memory-map a snapshot: returns (history, index, rollups, meta)"""
+    with open(os.path.join(snapshot_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    def column(name):
+        return np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode="r")
+
+    history = PriceHistory(
+        codes={col: column(col) for col in CATEGORICAL_COLUMNS},
+        categories={col: np.asarray(meta["categories"][col], dtype=object) for col in CATEGORICAL_COLUMNS},
+        dates_ns=column("arrival_date"),
+        prices={col: column(col) for col in PRICE_VALUE_COLUMNS}
+    )
+    with open(os.path.join(snapshot_dir, "index.pkl"), "rb") as f:
+        index = pickle.load(f)
+    index.attach_arrays(column("index_order"), column("seen_hashes"))
+    return history, index, PriceRollups.load(snapshot_dir), meta
+
+
+def load_price_data(csv_path, snapshot_dir=None):
+    """
+    Returns (history, index, rollups, meta, source). Uses the snapshot when
+    it matches the CSV; otherwise parses the CSV, builds the index and the
+    rollups and (re)writes the snapshot. meta is the snapshot's meta.json
+    (None without snapshot_dir); its journal_offset is how much of the
+    ingest journal the index and rollups already hold. Processes sharing
+    snapshot_dir call it under one lock (the app uses the journal's), so
+    only one of them rebuilds a stale snapshot.
+    """
+    start = time.perf_counter()
+    if snapshot_dir and snapshot_is_current(snapshot_dir, csv_path):
+        history, index, rollups, meta = read_snapshot(snapshot_dir)
+        return history, index, rollups, meta, f"snapshot ({time.perf_counter() - start:.2f}s)"
+
+    df = clean_price_frame(pd.read_csv(csv_path))
+    df = df.sort_values(by=["state", "district", "commodity", "arrival_date"]).reset_index(drop=True)
+    history = PriceHistory.from_frame(df)
+    index = MarketPriceIndex(df)
+    rollups = PriceRollups(df)
+    meta = write_snapshot(snapshot_dir, csv_path, history, index, rollups) if snapshot_dir else None
+    return history, index, rollups, meta, f"csv ({time.perf_counter() - start:.2f}s)"
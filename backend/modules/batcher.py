@@ -0,0 +1,147 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised by DynamicBatcher.submit when the queue is at max_queue"""
+
+
+class BatcherStoppedError(Exception):
+    """Raised by DynamicBatcher.submit for items still pending when the batcher stops"""
+
+
+class DynamicBatcher:
+    """
+    Collects single requests into batches for one model call.
+
+    A batch is flushed when it reaches max_batch_size items or when
+    max_wait_ms has passed since its first item arrived. Batches run one at
+    a time on a dedicated worker thread, so the event loop keeps accepting
+    (and batching) requests while the model runs. infer_fn takes a list of
+    items and returns a list of results in the same order; a batch whose
+    result count does not match fails every item in it.
+    """
+
+    def __init__(self, infer_fn, max_batch_size=8, max_wait_ms=10.0, max_queue=64, name="batcher"):
+        self.infer_fn = infer_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.name = name
+
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self._batch = []  # the batch being collected or run
+
+        # Metrics
+        self.submitted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.items = 0
+        self.inference_seconds = 0.0
+        self.batch_sizes = {}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.name)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Fail whatever is still waiting, so no caller hangs on a batcher that is gone
+        error = BatcherStoppedError(f"{self.name} stopped")
+        pending = self._batch
+        self._batch = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(error)
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        if self._task is None:
+            raise BatcherStoppedError(f"{self.name} is not running")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue} pending)")
+        self.submitted += 1
+        return await future
+
+    async def _collect(self):
+        # Wait for the first item, then fill the batch until it is full or the wait expires
+        loop = asyncio.get_running_loop()
+        batch = self._batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            # Callers that gave up do not need a result
+            batch = self._batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(self._executor, self.infer_fn, [item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: infer_fn returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._batch = []
+                continue
+            finally:
+                self.inference_seconds += time.perf_counter() - start
+
+            self.batches += 1
+            self.items += len(batch)
+            self.batch_sizes[len(batch)] = self.batch_sizes.get(len(batch), 0) + 1
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+            self._batch = []
+
+    def metrics(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "avg_batch_fill": self.items / (self.batches * self.max_batch_size) if self.batches else 0.0,
+            "avg_inference_ms": self.inference_seconds * 1000 / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items()))
+        }
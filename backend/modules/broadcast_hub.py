@@ -0,0 +1,205 @@
+import asyncio
+import json
+import time
+
+from starlette.websockets import WebSocketState
+
+from pubsub import InProcessPubSub
+
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+
+
+class Connection:
+    """
+    One WebSocket in a group, with a bounded outbound queue drained by its
+    own writer task, so a slow client only ever delays itself.
+    """
+
+    def __init__(self, hub, websocket, group):
+        self.hub = hub
+        self.websocket = websocket
+        self.group = group
+        self.queue = asyncio.Queue(maxsize=hub.queue_size)
+        self.dropped = 0
+        self.closed = False
+        self._writer = asyncio.create_task(self._write())
+
+    def offer(self, message):
+        """Queue a message without waiting; applies the slow-consumer policy when full"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.hub.policy == "disconnect":
+            self.hub.slow_disconnects += 1
+            self.hub._track(asyncio.create_task(self.close(code=1008, reason="Client too slow")))
+            return False
+
+        # drop_oldest: the client misses old messages but stays current
+        self.queue.get_nowait()
+        self.queue.put_nowait(message)
+        self.dropped += 1
+        self.hub.dropped += 1
+        return True
+
+    async def _write(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message), self.hub.send_timeout)
+                self.hub.delivered += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.hub.slow_disconnects += 1
+            await self.close(code=1008, reason="Send timed out")
+        except Exception:
+            # Socket already gone; the receive loop sees the disconnect and cleans up
+            await self.close()
+
+    async def close(self, code=1000, reason=None):
+        if self.closed:
+            return
+        self.closed = True
+        self.hub._remove(self)
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if self.websocket.application_state == WebSocketState.CONNECTED:
+            try:
+                await self.websocket.close(code=code, reason=reason)
+            except Exception:
+                pass
+
+
+class BroadcastHub:
+    """
+    WebSocket groups with concurrent fan-out.
+
+    Groups are created on first join and removed when their last member
+    leaves. publish() formats a message once and only enqueues it on each
+    member's queue; per-connection writer tasks do the sends concurrently.
+    When a member's queue (queue_size messages) is full, policy decides:
+    "drop_oldest" discards its oldest pending message, "disconnect" closes
+    it. A send that takes longer than send_timeout seconds also closes it.
+
+    The pubsub backend (pubsub.py) links hubs in other workers: published
+    messages are forwarded to them, messages they publish arrive through
+    deliver(), and member_count() covers the whole group across nodes.
+    """
+
+    def __init__(self, queue_size=100, policy="drop_oldest", send_timeout=5.0, pubsub=None):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {policy} (expected one of {SLOW_CONSUMER_POLICIES})")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.groups = {}
+        self.pubsub = pubsub if pubsub is not None else InProcessPubSub()
+
+        # Metrics
+        self.published = 0
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.slow_disconnects = 0
+        self.fanout_seconds = 0.0
+        self.remote_received = 0
+
+        # Close tasks started from synchronous code; the event loop only keeps
+        # weak references to tasks, so they are held here until they finish
+        self._closing = set()
+
+    def _track(self, task):
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def start(self):
+        await self.pubsub.start(self.deliver)
+
+    async def stop(self):
+        await self.pubsub.stop()
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def join(self, websocket, group):
+        """Add an accepted WebSocket to a group (created on demand)"""
+        connection = Connection(self, websocket, group)
+        members = self.groups.get(group)
+        if members is None:
+            members = self.groups[group] = set()
+            self.pubsub.subscribe(group)
+        members.add(connection)
+        self.pubsub.set_presence(group, len(members))
+        return connection
+
+    async def leave(self, connection):
+        await connection.close()
+
+    def _remove(self, connection):
+        members = self.groups.get(connection.group)
+        if members is None:
+            return
+        members.discard(connection)
+        if members:
+            self.pubsub.set_presence(connection.group, len(members))
+        else:
+            del self.groups[connection.group]
+            self.pubsub.unsubscribe(connection.group)
+
+    def group_size(self, group):
+        """Members connected to this hub"""
+        return len(self.groups.get(group, ()))
+
+    def member_count(self, group):
+        """Members across every node sharing the pub/sub backend"""
+        return self.pubsub.member_count(group)
+
+    def _fanout(self, group, message, exclude=None):
+        queued = 0
+        for connection in list(self.groups.get(group, ())):
+            if connection is not exclude and connection.offer(message):
+                queued += 1
+        self.enqueued += queued
+        return queued
+
+    def publish(self, group, message, exclude=None):
+        """
+        Send a message (str, or anything JSON-serializable) to every member
+        of a group except exclude, on this node and through the pub/sub
+        backend on the others. Returns the number of local members it was
+        queued for.
+        """
+        start = time.perf_counter()
+        if not isinstance(message, str):
+            message = json.dumps(message)
+
+        queued = self._fanout(group, message, exclude)
+        self.pubsub.publish(group, message)
+
+        self.published += 1
+        self.fanout_seconds += time.perf_counter() - start
+        return queued
+
+    def deliver(self, group, message):
+        """Fan out a message published by another node to local members"""
+        self.remote_received += 1
+        self._fanout(group, message)
+
+    def metrics(self):
+        return {
+            "groups": len(self.groups),
+            "connections": sum(len(members) for members in self.groups.values()),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "published": self.published,
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "avg_fanout_ms": self.fanout_seconds * 1000 / self.published if self.published else 0.0,
+            "remote_received": self.remote_received,
+            "pubsub": self.pubsub.metrics()
+        }
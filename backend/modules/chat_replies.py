@@ -0,0 +1,305 @@
+# Queued WhatsApp replies for the Twilio webhook
+#
+# The webhook only enqueues (to_number, question) and returns; worker tasks
+# ask the LLM for an answer and send it back through the messaging client.
+#
+#   CHAT_BACKEND=gemini   Gemini model from the registry (default)
+#   CHAT_BACKEND=fake     canned answer after FAKE_LLM_LATENCY_MS
+#   REPLY_SENDER=twilio   one shared, connection-pooled Twilio client (default)
+#   REPLY_SENDER=fake     records replies in memory after FAKE_SEND_LATENCY_MS
+
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+
+from batcher import QueueFullError
+from instrumentation import stage
+from result_cache import PredictionCache
+
+log = logging.getLogger(__name__)
+
+PROMPT = "Give an appropriate response to {question}. Answer in  only one line."
+
+
+class GeminiResponder:
+    """Answers with the registry's chat model; generate_content runs off the event loop"""
+
+    name = "gemini"
+
+    def __init__(self, registry, model_name="chat"):
+        self.registry = registry
+        self.model_name = model_name
+
+    async def answer(self, question):
+        await self.registry.wait(self.model_name)
+        model = self.registry.get(self.model_name)
+        response = await asyncio.to_thread(model.generate_content, PROMPT.format(question=question))
+        return response.text
+
+
+class FakeResponder:
+    name = "fake"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def answer(self, question):
+        await asyncio.sleep(self.latency)
+        return f"Reply to: {question}"
+
+
+class TwilioSender:
+    """
+    One Twilio client for the whole process. Its HTTP client keeps a pooled
+    requests session, so consecutive sends reuse the TLS connection.
+    """
+
+    name = "twilio"
+
+    def __init__(self, account_sid, auth_token, from_number, timeout=10.0):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self.timeout = timeout
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            # twilio is imported on first send, like google.generativeai in load_chat_model
+            from twilio.http.http_client import TwilioHttpClient
+            from twilio.rest import Client
+
+            http_client = TwilioHttpClient(pool_connections=True, timeout=self.timeout)
+            self._client = Client(self.account_sid, self.auth_token, http_client=http_client)
+        return self._client
+
+    async def send(self, to_number, body):
+        client = self._get_client()
+        await asyncio.to_thread(client.messages.create, from_=self.from_number, body=body, to=to_number)
+
+    def retryable(self, error):
+        """
+        Whether a failed send can be retried without risking a duplicate
+        message: only if Twilio cannot have received the request, because
+        the connection was never established or Twilio answered 429. A
+        timeout or a connection dropped after the request went out may
+        have sent it, and Twilio has no idempotency key for messages.
+        """
+        from requests.exceptions import ConnectionError, ConnectTimeout
+        from twilio.base.exceptions import TwilioRestException
+        from urllib3.exceptions import NewConnectionError
+
+        if isinstance(error, TwilioRestException):
+            return error.status == 429
+        if isinstance(error, ConnectTimeout):
+            return True
+        if isinstance(error, ConnectionError):
+            # requests wraps urllib3's MaxRetryError, whose reason says how it failed
+            reason = getattr(error.args[0] if error.args else None, "reason", None)
+            return isinstance(reason, NewConnectionError)
+        return False
+
+
+class FakeSender:
+    name = "fake"
+
+    def __init__(self, latency=0.0, keep=1000):
+        self.latency = latency
+        self.keep = keep
+        self.sent = []
+
+    async def send(self, to_number, body):
+        await asyncio.sleep(self.latency)
+        self.sent.append((to_number, body))
+        del self.sent[:-self.keep]
+
+    def retryable(self, error):
+        return True
+
+
+def normalize_question(question):
+    # "Hi!", "hi !" and " HI! " share one cache entry
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+class ReplyQueue:
+    """
+    Bounded queue of incoming messages drained by `workers` tasks.
+
+    At most llm_concurrency LLM requests run at once (a call waiting to
+    retry does not count), and concurrent copies of the same question
+    share one call. Answers are cached per normalized
+    question text. LLM calls that raise are retried up to max_retries
+    times with jittered exponential backoff starting at backoff seconds;
+    sends are retried the same way, but only for errors the sender's
+    retryable() says cannot have delivered the message. A message that
+    still fails is dropped and counted.
+    """
+
+    def __init__(self, responder, sender, workers=8, llm_concurrency=4, max_queue=1000,
+                 cache_size=1024, max_retries=3, backoff=0.5, name="replies"):
+        self.responder = responder
+        self.sender = sender
+        self.workers = workers
+        self.llm_concurrency = llm_concurrency
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.name = name
+        self.cache = PredictionCache(responder.name, max_size=cache_size, name=name)
+
+        self._queue = None
+        self._llm_slots = None
+        self._in_flight = {}
+        self._tasks = []
+
+        # Metrics
+        self.enqueued = 0
+        self.rejected = 0
+        self.sent = 0
+        self.failed = 0
+        self.llm_calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.latency_seconds = 0.0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._llm_slots = asyncio.Semaphore(self.llm_concurrency)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, to_number, question):
+        """Queue a reply without waiting; raises QueueFullError at max_queue"""
+        try:
+            self._queue.put_nowait((to_number, question, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue} messages)")
+        self.enqueued += 1
+
+    async def join(self):
+        """Wait until every queued message has been handled"""
+        await self._queue.join()
+
+    async def _retry(self, fn, *args, retryable=None):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt == self.max_retries or (retryable is not None and not retryable(e)):
+                    raise
+                self.retries += 1
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                log.warning("Retrying", extra={"queue": self.name, "error": f"{type(e).__name__}: {e}", "delay_s": round(delay, 2)})
+                await asyncio.sleep(delay)
+
+    async def _llm_attempt(self, question):
+        # One slot per attempt: a call waiting out its backoff does not hold one
+        async with self._llm_slots:
+            return await self.responder.answer(question)
+
+    async def _call_llm(self, question):
+        self.llm_calls += 1
+        with stage("llm"):
+            return await self._retry(self._llm_attempt, question)
+
+    async def answer(self, question):
+        key = (self.cache.model_version, "text", normalize_question(question))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._in_flight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        start = time.perf_counter()
+        pending = asyncio.ensure_future(self._call_llm(question))
+        self._in_flight[key] = pending
+        try:
+            answer = await asyncio.shield(pending)
+        finally:
+            del self._in_flight[key]
+        self.cache.put(key, answer, time.perf_counter() - start)
+        return answer
+
+    async def _work(self):
+        while True:
+            to_number, question, queued_at = await self._queue.get()
+            try:
+                answer = await self.answer(question)
+                with stage("reply_send"):
+                    await self._retry(self.sender.send, to_number, answer, retryable=self.sender.retryable)
+                self.sent += 1
+                self.latency_seconds += time.perf_counter() - queued_at
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log.error("Giving up on reply", extra={"queue": self.name, "to": to_number, "error": f"{type(e).__name__}: {e}"})
+            finally:
+                self._queue.task_done()
+
+    def metrics(self):
+        return {
+            "responder": self.responder.name,
+            "sender": self.sender.name,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "llm_concurrency": self.llm_concurrency,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "sent": self.sent,
+            "failed": self.failed,
+            "llm_calls": self.llm_calls,
+            "coalesced": self.coalesced,
+            "retries": self.retries,
+            "avg_reply_ms": self.latency_seconds * 1000 / self.sent if self.sent else 0.0,
+            "cache": self.cache.stats()
+        }
+
+
+def create_reply_queue(registry):
+    """ReplyQueue configured from the environment (see the top of this file)"""
+    chat_backend = os.getenv("CHAT_BACKEND", "gemini")
+    if chat_backend == "gemini":
+        responder = GeminiResponder(registry)
+    elif chat_backend == "fake":
+        responder = FakeResponder(float(os.getenv("FAKE_LLM_LATENCY_MS", "500")) / 1000)
+    else:
+        raise ValueError(f"Unknown chat backend: {chat_backend} (expected gemini or fake)")
+
+    reply_sender = os.getenv("REPLY_SENDER", "twilio")
+    if reply_sender == "twilio":
+        sender = TwilioSender(
+            os.getenv("account_sid"),
+            os.getenv("auth_token"),
+            os.getenv("TWILIO_WHATSAPP_FROM", "whatsapp:+14155238886")
+        )
+    elif reply_sender == "fake":
+        sender = FakeSender(float(os.getenv("FAKE_SEND_LATENCY_MS", "100")) / 1000)
+    else:
+        raise ValueError(f"Unknown reply sender: {reply_sender} (expected twilio or fake)")
+
+    return ReplyQueue(
+        responder,
+        sender,
+        workers=int(os.getenv("REPLY_WORKERS", "8")),
+        llm_concurrency=int(os.getenv("LLM_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("REPLY_QUEUE_DEPTH", "1000")),
+        cache_size=int(os.getenv("REPLY_CACHE_SIZE", "1024")),
+        max_retries=int(os.getenv("REPLY_MAX_RETRIES", "3"))
+    )
@@ -0,0 +1,66 @@
+# Export the disease classifier and the pest detector to ONNX for inference_backends.py
+#
+#   python export_onnx.py disease --output plant_disease.onnx --quantize
+#   python export_onnx.py pest --model ../models/best.pt --output best.onnx --quantize
+#
+# --quantize also writes <output>.int8.onnx with INT8 dynamic quantization of
+# the weights (activations are quantized at run time, no calibration data).
+
+import argparse
+import os
+import shutil
+
+
+def quantize(onnx_path):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    root, ext = os.path.splitext(onnx_path)
+    quantized_path = f"{root}.int8{ext}"
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+def export_disease(model_path, output):
+    from keras.models import load_model
+
+    if model_path is None:
+        from huggingface_hub import hf_hub_download
+        model_path = hf_hub_download(repo_id="calvinCandieC137/Plant_Disease", filename="plant_disease_model_finetuned.h5")
+    model = load_model(model_path, compile=False)
+    model.export(output, format="onnx")
+    return output
+
+
+def export_pest(model_path, output, imgsz):
+    from ultralytics import YOLO
+
+    # Dynamic axes so the batcher can send any batch size
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(output):
+        shutil.move(exported, output)
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the disease and pest models to ONNX")
+    parser.add_argument("target", choices=["disease", "pest"])
+    parser.add_argument("--model", help="Source model (.h5 for disease, .pt for pest); disease defaults to the Hugging Face download")
+    parser.add_argument("--output", required=True, help="Path of the .onnx file to write")
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("PEST_INPUT_SIZE", "640")), help="Pest detector input size")
+    parser.add_argument("--quantize", action="store_true", help="Also write an INT8 dynamic-quantized copy")
+    args = parser.parse_args()
+
+    if args.target == "disease":
+        path = export_disease(args.model, args.output)
+    else:
+        if args.model is None:
+            parser.error("--model is required for the pest detector")
+        path = export_pest(args.model, args.output, args.imgsz)
+    print(f"Wrote {path}")
+
+    if args.quantize:
+        print(f"Wrote {quantize(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+
+class BatchPreprocessor:
+    """
+    Decode, resize and normalize a batch of images into one model input.
+
+    Images (PIL images, bytes or binary file objects) are resized straight
+    into a preallocated uint8 NHWC buffer, then the whole batch is converted
+    to float32 and normalized in place in one vectorized step:
+
+        out = (pixels / scale - mean) / std
+
+    With letterbox=True each image keeps its aspect ratio: it is resized to
+    fit the target and centred on pad_value borders, as YOLO's own
+    preprocessing does; to_image_coords maps boxes back. Otherwise images
+    are stretched to the target size.
+
+    draft=True lets JPEG bytes decode at a reduced 1/2^n scale that still
+    covers the target. That is much faster for large photos but not
+    identical to decoding at full size and resizing (pixel differences of a
+    few percent), so it is opt-in for models validated with it.
+
+    Buffers are kept per thread and grow only when a larger batch arrives,
+    so the steady state allocates nothing per image. The returned array is a
+    view of the calling thread's buffer and is overwritten by that thread's
+    next call; use it (or copy it) before preprocessing again.
+
+    With workers > 1, decoding and resizing run on a thread pool: PIL
+    releases the GIL while it decodes and resamples, so a batch spreads
+    across cores.
+    """
+
+    def __init__(self, target_size, scale=255.0, mean=None, std=None,
+                 resample=Image.BICUBIC, draft=False, letterbox=False, pad_value=114, workers=None):
+        self.target_size = tuple(target_size)  # (width, height), as PIL uses
+        self.scale = np.float32(scale)
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.std = None if std is None else np.asarray(std, dtype=np.float32)
+        self.resample = resample
+        self.draft = draft
+        self.letterbox = letterbox
+        self.pad_value = pad_value
+        self._local = threading.local()
+        self._executor = None
+        if workers and workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preprocess")
+
+    def _buffers(self, n):
+        local = self._local
+        if getattr(local, "pixels", None) is None or local.pixels.shape[0] < n:
+            width, height = self.target_size
+            local.pixels = np.empty((n, height, width, 3), dtype=np.uint8)
+            local.inputs = np.empty((n, height, width, 3), dtype=np.float32)
+        return local.pixels, local.inputs
+
+    def _load(self, source):
+        if isinstance(source, Image.Image):
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        img = Image.open(source)
+        if self.draft:
+            # JPEG only: decode at the smallest 1/2^n scale still covering the target
+            img.draft("RGB", self.target_size)
+        return img
+
+    def placement(self, size):
+        """
+        (scale_x, scale_y, left, top, width, height) of an image of size
+        (width, height) in the target: its resized size and offset
+        """
+        width, height = size
+        target_width, target_height = self.target_size
+        if not self.letterbox:
+            return target_width / width, target_height / height, 0, 0, target_width, target_height
+        ratio = min(target_width / width, target_height / height)
+        new_width = min(target_width, max(1, round(width * ratio)))
+        new_height = min(target_height, max(1, round(height * ratio)))
+        return (ratio, ratio, (target_width - new_width) // 2, (target_height - new_height) // 2,
+                new_width, new_height)
+
+    def to_image_coords(self, boxes, size):
+        """xyxy boxes in target pixels mapped to an image of size (width, height)"""
+        scale_x, scale_y, left, top, _, _ = self.placement(size)
+        boxes = (np.asarray(boxes, dtype=np.float32).reshape(-1, 4) - [left, top, left, top]) / [
+            scale_x, scale_y, scale_x, scale_y]
+        width, height = size
+        return np.clip(boxes, 0, [width, height, width, height])
+
+    def _fill(self, pixels, i, source):
+        img = self._load(source)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        _, _, left, top, width, height = self.placement(img.size)
+        if img.size != (width, height):
+            img = img.resize((width, height), self.resample)
+        if (width, height) == self.target_size:
+            pixels[i] = np.asarray(img)
+            return
+        # Letterbox: pad the borders, then the image in the middle
+        pixels[i, :top] = self.pad_value
+        pixels[i, top + height:] = self.pad_value
+        pixels[i, top:top + height, :left] = self.pad_value
+        pixels[i, top:top + height, left + width:] = self.pad_value
+        pixels[i, top:top + height, left:left + width] = np.asarray(img)
+
+    def preprocess(self, images):
+        """Returns a float32 (n, height, width, 3) array for a list of images"""
+        n = len(images)
+        pixels, inputs = self._buffers(n)
+
+        if self._executor is not None and n > 1:
+            list(self._executor.map(self._fill, [pixels] * n, range(n), images))
+        else:
+            for i, source in enumerate(images):
+                self._fill(pixels, i, source)
+
+        out = inputs[:n]
+        np.divide(pixels[:n], self.scale, out=out, dtype=np.float32)
+        if self.mean is not None:
+            np.subtract(out, self.mean, out=out)
+        if self.std is not None:
+            np.divide(out, self.std, out=out)
+        return out
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,95 @@
+import io
+import os
+
+from fastapi import HTTPException, Request
+from PIL import Image, UnidentifiedImageError
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartParser
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(40_000_000)))
+
+RAW_CONTENT_TYPES = ("image/", "application/octet-stream")
+
+
+async def _limited_stream(request: Request, max_bytes):
+    # Stop reading as soon as the body goes over the limit, whatever Content-Length said
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload larger than {max_bytes} bytes")
+        yield chunk
+
+
+async def read_image_upload(request: Request, max_bytes=MAX_UPLOAD_BYTES, field="image"):
+    """
+    Read an image sent either as a raw image/* (or application/octet-stream)
+    body or as a multipart/form-data file field, and return a binary file
+    object positioned at the image data. The body is streamed: raw bodies
+    are joined once into a single buffer and multipart files are spooled by
+    the parser, so there is no base64 text or JSON document held alongside
+    the image.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if declared > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload larger than {max_bytes} bytes")
+
+    content_type = request.headers.get("content-type", "")
+    stream = _limited_stream(request, max_bytes)
+
+    if content_type.startswith(RAW_CONTENT_TYPES):
+        # join() on a single chunk returns it as-is, and BytesIO shares a bytes buffer
+        body = b"".join([chunk async for chunk in stream])
+        if not body:
+            raise HTTPException(status_code=400, detail="Empty image body")
+        return io.BytesIO(body)
+
+    if content_type.startswith("multipart/form-data"):
+        parser = MultiPartParser(request.headers, stream, max_files=1, max_fields=16)
+        form = await parser.parse()
+        upload = form.get(field)
+        if not isinstance(upload, UploadFile):
+            upload = next((value for value in form.values() if isinstance(value, UploadFile)), None)
+        if upload is None:
+            raise HTTPException(status_code=400, detail=f"No file in form field '{field}'")
+        upload.file.seek(0)
+        return upload.file
+
+    raise HTTPException(
+        status_code=415,
+        detail="Send the image as an image/* body or as a multipart/form-data file"
+    )
+
+
+def decode_upload(fileobj, draft_size=None, max_pixels=MAX_IMAGE_PIXELS):
+    """
+    Decode an uploaded image to RGB and close fileobj.
+
+    The header is checked against max_pixels before any pixel data is
+    decoded. For JPEGs, draft_size=(width, height) lets the decoder scale by
+    1/2, 1/4 or 1/8 while keeping both sides at least draft_size, so a phone
+    photo bound for a 128 or 224 pixel model is never decoded at full size.
+    Returns (image, (scale_x, scale_y)), the factors that map coordinates in
+    the decoded image back to the original.
+    """
+    try:
+        with fileobj:
+            img = Image.open(fileobj)
+            width, height = img.size
+            if width * height > max_pixels:
+                raise HTTPException(status_code=413, detail=f"Image has more than {max_pixels} pixels")
+            if draft_size is not None:
+                img.draft("RGB", draft_size)
+            img = img.convert("RGB")
+    except Image.DecompressionBombError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+    return img, (width / img.width, height / img.height)
@@ -0,0 +1,175 @@
+# Pluggable CPU inference backends for the disease classifier and the pest detector
+#
+# Classifiers take a float32 NHWC batch and return class probabilities.
+# Detectors take a float32 NHWC batch scaled to [0, 1] and return, per image,
+# (boxes, confidences, classes) with xyxy boxes in input pixels.
+#
+# Backends are chosen per model through configuration:
+#   DISEASE_BACKEND=keras|onnx      (DISEASE_ONNX_PATH)
+#   PEST_BACKEND=ultralytics|onnx   (PEST_ONNX_PATH)
+#   ORT_INTRA_OP_THREADS, ORT_INTER_OP_THREADS  (0 = let ONNX Runtime decide)
+#
+# ONNX files (optionally INT8 dynamic-quantized) are produced by export_onnx.py.
+# Framework imports happen inside each backend, so only the selected one loads.
+
+import os
+
+import numpy as np
+
+# Offset added per class so one NMS pass never suppresses across classes
+NMS_CLASS_OFFSET = 7680
+
+
+def onnx_session(path, intra_op_threads=None, inter_op_threads=None):
+    import onnxruntime as ort
+
+    if intra_op_threads is None:
+        intra_op_threads = int(os.getenv("ORT_INTRA_OP_THREADS", "0"))
+    if inter_op_threads is None:
+        inter_op_threads = int(os.getenv("ORT_INTER_OP_THREADS", "0"))
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    if inter_op_threads > 1:
+        options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+    return ort.InferenceSession(path, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+# -------------------------------
+# Classifiers
+# -------------------------------
+class KerasClassifier:
+    name = "keras"
+
+    def __init__(self, path):
+        from keras.models import load_model
+
+        self.path = path
+        self.model = load_model(path, compile=False)
+
+    def predict(self, batch):
+        # Calling the model directly skips predict()'s per-call dataset setup
+        from keras import ops
+
+        return ops.convert_to_numpy(self.model(batch, training=False))
+
+
+class OnnxClassifier:
+    name = "onnx"
+
+    def __init__(self, path, intra_op_threads=None, inter_op_threads=None):
+        self.path = path
+        self.session = onnx_session(path, intra_op_threads, inter_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(batch, dtype=np.float32)})[0]
+
+
+# -------------------------------
+# Detectors
+# -------------------------------
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression; returns kept indices, best score first"""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def yolo_postprocess(output, conf_threshold=0.25, iou_threshold=0.7, max_det=300):
+    """
+    Decode raw YOLOv8-style output (batch, 4 + classes, anchors) with xywh
+    boxes and per-class scores, then apply class-aware NMS per image.
+    """
+    detections = []
+    for prediction in output:
+        prediction = prediction.T
+        scores = prediction[:, 4:]
+        classes = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), classes]
+
+        mask = confidences > conf_threshold
+        xywh, classes, confidences = prediction[mask, :4], classes[mask], confidences[mask]
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+
+        keep = nms(boxes + classes[:, None] * NMS_CLASS_OFFSET, confidences, iou_threshold)[:max_det]
+        detections.append((boxes[keep], confidences[keep], classes[keep].astype(np.float32)))
+    return detections
+
+
+class UltralyticsDetector:
+    name = "ultralytics"
+
+    def __init__(self, path, conf_threshold=0.25, iou_threshold=0.7, max_det=300):
+        from ultralytics import YOLO
+
+        self.path = path
+        self.model = YOLO(path)
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+    def detect(self, batch):
+        import torch
+
+        inputs = torch.from_numpy(batch).permute(0, 3, 1, 2)
+        results = self.model(inputs, conf=self.conf_threshold, iou=self.iou_threshold,
+                             max_det=self.max_det, verbose=False)
+        return [
+            (
+                result.boxes.xyxy.cpu().numpy(),
+                result.boxes.conf.cpu().numpy(),
+                result.boxes.cls.cpu().numpy()
+            )
+            for result in results
+        ]
+
+
+class OnnxDetector:
+    name = "onnx"
+
+    def __init__(self, path, conf_threshold=0.25, iou_threshold=0.7, max_det=300,
+                 intra_op_threads=None, inter_op_threads=None):
+        self.path = path
+        self.session = onnx_session(path, intra_op_threads, inter_op_threads)
+        self.input_name = self.session.get_inputs()[0].name
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+    def detect(self, batch):
+        inputs = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+        output = self.session.run(None, {self.input_name: inputs})[0]
+        return yolo_postprocess(output, self.conf_threshold, self.iou_threshold, self.max_det)
+
+
+CLASSIFIER_BACKENDS = {"keras": KerasClassifier, "onnx": OnnxClassifier}
+DETECTOR_BACKENDS = {"ultralytics": UltralyticsDetector, "onnx": OnnxDetector}
+
+
+def load_classifier(backend, path, **kwargs):
+    if backend not in CLASSIFIER_BACKENDS:
+        raise ValueError(f"Unknown classifier backend: {backend} (expected one of {sorted(CLASSIFIER_BACKENDS)})")
+    return CLASSIFIER_BACKENDS[backend](path, **kwargs)
+
+
+def load_detector(backend, path, **kwargs):
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {backend} (expected one of {sorted(DETECTOR_BACKENDS)})")
+    return DETECTOR_BACKENDS[backend](path, **kwargs)
@@ -0,0 +1,433 @@
+# Shared instrumentation for the FastAPI services: stage timers, histograms,
+# a Prometheus text /metrics endpoint, per-request sampling profiles and
+# structured logging
+#
+#   from instrumentation import configure_logging, instrument_app, stage
+#   log = configure_logging("pest")
+#   instrument_app(app, "pest", registry=models)
+#
+#   with stage("decode"):
+#       ...
+#   @stage("inference")
+#   def detect(...): ...
+#
+# Settings:
+#   METRICS_ENABLED=0     stage timers and request metrics become no-ops (/metrics stays)
+#   LOG_FORMAT=json|text  LOG_LEVEL=INFO
+#   PROFILING_ENABLED=1   requests sent with "X-Profile: 1" are sampled every
+#                         PROFILE_INTERVAL_MS and written as folded stacks
+#                         (flamegraph.pl / speedscope input) to PROFILE_DIR
+
+import asyncio
+import bisect
+import functools
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter as StackCounter
+
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_HEADER = b"x-profile"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/sih-profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+# Seconds; covers sub-millisecond cache hits up to slow model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by label values. observe() is a
+    bisect and three additions under a lock, so timing a stage costs about
+    a microsecond.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        self.observe_key(label_values, value)
+
+    def observe_key(self, key, value):
+        """observe() with the label values already in a tuple (the stage timers' fast path)"""
+        index = bisect.bisect_left(self.buckets, value)
+        lock = self._lock
+        lock.acquire()
+        try:
+            series = self._series.get(key)
+            if series is None:
+                # Bucket counts, then sum and count
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+        finally:
+            lock.release()
+
+    def samples(self):
+        with self._lock:
+            snapshot = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), series):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", key, f'le="{_format_value(bound)}"', cumulative
+            yield f"{self.name}_sum", key, "", series[-2]
+            yield f"{self.name}_count", key, "", series[-1]
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total", key, "", value
+
+
+class Gauge:
+    """Value read at scrape time: fn() returns a number or {label values tuple: number}"""
+
+    type = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = tuple(labels)
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            if value is not None:
+                yield self.name, key, "", value
+
+
+class MetricsRegistry:
+    """Metrics of one service, rendered in the Prometheus text exposition format"""
+
+    def __init__(self, prefix="sih_"):
+        self.prefix = prefix
+        self.const_labels = {}
+        self._metrics = {}
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(self.prefix + name, help, labels, buckets))
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(self.prefix + name, help, labels))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self._add(Gauge(self.prefix + name, help, fn, labels))
+
+    def render(self):
+        const_names = tuple(self.const_labels)
+        const_values = tuple(self.const_labels.values())
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            names = const_names + metric.labels
+            for sample_name, key, extra, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(names, const_values + key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram("stage_duration_seconds", "Time spent in each processing stage", ("stage",))
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency, to the end of the response body",
+    ("method", "route", "status")
+)
+request_errors = metrics.counter("http_request_exceptions", "Requests that raised instead of responding", ("method", "route"))
+
+
+class stage:
+    """
+    Time a block or function into stage_duration_seconds{stage=name}. Works
+    as a context manager and as a decorator for sync and async functions.
+    """
+
+    __slots__ = ("name", "key", "start")
+
+    def __init__(self, name):
+        self.name = name
+        self.key = (name,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if METRICS_ENABLED:
+            stage_seconds.observe_key(self.key, time.perf_counter() - self.start)
+        return False
+
+    def __call__(self, fn):
+        if not METRICS_ENABLED:
+            return fn
+        key = self.key
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def timed_async(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    if METRICS_ENABLED:
+                        stage_seconds.observe_key(key, time.perf_counter() - start)
+            return timed_async
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if METRICS_ENABLED:
+                    stage_seconds.observe_key(key, time.perf_counter() - start)
+        return timed
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSONResponse that times its body encoding as the "serialize" stage.
+    Pass as FastAPI(default_response_class=TimedJSONResponse).
+    """
+
+    def render(self, content):
+        with stage("serialize"):
+            return super().render(content)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread (the event loop and the
+    threadpools doing the request's work) each interval seconds, and counts
+    identical stacks. Other requests running at the same time are sampled
+    too, so profile one request at a time on an otherwise quiet instance.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = ";".join(f"{entry.name} ({os.path.basename(entry.filename)}:{entry.lineno})"
+                                 for entry in traceback.extract_stack(frame))
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def write(self, path):
+        """Folded stacks, one "frame;frame;frame count" line per distinct stack"""
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class InstrumentationMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task per request) recording
+    request latency by route template, and running the sampling profiler
+    for requests that ask for it.
+    """
+
+    def __init__(self, app, profiler_factory=None):
+        self.app = app
+        self.profiler_factory = profiler_factory
+        self._profile_lock = threading.Lock()
+        self._profile_ids = itertools.count()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        profiler = None
+        if PROFILING_ENABLED and any(name == PROFILE_HEADER and value == b"1" for name, value in scope["headers"]):
+            profiler, send = self._start_profile(send)
+
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            request_errors.inc(1, scope["method"], self._route(scope))
+            raise
+        finally:
+            request_seconds.observe_key((scope["method"], self._route(scope), status[0]), time.perf_counter() - start)
+            if profiler is not None:
+                self._finish_profile(profiler)
+
+    @staticmethod
+    def _route(scope):
+        # Route templates, not raw paths, so label cardinality stays bounded
+        route = scope.get("route")
+        return getattr(route, "path", "unmatched")
+
+    def _start_profile(self, send):
+        if not self._profile_lock.acquire(blocking=False):
+            return None, send  # another request is being profiled
+        profiler = (self.profiler_factory or SamplingProfiler)(PROFILE_INTERVAL_MS / 1000)
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.path = os.path.join(PROFILE_DIR, f"{int(time.time())}-{os.getpid()}-{next(self._profile_ids)}.folded")
+
+        async def send_with_profile_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-path", profiler.path.encode())]
+            await send(message)
+
+        profiler.start()
+        return profiler, send_with_profile_header
+
+    def _finish_profile(self, profiler):
+        try:
+            profiler.stop()
+            profiler.write(profiler.path)
+            logging.getLogger("instrumentation").info(
+                "Request profile written", extra={"path": profiler.path, "samples": profiler.samples}
+            )
+        finally:
+            self._profile_lock.release()
+
+
+def instrument_app(app, service, registry=None, profiler_factory=None):
+    """
+    Add request metrics, the optional per-request profiler and GET /metrics
+    to a FastAPI app. With a ModelRegistry, model readiness and load times
+    are exported too.
+    """
+    metrics.const_labels["service"] = service
+    app.add_middleware(InstrumentationMiddleware, profiler_factory=profiler_factory)
+
+    if registry is not None:
+        def model_states(field):
+            models = registry.status()["models"]
+            if field == "ready":
+                return {(name, ): int(entry["state"] == "ready") for name, entry in models.items()}
+            return {(name, ): entry["load_s"] for name, entry in models.items()}
+
+        metrics.gauge("model_ready", "1 once the model has loaded", lambda: model_states("ready"), ("model",))
+        metrics.gauge("model_load_seconds", "Time the model took to load", lambda: model_states("load_s"), ("model",))
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra={...} fields are included as keys"""
+
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(service):
+    """Send log records (ours and libraries') to stderr as JSON lines or plain text; returns the service logger"""
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        handler.setFormatter(JsonFormatter(service))
+    else:
+        handler.setFormatter(logging.Formatter(f"%(asctime)s %(levelname)s {service} %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    # httpx logs every request it sends at INFO: one line per weather call
+    for name in ("httpx", "httpcore"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return logging.getLogger(service)
@@ -1,17 +1,26 @@
-from fastapi import FastAPI,Request, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI,Request, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import _asyncio
-import google.generativeai as genai
-from twilio.rest import Client
 import os
+import time
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import base64
 import io
 from PIL import Image
-from ultralytics import YOLO
-import torch
-from torchvision import transforms
+from batcher import BatcherStoppedError, DynamicBatcher, QueueFullError
+from image_upload import read_image_upload, decode_upload
+from image_preprocessing import BatchPreprocessor
+from result_cache import PredictionCache, model_file_version
+from inference_backends import load_detector
+from tiled_detection import TiledDetector
+from model_registry import ModelRegistry, ModelNotReadyError, resolve_artifact
+from broadcast_hub import BroadcastHub
+from pubsub import create_pubsub
+from chat_replies import create_reply_queue
+from instrumentation import configure_logging, instrument_app, stage, metrics, TimedJSONResponse
 
 origins = [
     "*",  # or specify allowed frontend URLs
@@ -19,13 +28,11 @@ origins = [
 
 load_dotenv()
 
-gemini_api_key=os.getenv('gemini_api_key')
-
-genai.configure(api_key = gemini_api_key)
+log = configure_logging("pest")
 
-model = genai.GenerativeModel('gemini-2.0-flash')
+gemini_api_key=os.getenv('gemini_api_key')
 
-app=FastAPI()
+app=FastAPI(default_response_class=TimedJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,71 +42,271 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-model = YOLO("/home/yashas_vaddi12/TODO_LIST_TRY/backend/models/best.pt")  # automatically loads full model
-model.eval()  # set to eval mode
+# PEST_BACKEND=ultralytics runs best.pt on PyTorch, PEST_BACKEND=onnx runs the export_onnx.py output
+PEST_BACKEND = os.getenv("PEST_BACKEND", "ultralytics")
+
+# Detections for recently seen images; the loaded model file's version is part of every key
+pest_cache = PredictionCache(
+    None,
+    max_size=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+    mode=os.getenv("RESULT_CACHE_MODE", "exact"),
+    name="pest"
+)
+
+# Batches are letterboxed into a square YOLO input (a multiple of 32) and scaled to [0, 1]
+PEST_INPUT_SIZE = int(os.getenv("PEST_INPUT_SIZE", "640"))
+pest_preprocessor = BatchPreprocessor(
+    (PEST_INPUT_SIZE, PEST_INPUT_SIZE),
+    letterbox=True,
+    workers=int(os.getenv("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+)
+
+def load_pest_detector():
+    # From MODEL_DIR, or PEST_MODEL_PATH / PEST_ONNX_PATH
+    if PEST_BACKEND == "onnx":
+        model_path = resolve_artifact("best.onnx", env_var="PEST_ONNX_PATH")
+    else:
+        model_path = resolve_artifact("best.pt", env_var="PEST_MODEL_PATH")
+    detector = load_detector(PEST_BACKEND, model_path)
+    pest_cache.set_model_version(model_file_version(model_path))
+    return detector
+
+def load_chat_model():
+    # google.generativeai is slow to import, so it is imported here rather than at module load
+    import google.generativeai as genai
+
+    genai.configure(api_key = gemini_api_key)
+    return genai.GenerativeModel('gemini-2.0-flash')
+
+# Models load in parallel in the background once the server has started
+models = ModelRegistry()
+models.register("pest", load_pest_detector)
+if os.getenv("CHAT_BACKEND", "gemini") == "gemini":
+    models.register("chat", load_chat_model)
+
+# Request and stage metrics on /metrics
+instrument_app(app, "pest", registry=models)
+metrics.gauge("result_cache_hit_ratio", "Share of detections served from the result cache",
+              lambda: pest_cache.stats()["hit_rate"])
+
+@app.on_event("startup")
+def start_model_loading():
+    models.start()
+
+async def get_model(name):
+    # Waits for a model that is still loading; 503 if it takes too long or failed
+    try:
+        await models.wait(name)
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return models.get(name)
+
+def detect_pests(images):
+    """Run one YOLO forward pass over a batch of PIL images"""
+    pest_detector = models.get("pest")
+    with stage("preprocess"):
+        batch = pest_preprocessor.preprocess(images)
+
+    with stage("inference"):
+        results = pest_detector.detect(batch)
+
+    detections = []
+    for img, (boxes, confidences, classes) in zip(images, results):
+        # Boxes come back in input pixels; undo the letterbox to the image's own size
+        detections.append({
+            "boxes": pest_preprocessor.to_image_coords(boxes, img.size).tolist(),
+            "confidences": confidences.tolist(),
+            "classes": classes.tolist()
+        })
+    return detections
+
+# PEST_INFERENCE_MODE=tiled runs high-resolution photos as overlapping native-resolution
+# tiles plus one whole-image view (tiled_detection.py); auto tiles only images whose
+# longer side is at least PEST_TILE_MIN_SIDE. A request's "mode" overrides it.
+PEST_INFERENCE_MODES = ("full", "tiled", "auto")
+PEST_INFERENCE_MODE = os.getenv("PEST_INFERENCE_MODE", "full")
+PEST_TILE_MIN_SIDE = int(os.getenv("PEST_TILE_MIN_SIDE", "1920"))
+pest_tiler = TiledDetector(
+    tile_size=int(os.getenv("PEST_TILE_SIZE", str(PEST_INPUT_SIZE))),
+    overlap=int(os.getenv("PEST_TILE_OVERLAP", "128")),
+    min_detail=float(os.getenv("PEST_TILE_MIN_DETAIL", "3.0")),
+    max_batch=int(os.getenv("PEST_TILE_BATCH_SIZE", "16"))
+)
+
+def detect_pest_jobs(jobs):
+    """Detections for (image, mode) jobs; all tiles of a batch share forward passes"""
+    return pest_tiler.detect(detect_pests, [
+        (image, mode == "tiled" or (mode == "auto" and max(image.size) >= PEST_TILE_MIN_SIDE))
+        for image, mode in jobs
+    ])
+
+# Concurrent uploads are grouped into one forward pass per batch
+pest_batcher = DynamicBatcher(
+    detect_pest_jobs,
+    max_batch_size=int(os.getenv("PEST_BATCH_SIZE", "8")),
+    max_wait_ms=float(os.getenv("PEST_BATCH_WAIT_MS", "10")),
+    max_queue=int(os.getenv("PEST_QUEUE_DEPTH", "64")),
+    name="pest-batcher"
+)
+
+# PEST_DRAFT_DECODE=1 decodes JPEG uploads at the smallest 1/2^n scale that still covers
+# PEST_DRAFT_SIZE: much faster for large photos, but not identical to a full decode
+PEST_DRAFT_DECODE = os.getenv("PEST_DRAFT_DECODE", "0") == "1"
+PEST_DRAFT_SIZE = int(os.getenv("PEST_DRAFT_SIZE", "640"))
+
+@app.on_event("startup")
+async def start_pest_batcher():
+    await pest_batcher.start()
+
+@app.on_event("shutdown")
+async def stop_pest_batcher():
+    await pest_batcher.stop()
+    pest_preprocessor.shutdown()
+
+@stage("decode")
+def decode_image(image_bytes, mode="full"):
+    # Open decoded base64 bytes as PIL image
+    return Image.open(io.BytesIO(image_bytes)).convert("RGB"), (1, 1)
 
-# Define preprocessin
-preprocess = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-    # Add normalization if your model expects it
-])
+def draft_decode(mode):
+    # Tiles need the image at full resolution
+    return PEST_DRAFT_DECODE and mode == "full"
+
+@stage("decode")
+def decode_pest_upload(upload, mode="full"):
+    return decode_upload(upload, (PEST_DRAFT_SIZE, PEST_DRAFT_SIZE) if draft_decode(mode) else None)
+
+def scale_detections(detections, scale):
+    # Map boxes from the draft-decoded image back to original image pixels
+    scale_x, scale_y = scale
+    if scale_x == 1 and scale_y == 1:
+        return detections
+    detections["boxes"] = [
+        [x1 * scale_x, y1 * scale_y, x2 * scale_x, y2 * scale_y]
+        for x1, y1, x2, y2 in detections["boxes"]
+    ]
+    return detections
+
+def inference_mode(mode):
+    # A request's mode, or the configured default; raises for unknown modes
+    mode = mode or PEST_INFERENCE_MODE
+    if mode not in PEST_INFERENCE_MODES:
+        raise ValueError(f"mode must be one of {', '.join(PEST_INFERENCE_MODES)}")
+    return mode
+
+async def detect_pests_cached(source, decode, mode, draft=False):
+    # Re-uploads of the same photo are answered from the cache; the key includes the
+    # mode and whether the image is draft-decoded, as both change the detections
+    await get_model("pest")  # the cache key needs the loaded model's version
+    key = await run_in_threadpool(pest_cache.key, source)
+    key += (mode, "draft" if draft else "exact")
+    detections = pest_cache.get(key)
+    if detections is not None:
+        return detections
+
+    start = time.perf_counter()
+    image, scale = await run_in_threadpool(decode, source, mode)
+
+    # Run YOLO inference as part of the next batch
+    try:
+        detections = scale_detections(await pest_batcher.submit((image, mode)), scale)
+    except (QueueFullError, BatcherStoppedError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    pest_cache.put(key, detections, time.perf_counter() - start)
+    return detections
 
 @app.post("/sih/predict")
 async def predict_image(request: Request):
     data = await request.json()
     if "image" not in data:
         return {"error": "No image provided"}
+    try:
+        mode = inference_mode(data.get("mode"))
+    except ValueError as e:
+        return {"error": str(e)}
     
-    # Decode base64 string to bytes
-    image_bytes = base64.b64decode(data["image"])
-    
-    # Open as PIL image
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    
-    # Run YOLO inference
-    results = model(image)  
-    
-    # Extract results
-    boxes = results[0].boxes.xyxy.tolist()
-    confidences = results[0].boxes.conf.tolist()
-    classes = results[0].boxes.cls.tolist()
-
-    return {
-        "boxes": boxes,
-        "confidences": confidences,
-        "classes": classes
-    }
-
-groups={
-    "group1":set(),
-    "group2":set(),
-    "group3":set(),
-    "group4":set(),    
-}
+    image_bytes = await run_in_threadpool(base64.b64decode, data["image"])
+    return await detect_pests_cached(image_bytes, decode_image, mode)
+
+@app.post("/sih/predict/upload")
+async def predict_image_upload(request: Request):
+    # Raw image/* body or multipart file, no base64; ?mode=tiled for high-resolution photos
+    try:
+        mode = inference_mode(request.query_params.get("mode"))
+    except ValueError as e:
+        return {"error": str(e)}
+    upload = await read_image_upload(request)
+    return await detect_pests_cached(upload, decode_pest_upload, mode, draft_decode(mode))
+
+@app.get("/sih/health")
+async def health():
+    # 503 until every model has loaded, so load balancers hold traffic back
+    status = models.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={
+            "status": "ok" if status["ready"] else status["state"],
+            "models": status,
+            "pest_backend": PEST_BACKEND,
+            "pest_batcher": pest_batcher.metrics(),
+            "pest_tiling": {"mode": PEST_INFERENCE_MODE, **pest_tiler.metrics()},
+            "pest_cache": pest_cache.stats(),
+            "websockets": hub.metrics(),
+            "replies": replies.metrics()
+        }
+    )
+
+# Group chat fan-out: each connection gets its own bounded send queue and writer.
+# With several workers (uvicorn --workers N) or hosts, set PUBSUB_BACKEND=unix and
+# run pubsub_broker.py so groups span every worker.
+hub = BroadcastHub(
+    queue_size=int(os.getenv("WS_QUEUE_SIZE", "100")),
+    policy=os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest"),
+    send_timeout=float(os.getenv("WS_SEND_TIMEOUT", "5")),
+    pubsub=create_pubsub(
+        os.getenv("PUBSUB_BACKEND", "memory"),
+        socket_path=os.getenv("PUBSUB_SOCKET", "/tmp/sih-pubsub.sock"),
+        batch_interval=float(os.getenv("PUBSUB_BATCH_MS", "2")) / 1000
+    )
+)
+
+@app.on_event("startup")
+async def start_hub():
+    await hub.start()
+
+@app.on_event("shutdown")
+async def stop_hub():
+    await hub.stop()
 
 @app.websocket("/sih/ws/{group_name}")
 async def websocket_endpoint(websocket: WebSocket,group_name:str):
     await websocket.accept()
-    groups[group_name].add(websocket)
-    print(f"New user connected to {group_name}. Total users: {len(groups[group_name])}")
+    connection = hub.join(websocket, group_name)
+    log.info("User connected", extra={"group": group_name, "members": hub.member_count(group_name)})
     
     try:
         while True:
             message = await websocket.receive_text()
-            print(f"{group_name} is Received: {message}")
-            for user in groups[group_name]:
-                if user != websocket:
-                    try:
-                        await user.send_text(f"{group_name}{message}")
-                    except:
-                        pass
+            # Queued for every other member; never waits on a slow client
+            hub.publish(group_name, f"{group_name}{message}", exclude=connection)
     except WebSocketDisconnect:
-        print(f"User disconnected from {group_name}")
+        log.info("User disconnected", extra={"group": group_name})
     finally:
-        groups[group_name].remove(websocket)
-        print(f"Total users: {len(groups[group_name])}")
+        await hub.leave(connection)
+        log.info("Group size", extra={"group": group_name, "members": hub.member_count(group_name)})
+
 
+# WhatsApp replies are generated and sent by background workers, not in the webhook
+replies = create_reply_queue(models)
+
+@app.on_event("startup")
+async def start_replies():
+    await replies.start()
+
+@app.on_event("shutdown")
+async def stop_replies():
+    await replies.stop()
 
 @app.post("/sih/twilio-webhook")
 async def twilio_webhook(request: Request):
@@ -108,26 +315,21 @@ async def twilio_webhook(request: Request):
     to_number = form.get("To")
     body = form.get("Body")
     
-    print(f"Message from {from_number} to {to_number}: {body}")
-    ans=model.generate_content(f"Give an appropriate response to {body}. Answer in  only one line.")
-
-    account_sid = os.getenv('account_sid')
-    auth_token = os.getenv('auth_token')
-    client = Client(account_sid, auth_token)
+    log.info("WhatsApp message received", extra={"from": from_number, "to": to_number, "body": body})
+    if not from_number or not body:
+        raise HTTPException(status_code=400, detail="From and Body are required")
+    try:
+        # Acknowledge right away; the reply goes back to the sender once it is ready
+        replies.enqueue(from_number, body)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    message = client.messages.create(
-    from_='whatsapp:+14155238886',
-    body=f'{ans.text}',
-    to='whatsapp:+919702120202'
-)
-    
-    # Optionally send back a response to Twilio
     return {"status": "received", "body": body}
 
 
 @app.post('/sih/notjsontest')
 def tester(value):
-    print(value)
+    log.info("notjsontest", extra={"value": value})
     return value
 
 class value(BaseModel):
@@ -135,5 +337,5 @@ class value(BaseModel):
 
 @app.post('/sih/test')
 def test(payload:value):
-    print(payload.text)
+    log.info("test", extra={"text": payload.text})
     return payload.text
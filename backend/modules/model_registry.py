@@ -0,0 +1,168 @@
+# Shared model registry: local artifact resolution and background model loading
+#
+# Artifacts are looked up, in order, at an explicit per-artifact env var, then
+# under MODEL_DIR (default backend/models in this repo). Only when neither has
+# the file and MODEL_OFFLINE is not set is it downloaded from the Hugging Face
+# Hub, into MODEL_DIR, so the next start needs no network.
+#
+# Services register a loader per model and call start() from their startup
+# event: every loader runs on its own thread, so models load in parallel
+# while the server is already accepting requests. Loaders may get() other
+# models they depend on. Endpoints wait() for the models they use, and health
+# endpoints report status().
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+log = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+MODEL_DIR = os.getenv("MODEL_DIR", os.path.join(REPO_ROOT, "backend", "models"))
+MODEL_OFFLINE = os.getenv("MODEL_OFFLINE", os.getenv("HF_HUB_OFFLINE", "0")).lower() in ("1", "true", "yes")
+
+# How long a request waits for a model that is still loading before a 503
+MODEL_WAIT_TIMEOUT = float(os.getenv("MODEL_WAIT_TIMEOUT", "30"))
+
+
+class ModelNotReadyError(Exception):
+    """Raised when a model is still loading after the wait timeout, or failed to load"""
+
+
+def resolve_artifact(filename, env_var=None, hf_repo_id=None, hf_filename=None):
+    """Local path of a model artifact (see the module comment for the lookup order)"""
+    if env_var and os.getenv(env_var):
+        path = os.getenv(env_var)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{env_var}={path} does not exist")
+        return path
+
+    path = os.path.join(MODEL_DIR, filename)
+    if os.path.exists(path):
+        return path
+
+    if hf_repo_id is not None:
+        from huggingface_hub import hf_hub_download
+
+        # Offline, only a copy already in the Hugging Face cache will do
+        return hf_hub_download(
+            repo_id=hf_repo_id,
+            filename=hf_filename or filename,
+            local_dir=None if MODEL_OFFLINE else MODEL_DIR,
+            local_files_only=MODEL_OFFLINE
+        )
+
+    raise FileNotFoundError(
+        f"Model artifact {filename} not found in MODEL_DIR={MODEL_DIR}"
+        + (f" (or set {env_var})" if env_var else "")
+    )
+
+
+class ModelRegistry:
+    """
+    Named models loaded on background threads.
+
+    register(name, loader) records a zero-argument loader. start() begins
+    loading every registered model in parallel; get(name) and wait(name)
+    also start a model that has not been started yet, so a registry used
+    without start() loads lazily on first use.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.created = time.perf_counter()
+
+    def register(self, name, loader):
+        with self._lock:
+            self._entries[name] = {
+                "loader": loader,
+                "future": None,
+                "state": "registered",
+                "started": None,
+                "load_s": None,
+                "error": None
+            }
+
+    def _start(self, name):
+        # Returns the model's future, starting its loader thread the first time
+        with self._lock:
+            entry = self._entries[name]
+            if entry["future"] is not None:
+                return entry["future"]
+            entry["future"] = Future()
+            entry["state"] = "loading"
+            entry["started"] = time.perf_counter()
+
+        thread = threading.Thread(target=self._load, args=(name,), name=f"load-{name}", daemon=True)
+        thread.start()
+        return entry["future"]
+
+    def _load(self, name):
+        entry = self._entries[name]
+        try:
+            model = entry["loader"]()
+        except BaseException as e:
+            entry["state"] = "failed"
+            entry["error"] = f"{type(e).__name__}: {e}"
+            log.error("Model failed to load", extra={"model": name, "error": entry["error"]})
+            entry["future"].set_exception(e)
+            return
+        entry["state"] = "ready"
+        entry["load_s"] = round(time.perf_counter() - entry["started"], 3)
+        log.info("Model loaded", extra={"model": name, "load_s": entry["load_s"]})
+        entry["future"].set_result(model)
+
+    def start(self):
+        """Start loading every registered model in the background"""
+        for name in list(self._entries):
+            self._start(name)
+
+    def get(self, name, timeout=None):
+        """Blocking: the loaded model, waiting up to timeout seconds"""
+        future = self._start(name)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise ModelNotReadyError(f"Model {name} is still loading")
+        except Exception as e:
+            raise ModelNotReadyError(f"Model {name} failed to load: {e}") from e
+
+    async def wait(self, *names, timeout=MODEL_WAIT_TIMEOUT):
+        """Await the named models (all registered models if none are named)"""
+        names = names or tuple(self._entries)
+        futures = [asyncio.wrap_future(self._start(name)) for name in names]
+        try:
+            await asyncio.wait_for(asyncio.shield(asyncio.gather(*futures)), timeout)
+        except asyncio.TimeoutError:
+            loading = [name for name in names if not self.ready(name)]
+            raise ModelNotReadyError(f"Models still loading: {', '.join(loading)}")
+        except Exception as e:
+            raise ModelNotReadyError(str(e)) from e
+
+    def ready(self, name=None):
+        if name is not None:
+            return self._entries[name]["state"] == "ready"
+        return all(entry["state"] == "ready" for entry in self._entries.values())
+
+    def status(self):
+        """Readiness and per-model load state for health endpoints"""
+        states = {entry["state"] for entry in self._entries.values()}
+        if "failed" in states:
+            state = "failed"
+        elif self.ready():
+            state = "ready"
+        else:
+            state = "loading"
+        return {
+            "ready": state == "ready",
+            "state": state,
+            "uptime_s": round(time.perf_counter() - self.created, 3),
+            "models": {
+                name: {"state": entry["state"], "load_s": entry["load_s"], "error": entry["error"]}
+                for name, entry in self._entries.items()
+            }
+        }
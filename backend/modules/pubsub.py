@@ -0,0 +1,236 @@
+# Pub/sub backends that connect BroadcastHub instances across processes
+#
+# A hub delivers every message to its own members directly and hands it to its
+# pub/sub backend, which carries it to the hubs of other workers or hosts that
+# have members in the same group. Backends also track presence: each node
+# reports its local member count per group, and member_count() returns the
+# total over all nodes.
+#
+#   PUBSUB_BACKEND=memory   single process (default)
+#   PUBSUB_BACKEND=unix     via pubsub_broker.py listening on PUBSUB_SOCKET
+#
+# Broker protocol: length-prefixed (4-byte big-endian) JSON frames, each a list
+# of ops, so many messages travel between a node and the broker in one write:
+#   node -> broker   ["sub", group] ["unsub", group] ["pub", group, message]
+#                    ["presence", group, local_count]
+#   broker -> node   ["msg", group, message] ["presence", group, total_count]
+
+import asyncio
+import json
+import logging
+import struct
+
+log = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(ops):
+    data = json.dumps(ops, separators=(",", ":")).encode()
+    return FRAME_HEADER.pack(len(data)) + data
+
+
+async def read_frame(reader):
+    (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if size > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame of {size} bytes exceeds {MAX_FRAME_BYTES}")
+    return json.loads(await reader.readexactly(size))
+
+
+class InProcessPubSub:
+    """Single-process backend: no other nodes, so nothing leaves the process"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._local_counts = {}
+
+    async def start(self, deliver):
+        self.deliver = deliver
+
+    async def stop(self):
+        pass
+
+    def subscribe(self, group):
+        pass
+
+    def unsubscribe(self, group):
+        self._local_counts.pop(group, None)
+
+    def publish(self, group, message):
+        pass
+
+    def set_presence(self, group, count):
+        self._local_counts[group] = count
+
+    def member_count(self, group):
+        return self._local_counts.get(group, 0)
+
+    def metrics(self):
+        return {"backend": self.name}
+
+
+class UnixSocketPubSub(InProcessPubSub):
+    """
+    Node side of pubsub_broker.py. Outgoing ops are buffered and written as
+    one frame per batch_interval (or as soon as max_batch ops are waiting);
+    presence updates per group are coalesced to the latest count. The
+    connection is retried with backoff, re-announcing subscriptions and
+    presence; messages published while disconnected reach local members
+    only.
+    """
+
+    name = "unix"
+
+    def __init__(self, path, batch_interval=0.002, max_batch=512):
+        super().__init__()
+        self.path = path
+        self.batch_interval = batch_interval
+        self.max_batch = max_batch
+
+        self._groups = set()
+        self._totals = {}
+        self._pending = []
+        self._presence_dirty = {}
+        self._has_pending = None
+        self._writer = None
+        self._tasks = []
+
+        # Metrics
+        self.frames_sent = 0
+        self.ops_sent = 0
+        self.messages_received = 0
+        self.dropped_while_disconnected = 0
+        self.reconnects = 0
+
+    async def start(self, deliver):
+        self.deliver = deliver
+        self._has_pending = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._connect_loop()),
+            asyncio.create_task(self._write_loop())
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _queue(self, op):
+        self._pending.append(op)
+        self._has_pending.set()
+
+    def subscribe(self, group):
+        self._groups.add(group)
+        self._queue(["sub", group])
+
+    def unsubscribe(self, group):
+        self._groups.discard(group)
+        self._local_counts.pop(group, None)
+        self._presence_dirty.pop(group, None)
+        self._totals.pop(group, None)
+        self._queue(["unsub", group])
+
+    def publish(self, group, message):
+        if self._writer is None:
+            self.dropped_while_disconnected += 1
+            return
+        self._queue(["pub", group, message])
+
+    def set_presence(self, group, count):
+        self._local_counts[group] = count
+        self._presence_dirty[group] = count
+        self._has_pending.set()
+
+    def member_count(self, group):
+        # Broker total when connected (it lags by one round trip), else local only
+        local = self._local_counts.get(group, 0)
+        if self._writer is None:
+            return local
+        return max(self._totals.get(group, local), local)
+
+    async def _connect_loop(self):
+        delay = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+
+            delay = 0.1
+            self.reconnects += 1
+            # Re-announce this node's groups before anything already queued
+            self._pending[:0] = [["sub", group] for group in self._groups]
+            self._presence_dirty.update(self._local_counts)
+            self._writer = writer
+            self._has_pending.set()
+            log.info("Connected to pub/sub broker", extra={"socket": self.path})
+
+            try:
+                while True:
+                    for op in await read_frame(reader):
+                        if op[0] == "msg":
+                            self.messages_received += 1
+                            self.deliver(op[1], op[2])
+                        elif op[0] == "presence":
+                            self._totals[op[1]] = op[2]
+            except (asyncio.IncompleteReadError, OSError, ValueError) as e:
+                log.warning("Lost pub/sub broker connection", extra={"socket": self.path, "error": str(e)})
+            finally:
+                self._writer = None
+                writer.close()
+
+    async def _write_loop(self):
+        while True:
+            await self._has_pending.wait()
+            # Give concurrent publishers a moment to join this batch
+            if self.batch_interval and len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.batch_interval)
+            self._has_pending.clear()
+
+            writer = self._writer
+            if writer is None:
+                # Subscriptions and presence are re-announced on reconnect
+                self._pending = []
+                continue
+
+            ops, self._pending = self._pending, []
+            ops.extend(["presence", group, count] for group, count in self._presence_dirty.items())
+            self._presence_dirty.clear()
+            if not ops:
+                continue
+            try:
+                writer.write(encode_frame(ops))
+                await writer.drain()
+            except OSError:
+                continue
+            self.frames_sent += 1
+            self.ops_sent += len(ops)
+
+    def metrics(self):
+        return {
+            "backend": self.name,
+            "socket": self.path,
+            "connected": self._writer is not None,
+            "groups": len(self._groups),
+            "frames_sent": self.frames_sent,
+            "ops_sent": self.ops_sent,
+            "avg_ops_per_frame": self.ops_sent / self.frames_sent if self.frames_sent else 0.0,
+            "messages_received": self.messages_received,
+            "dropped_while_disconnected": self.dropped_while_disconnected,
+            "connections": self.reconnects
+        }
+
+
+def create_pubsub(backend, socket_path=None, batch_interval=0.002):
+    if backend == "memory":
+        return InProcessPubSub()
+    if backend == "unix":
+        return UnixSocketPubSub(socket_path, batch_interval=batch_interval)
+    raise ValueError(f"Unknown pub/sub backend: {backend} (expected memory or unix)")
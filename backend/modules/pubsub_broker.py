@@ -0,0 +1,133 @@
+# Local pub/sub broker for PUBSUB_BACKEND=unix (protocol in pubsub.py)
+#
+# Start one per host before the uvicorn workers:
+#   python pubsub_broker.py --socket /tmp/sih-pubsub.sock
+#   PUBSUB_BACKEND=unix PUBSUB_SOCKET=/tmp/sih-pubsub.sock uvicorn main:app --workers 4
+#
+# Each incoming frame is handled as a unit: every op in it is routed first,
+# then each destination node gets a single outgoing frame, so a burst of
+# messages costs one write per node rather than one per message.
+
+import argparse
+import asyncio
+import os
+
+from pubsub import encode_frame, read_frame
+
+# A node whose unsent output grows past this is disconnected (it re-subscribes on reconnect)
+MAX_NODE_BUFFER_BYTES = 32 * 1024 * 1024
+
+
+class Node:
+    def __init__(self, writer):
+        self.writer = writer
+        self.groups = set()
+        self.outbox = []
+
+
+class Broker:
+    def __init__(self):
+        self.subscribers = {}   # group -> set of nodes
+        self.presence = {}      # group -> {node: local member count}
+        self.nodes = set()
+
+    def _subscribe(self, node, group, changed):
+        self.subscribers.setdefault(group, set()).add(node)
+        node.groups.add(group)
+        changed.add(group)  # so the new subscriber learns the current total
+
+    def _unsubscribe(self, node, group, changed):
+        members = self.subscribers.get(group)
+        if members is not None:
+            members.discard(node)
+            if not members:
+                del self.subscribers[group]
+        node.groups.discard(group)
+        counts = self.presence.get(group)
+        if counts is not None and counts.pop(node, None) is not None:
+            if not counts:
+                del self.presence[group]
+            changed.add(group)
+
+    def _set_presence(self, node, group, count, changed):
+        counts = self.presence.setdefault(group, {})
+        if count > 0:
+            counts[node] = count
+        else:
+            counts.pop(node, None)
+        if not counts:
+            del self.presence[group]
+        changed.add(group)
+
+    def _broadcast_presence(self, changed, touched):
+        for group in changed:
+            total = sum(self.presence.get(group, {}).values())
+            for node in self.subscribers.get(group, ()):
+                node.outbox.append(["presence", group, total])
+                touched.add(node)
+
+    def _flush(self, nodes):
+        for node in nodes:
+            if not node.outbox:
+                continue
+            node.writer.write(encode_frame(node.outbox))
+            node.outbox = []
+            if node.writer.transport.get_write_buffer_size() > MAX_NODE_BUFFER_BYTES:
+                print("Disconnecting a node that is not reading")
+                node.writer.transport.abort()
+
+    async def handle(self, reader, writer):
+        node = Node(writer)
+        self.nodes.add(node)
+        print(f"Node connected ({len(self.nodes)} total)")
+        try:
+            while True:
+                ops = await read_frame(reader)
+                changed, touched = set(), set()
+                for op in ops:
+                    kind, group = op[0], op[1]
+                    if kind == "pub":
+                        for other in self.subscribers.get(group, ()):
+                            if other is not node:
+                                other.outbox.append(["msg", group, op[2]])
+                                touched.add(other)
+                    elif kind == "sub":
+                        self._subscribe(node, group, changed)
+                    elif kind == "unsub":
+                        self._unsubscribe(node, group, changed)
+                    elif kind == "presence":
+                        self._set_presence(node, group, op[2], changed)
+                self._broadcast_presence(changed, touched)
+                self._flush(touched)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.nodes.discard(node)
+            changed, touched = set(), set()
+            for group in list(node.groups):
+                self._unsubscribe(node, group, changed)
+            self._broadcast_presence(changed, touched)
+            self._flush(touched)
+            writer.close()
+            print(f"Node disconnected ({len(self.nodes)} total)")
+
+
+async def serve(socket_path):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    broker = Broker()
+    server = await asyncio.start_unix_server(broker.handle, path=socket_path)
+    print(f"Pub/sub broker listening on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local pub/sub broker for WebSocket groups")
+    parser.add_argument("--socket", default=os.getenv("PUBSUB_SOCKET", "/tmp/sih-pubsub.sock"))
+    args = parser.parse_args()
+    asyncio.run(serve(args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# Result cache for image model predictions, keyed on the uploaded image
+
+import copy
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def model_file_version(path):
+    """
+    Version string for a model file: resolved file name, size and mtime.
+    Hugging Face cache paths resolve to a content-addressed blob, so a new
+    upstream revision gives a new version.
+    """
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return f"{os.path.basename(real_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def content_hash(source):
+    """BLAKE2b-128 of image bytes or of a seekable binary file (rewound afterwards)"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+    elif isinstance(source, io.BytesIO):
+        digest.update(source.getbuffer())
+    else:
+        position = source.tell()
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(position)
+    return digest.hexdigest()
+
+
+def difference_hash(source, hash_size=8):
+    """
+    (width, height, dHash) of an image. The 64-bit dHash compares
+    neighbouring pixels of a 9x8 grayscale thumbnail, so re-encoding or
+    recompressing a photo almost never changes it; the pixel size is kept
+    alongside because cached results (e.g. boxes) are in the image's pixels.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    position = source.tell()
+    img = Image.open(source)
+    width, height = img.size
+    # JPEG only: decode at 1/8 scale, the thumbnail needs very few pixels
+    img.draft("L", (hash_size * 8, hash_size * 8))
+    pixels = np.asarray(img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    source.seek(position)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return width, height, np.packbits(bits).tobytes().hex()
+
+
+class PredictionCache:
+    """
+    LRU cache of model results keyed on the uploaded image.
+
+    mode="exact" keys on a BLAKE2b hash of the image bytes, so only a
+    byte-identical re-upload hits. mode="perceptual" keys on a difference
+    hash and the pixel size of the decoded image, so the same photo
+    re-encoded at the same size also hits, at the cost of a small decode per
+    lookup and a chance of treating two very similar photos as one. A resized
+    copy misses: results such as boxes are in the original image's pixels.
+
+    Every key includes model_version, so results from a previous model are
+    never returned after a swap.
+    """
+
+    def __init__(self, model_version, max_size=1024, mode="exact", name="predictions"):
+        if mode not in ("exact", "perceptual"):
+            raise ValueError(f"Unknown cache mode: {mode}")
+        self.model_version = model_version
+        self.max_size = int(max_size)
+        self.mode = mode
+        self.name = name
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Model time the hits did not have to spend, from each entry's own compute time
+        self.saved_seconds = 0.0
+        self.compute_seconds = 0.0
+
+    def key(self, source):
+        """Cache key for image bytes or a binary file object"""
+        if self.mode == "perceptual":
+            try:
+                return (self.model_version, self.mode, *difference_hash(source))
+            except (OSError, SyntaxError, Image.DecompressionBombError):
+                # Not decodable: key on the bytes and let the model path report the error
+                if not isinstance(source, (bytes, bytearray, memoryview)):
+                    source.seek(0)
+        return (self.model_version, "exact", content_hash(source))
+
+    def set_model_version(self, model_version):
+        """Switch to a newly loaded model; entries from the previous one are dropped"""
+        with self._lock:
+            if model_version != self.model_version:
+                self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value, seconds = entry
+            self.saved_seconds += seconds
+        return copy.deepcopy(value)
+
+    def put(self, key, value, seconds=0.0):
+        """Store a result along with the time it took to compute"""
+        with self._lock:
+            self.compute_seconds += seconds
+            self._entries[key] = (copy.deepcopy(value), seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute_fn):
+        value = self.get(key)
+        if value is not None:
+            return value
+        start = time.perf_counter()
+        value = compute_fn()
+        self.put(key, value, time.perf_counter() - start)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters exposed on the health endpoints"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": self.mode,
+                "model_version": self.model_version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_ms": self.saved_seconds * 1000,
+                "avg_miss_ms": self.compute_seconds * 1000 / self.misses if self.misses else 0.0
+            }
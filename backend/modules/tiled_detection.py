@@ -0,0 +1,179 @@
+# Tiled (sliding-window) pest detection for high-resolution photos
+#
+# Resizing a drone or 12 MP phone photo to the detector's 640 px input makes
+# small insects a few pixels wide. In tiled mode the image is cut into
+# overlapping tile_size windows that the detector sees at native resolution,
+# plus one downscaled view of the whole image that still finds pests too
+# large for a tile. A cheap pre-pass on a small grayscale thumbnail skips
+# windows without texture (sky, bare soil, out-of-focus background) before
+# any model work. Boxes are mapped back to image pixels, copies cut by an
+# inner tile edge are dropped (the overlap guarantees a whole copy in the
+# neighbouring tile) and class-aware NMS merges the rest.
+
+import math
+
+import numpy as np
+
+from inference_backends import nms
+from instrumentation import stage
+
+
+def tile_grid(width, height, tile_size, overlap):
+    """
+    (x0, y0, x1, y1) windows of tile_size (or the whole side, if shorter)
+    covering the image, neighbours overlapping by at least overlap pixels
+    """
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        n = math.ceil((length - tile_size) / (tile_size - overlap)) + 1
+        return [round(i * (length - tile_size) / (n - 1)) for i in range(n)]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height) for x in starts(width)
+    ]
+
+
+def tile_detail(image, windows, thumb_size=256):
+    """
+    Texture score of each window: mean absolute gradient (0-255 gray levels
+    per pixel) of its area in a thumbnail, from a summed-area table
+    """
+    factor = max(1, max(image.size) // thumb_size)
+    thumb = np.asarray((image.reduce(factor) if factor > 1 else image).convert("L"), dtype=np.float32)
+    gradient = np.zeros_like(thumb)
+    gradient[:, 1:] += np.abs(np.diff(thumb, axis=1))
+    gradient[1:, :] += np.abs(np.diff(thumb, axis=0))
+    table = np.pad(gradient.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+
+    scale_x = thumb.shape[1] / image.width
+    scale_y = thumb.shape[0] / image.height
+    scores = []
+    for x0, y0, x1, y1 in windows:
+        tx0, tx1 = int(x0 * scale_x), max(int(x0 * scale_x) + 1, math.ceil(x1 * scale_x))
+        ty0, ty1 = int(y0 * scale_y), max(int(y0 * scale_y) + 1, math.ceil(y1 * scale_y))
+        total = table[ty1, tx1] - table[ty0, tx1] - table[ty1, tx0] + table[ty0, tx0]
+        scores.append(float(total) / ((tx1 - tx0) * (ty1 - ty0)))
+    return scores
+
+
+class TiledDetector:
+    """
+    Runs detection jobs, each (image, tiled), through detect_fn.
+
+    detect_fn takes a list of PIL images and returns, per image, a dict of
+    "boxes" (xyxy in that image's pixels), "confidences" and "classes", like
+    main.detect_pests. A tiled job becomes its whole-image view plus the
+    tiles that pass the pre-pass; an untiled job is the image alone. All
+    crops of all jobs go through detect_fn together, max_batch at a time.
+    """
+
+    def __init__(self, tile_size=640, overlap=128, min_detail=3.0, thumb_size=256,
+                 iou_threshold=0.5, max_det=300, edge_margin=2.0, max_batch=16):
+        if not 0 <= overlap < tile_size:
+            raise ValueError(f"overlap must be in [0, tile_size), got {overlap}")
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.min_detail = min_detail
+        self.thumb_size = thumb_size
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        self.edge_margin = edge_margin
+        self.max_batch = max_batch
+
+        # Metrics
+        self.images = 0
+        self.tiles = 0
+        self.skipped = 0
+        self.crops = 0
+
+    def plan(self, image):
+        """(windows to run, number of windows) for one image"""
+        windows = tile_grid(image.width, image.height, self.tile_size, self.overlap)
+        if len(windows) == 1:
+            return [], 1  # the whole-image view already covers it
+        if self.min_detail > 0:
+            scores = tile_detail(image, windows, self.thumb_size)
+            return [w for w, score in zip(windows, scores) if score >= self.min_detail], len(windows)
+        return windows, len(windows)
+
+    def merge(self, image, windows, detections, total):
+        """
+        One result for a tiled image from its whole-image detections followed
+        by one per window (each in its own crop's pixels); total is the number
+        of windows before the pre-pass
+        """
+        boxes = [np.asarray(detections[0]["boxes"], dtype=np.float32).reshape(-1, 4)]
+        confidences = [np.asarray(detections[0]["confidences"], dtype=np.float32)]
+        classes = [np.asarray(detections[0]["classes"], dtype=np.float32)]
+
+        for (x0, y0, x1, y1), found in zip(windows, detections[1:]):
+            tile_boxes = np.asarray(found["boxes"], dtype=np.float32).reshape(-1, 4) + [x0, y0, x0, y0]
+            # Drop boxes cut by an edge shared with a neighbouring tile
+            margin = self.edge_margin
+            keep = np.ones(len(tile_boxes), dtype=bool)
+            if x0 > 0:
+                keep &= tile_boxes[:, 0] > x0 + margin
+            if y0 > 0:
+                keep &= tile_boxes[:, 1] > y0 + margin
+            if x1 < image.width:
+                keep &= tile_boxes[:, 2] < x1 - margin
+            if y1 < image.height:
+                keep &= tile_boxes[:, 3] < y1 - margin
+            boxes.append(tile_boxes[keep])
+            confidences.append(np.asarray(found["confidences"], dtype=np.float32)[keep])
+            classes.append(np.asarray(found["classes"], dtype=np.float32)[keep])
+
+        boxes, confidences, classes = np.concatenate(boxes), np.concatenate(confidences), np.concatenate(classes)
+        # Class offset larger than the image, so NMS never suppresses across classes
+        offset = max(image.width, image.height) + 1
+        keep = nms(boxes + classes[:, None] * offset, confidences, self.iou_threshold)[:self.max_det]
+        return {
+            "boxes": boxes[keep].tolist(),
+            "confidences": confidences[keep].tolist(),
+            "classes": classes[keep].tolist(),
+            "tiles": {"total": total, "run": len(windows)}
+        }
+
+    def detect(self, detect_fn, jobs):
+        """Results for a list of (image, tiled) jobs, in order"""
+        crops, plans = [], []
+        for image, tiled in jobs:
+            windows, total = [], 1
+            if tiled:
+                with stage("tiling"):
+                    windows, total = self.plan(image)
+                self.images += 1
+                if total > 1:
+                    self.tiles += total
+                    self.skipped += total - len(windows)
+            plans.append((image, tiled, windows, total, len(crops)))
+            crops.append(image)
+            crops.extend(image.crop(window) for window in windows)
+
+        detections = []
+        for start in range(0, len(crops), self.max_batch):
+            detections.extend(detect_fn(crops[start:start + self.max_batch]))
+        self.crops += len(crops)
+
+        results = []
+        for image, tiled, windows, total, first in plans:
+            if tiled:
+                with stage("tiling"):
+                    results.append(self.merge(image, windows, detections[first:first + 1 + len(windows)], total))
+            else:
+                results.append(detections[first])
+        return results
+
+    def metrics(self):
+        return {
+            "tile_size": self.tile_size,
+            "overlap": self.overlap,
+            "min_detail": self.min_detail,
+            "images": self.images,
+            "tiles": self.tiles,
+            "skipped": self.skipped,
+            "skip_rate": self.skipped / self.tiles if self.tiles else 0.0,
+            "crops_run": self.crops
+        }
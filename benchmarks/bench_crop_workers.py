@@ -0,0 +1,224 @@
+# Benchmark: crop inference throughput and per-worker memory as worker count rises
+#
+# Compares forked workers sharing models loaded once in the parent ("fork")
+# with spawned workers that each unpickle their own copy ("spawn"), which is
+# what running one uvicorn worker per core does.
+#
+#   python benchmarks/bench_crop_workers.py --workers 1 2 4 8 --duration 10
+#
+# --check-tiles instead checks that /recommend/batch answers a top_n above the
+# precomputed tiles' top_k from the models, in full, rather than truncated.
+#
+# Without --models-dir, synthetic sklearn models of production size are used.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app as api  # noqa: E402
+from crop_workers import start_worker_pool, worker_pids, process_memory  # noqa: E402
+
+MODEL_FILES = {
+    "soil_models": "soil_prediction_models.pkl",
+    "soil_encoders": "soil_level_encoders.pkl",
+    "soil_scaler": "soil_feature_scaler.pkl",
+    "cat_model": "crop_recommender_model.pkl",
+    "scaler_cat": "crop_feature_scaler.pkl",
+    "mlb": "crop_multilabel_binarizer.pkl",
+}
+
+
+def write_synthetic_models(models_dir, n_crops=150, n_trees=50, seed=0):
+    """Fit small random-data stand-ins with the production model structure"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.multioutput import MultiOutputClassifier
+    from sklearn.preprocessing import LabelEncoder, MultiLabelBinarizer, StandardScaler
+
+    rng = np.random.default_rng(seed)
+    n = 2000
+    locations = np.column_stack([rng.uniform(8, 37, n), rng.uniform(68, 97, n)])
+
+    soil_scaler = StandardScaler().fit(locations)
+    soil_encoders, soil_models = {}, {}
+    for level, classes in (("N_level", ["High", "Low", "Medium"]), ("P_level", ["High", "Low", "Medium"]),
+                           ("K_level", ["High", "Low", "Medium"]), ("pH_level", ["Acidic", "Alkaline", "Neutral"])):
+        encoder = LabelEncoder().fit(classes)
+        y = encoder.transform(rng.choice(classes, n))
+        soil_encoders[level] = encoder
+        soil_models[level] = RandomForestClassifier(n_estimators=n_trees, max_depth=12, random_state=0).fit(
+            soil_scaler.transform(locations), y)
+
+    scaler_cat = StandardScaler().fit(locations)
+    X = np.hstack([scaler_cat.transform(locations), rng.dirichlet(np.ones(3), size=(n, 4)).reshape(n, 12)])
+    crops = [f"Crop {i:03d}" for i in range(n_crops)]
+    mlb = MultiLabelBinarizer(classes=crops).fit([crops])
+    Y = (rng.random((n, n_crops)) < 0.1).astype(int)
+    cat_model = MultiOutputClassifier(
+        RandomForestClassifier(n_estimators=n_trees // 5, max_depth=10, random_state=0)
+    ).fit(X, Y)
+
+    models = {"soil_models": soil_models, "soil_encoders": soil_encoders, "soil_scaler": soil_scaler,
+              "cat_model": cat_model, "scaler_cat": scaler_cat, "mlb": mlb}
+    for name, filename in MODEL_FILES.items():
+        # Uncompressed, so load_model_file can memory-map the arrays
+        joblib.dump(models[name], os.path.join(models_dir, filename))
+
+
+def load_into_api(models_dir):
+    """Load the pickles into the app module globals, as load_models does"""
+    for name, filename in MODEL_FILES.items():
+        setattr(api, name, api.load_model_file(os.path.join(models_dir, filename), mmap=True))
+    api.soil_cache = None
+    api.crop_tiles = None
+    api.fused_crop_model = api.build_fused_crop_model(api.cat_model)
+
+
+def _init_private_worker(models_dir):
+    load_into_api(models_dir)
+
+
+def run_throughput(pool, duration, batch_size, in_flight, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(8, 37, batch_size).tolist()
+    lons = rng.uniform(68, 97, batch_size).tolist()
+
+    start = time.perf_counter()
+    pending = set()
+    batches = 0
+    while time.perf_counter() - start < duration:
+        while len(pending) < in_flight:
+            pending.add(pool.submit(api.recommend_batch, lats, lons, 5))
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()
+            batches += 1
+    for future in pending:
+        future.result()
+        batches += 1
+    elapsed = time.perf_counter() - start
+    return batches / elapsed, batches * batch_size / elapsed
+
+
+def bench(mode, n_workers, models_dir, args):
+    if mode == "fork":
+        pool = start_worker_pool(n_workers)
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_private_worker,
+            initargs=(models_dir,)
+        )
+        # Start every worker and wait for its model load
+        list(pool.map(_noop, range(n_workers * 4)))
+
+    try:
+        # Touch the models in every worker once before measuring
+        run_throughput(pool, 0.5, args.batch_size, n_workers * 2)
+        requests_per_s, rows_per_s = run_throughput(pool, args.duration, args.batch_size, n_workers * 2)
+        memory = [process_memory(pid) for pid in worker_pids(pool)]
+    finally:
+        pool.shutdown()
+
+    rss = [m["rss_mb"] for m in memory if m["rss_mb"] is not None]
+    pss = [m["pss_mb"] for m in memory if m["pss_mb"] is not None]
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        "batch_size": args.batch_size,
+        "requests_per_s": round(requests_per_s, 2),
+        "locations_per_s": round(rows_per_s, 1),
+        "rss_mb_per_worker": round(float(np.mean(rss)), 1) if rss else None,
+        "pss_mb_per_worker": round(float(np.mean(pss)), 1) if pss else None,
+        "pss_mb_total": round(float(np.sum(pss)), 1) if pss else None,
+    }
+
+
+def check_tiles(tmp, top_k=3, top_n=5):
+    """
+    Build tiles holding top_k crops over a small area, then compare
+    recommend_batch inside it with the models for top_n <= top_k (must come
+    from the tiles) and top_n > top_k (must come from the models, in full)
+    """
+    from crop_tiles import CropTileStore, build_tiles
+
+    prefix = os.path.join(tmp, "tiles")
+    build_tiles(api, (20.0, 75.0, 20.5, 75.5), 0.05, prefix, top_k=top_k)
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(20.0, 20.5, 50).tolist()
+    lons = rng.uniform(75.0, 75.5, 50).tolist()
+
+    failures = []
+    for n in (top_k, top_n):
+        api.crop_tiles = None
+        _, live, _ = api.recommend_batch(lats, lons, top_n=n)
+        api.crop_tiles = CropTileStore(prefix)
+        _, answered, log = api.recommend_batch(lats, lons, top_n=n)
+        from_tiles = n <= top_k
+        if from_tiles and log[0] != f"{len(lats)} locations read from precomputed tiles":
+            failures.append(f"top_n={n}: tiles not used ({log[0]})")
+        # Tiles quantize probabilities, so compare the crops only
+        crops = [[crop for crop, _ in row] for row in answered]
+        expected = [[crop for crop, _ in row] for row in live]
+        if from_tiles:
+            # Nearest-cell answers differ from the exact point now and then
+            if sum(c == e for c, e in zip(crops, expected)) < len(lats) // 2:
+                failures.append(f"top_n={n}: tile answers mostly differ from the models")
+        elif crops != expected:
+            failures.append(f"top_n={n}: answers differ from the models ({sorted({len(c) for c in crops})} crops)")
+    api.crop_tiles = None
+
+    print(json.dumps({"check": "tiles", "top_k": top_k, "top_n": top_n, "failures": failures}))
+    return not failures
+
+
+def _noop(_):
+    return os.getpid()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop inference worker benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--modes", nargs="+", default=["fork", "spawn"], choices=["fork", "spawn"])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds measured per configuration")
+    parser.add_argument("--batch-size", type=int, default=64, help="Locations per request")
+    parser.add_argument("--models-dir", help="Directory with the six production pickles")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--check-tiles", action="store_true", help="Run the tile top_n check instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        models_dir = args.models_dir
+        if models_dir is None:
+            print("Fitting synthetic models...")
+            write_synthetic_models(tmp)
+            models_dir = tmp
+        load_into_api(models_dir)
+        if args.check_tiles:
+            sys.exit(0 if check_tiles(tmp) else 1)
+        print(f"Parent RSS after load: {process_memory(os.getpid())['rss_mb']:.1f} MB")
+
+        results = []
+        for mode in args.modes:
+            for n_workers in sorted(set(args.workers)):
+                result = bench(mode, n_workers, models_dir, args)
+                results.append(result)
+                print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark: base64-in-JSON image upload vs raw body with JPEG draft decoding
+#
+# For each image both request paths are replayed without a server:
+#   base64  json.loads -> b64decode -> BytesIO -> full-size decode -> resize
+#   raw     BytesIO over the body -> decode_upload(draft_size) -> resize
+# Reported per path: mean decode time, peak Python heap (tracemalloc, which
+# covers the JSON/base64/bytes copies) and the size of the decoded pixel
+# buffer (allocated by Pillow, outside the Python heap).
+#
+#   python benchmarks/bench_image_upload.py --target 128 --synthetic 4000x3000
+
+import argparse
+import base64
+import glob
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules"))
+from image_upload import decode_upload
+
+TEST_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "Test_images")
+
+
+def synthetic_photo(width, height):
+    """A noisy gradient JPEG roughly the size of a phone photo"""
+    img = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    noise = Image.effect_noise((width, height), 40).convert("RGB")
+    buf = io.BytesIO()
+    Image.blend(img, noise, 0.3).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+def base64_path(body, target):
+    payload = json.loads(body)
+    image_bytes = base64.b64decode(payload["image"])
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    decoded = img.width * img.height * 3
+    return img.resize(target), decoded
+
+
+def raw_path(body, target):
+    img, _ = decode_upload(io.BytesIO(body), target)
+    decoded = img.width * img.height * 3
+    return img.resize(target), decoded
+
+
+def measure(fn, body, target, repeats):
+    tracemalloc.start()
+    _, decoded = fn(body, target)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(body, target)
+    return {
+        "decode_ms": round((time.perf_counter() - start) * 1000 / repeats, 2),
+        "peak_heap_kb": round(peak / 1024, 1),
+        "decoded_pixels_kb": round(decoded / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Image upload decode benchmark")
+    parser.add_argument("--target", type=int, default=128, help="Model input size (square)")
+    parser.add_argument("--synthetic", nargs="*", default=["4000x3000"], help="WIDTHxHEIGHT JPEGs to add")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    images = {os.path.basename(path): open(path, "rb").read() for path in sorted(glob.glob(os.path.join(TEST_IMAGES_DIR, "*")))}
+    for size in args.synthetic:
+        width, height = map(int, size.split("x"))
+        images[f"synthetic_{size}.jpg"] = synthetic_photo(width, height)
+
+    target = (args.target, args.target)
+    results = []
+    for name, raw in images.items():
+        json_body = json.dumps({"image": base64.b64encode(raw).decode()}).encode()
+        result = {
+            "image": name,
+            "bytes": len(raw),
+            "base64": measure(base64_path, json_body, target, args.repeats),
+            "raw": measure(raw_path, raw, target, args.repeats),
+        }
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
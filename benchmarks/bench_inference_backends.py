@@ -0,0 +1,179 @@
+# Benchmark: original vs ONNX Runtime (FP32 and INT8) backends for both image models
+#
+# Each backend runs in its own process on the images in backend/models/Test_images
+# and reports load time, RSS, batch-1 latency and batched throughput. Outputs are
+# compared with the original backend (Keras / Ultralytics) for accuracy drift:
+# top-1 agreement and max probability difference for the disease classifier,
+# detection count and matched-box IoU for the pest detector.
+#
+# Export the ONNX models first (backend/modules/export_onnx.py), then e.g.
+#
+#   python benchmarks/bench_inference_backends.py disease \
+#       --model plant_disease_model_finetuned.h5 --onnx plant_disease.onnx plant_disease.int8.onnx
+#   python benchmarks/bench_inference_backends.py pest \
+#       --model backend/models/best.pt --onnx best.onnx best.int8.onnx --threads 4
+
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules")
+TEST_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "Test_images")
+sys.path.insert(0, MODULES_DIR)
+
+INPUT_SIZES = {"disease": 128, "pest": 640}
+REFERENCE_BACKENDS = {"disease": "keras", "pest": "ultralytics"}
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(task, backend, path, images_dir, batch_size, repeats, threads, output_path):
+    """Runs in a child process; writes metrics to output_path.json and outputs to output_path.npz"""
+    from image_preprocessing import BatchPreprocessor
+    from inference_backends import load_classifier, load_detector
+
+    size = INPUT_SIZES[task]
+    images = [open(p, "rb").read() for p in sorted(glob.glob(os.path.join(images_dir, "*")))]
+    inputs = BatchPreprocessor((size, size), letterbox=task == "pest").preprocess(images).copy()
+
+    kwargs = {}
+    if backend == "onnx" and threads:
+        kwargs["intra_op_threads"] = threads
+    baseline_rss = rss_mb()
+    start = time.perf_counter()
+    if task == "disease":
+        model = load_classifier(backend, path, **kwargs)
+        run = model.predict
+    else:
+        model = load_detector(backend, path, **kwargs)
+        run = model.detect
+    load_s = time.perf_counter() - start
+
+    outputs = [run(inputs[i:i + 1]) for i in range(len(inputs))]  # warm-up, and the outputs compared for drift
+
+    latencies = []
+    for _ in range(repeats):
+        for i in range(len(inputs)):
+            start = time.perf_counter()
+            run(inputs[i:i + 1])
+            latencies.append(time.perf_counter() - start)
+
+    batch = np.concatenate([inputs] * -(-batch_size // len(inputs)))[:batch_size]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run(batch)
+    throughput = repeats * batch_size / (time.perf_counter() - start)
+
+    metrics = {
+        "backend": backend,
+        "model": os.path.basename(path),
+        "load_s": round(load_s, 2),
+        "rss_mb": round(rss_mb(), 1),
+        "backend_rss_mb": round(rss_mb() - baseline_rss, 1),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 2),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 2),
+        f"throughput_batch{batch_size}_ips": round(throughput, 1),
+    }
+    with open(output_path + ".json", "w") as f:
+        json.dump(metrics, f)
+
+    if task == "disease":
+        np.savez(output_path + ".npz", probabilities=np.concatenate(outputs))
+    else:
+        arrays = {}
+        for i, ((boxes, confidences, classes),) in enumerate(outputs):
+            arrays[f"boxes_{i}"], arrays[f"classes_{i}"] = boxes, classes
+        np.savez(output_path + ".npz", **arrays)
+
+
+def box_iou(a, b):
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def drift(task, reference, candidate):
+    if task == "disease":
+        ref, cand = reference["probabilities"], candidate["probabilities"]
+        return {
+            "top1_agreement": float(np.mean(ref.argmax(1) == cand.argmax(1))),
+            "max_prob_diff": float(np.abs(ref - cand).max()),
+        }
+
+    n_images = len([k for k in reference.files if k.startswith("boxes_")])
+    count_diff, ious = 0, []
+    for i in range(n_images):
+        ref_boxes, cand_boxes = reference[f"boxes_{i}"], candidate[f"boxes_{i}"]
+        count_diff += abs(len(ref_boxes) - len(cand_boxes))
+        if len(ref_boxes) and len(cand_boxes):
+            ious.extend(box_iou(ref_boxes, cand_boxes).max(axis=1).tolist())
+        else:
+            ious.extend([0.0] * len(ref_boxes))
+    return {
+        "detection_count_diff": count_diff,
+        "mean_matched_iou": round(float(np.mean(ious)), 4) if ious else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference backend benchmark")
+    parser.add_argument("task", choices=["disease", "pest"])
+    parser.add_argument("--model", required=True, help="Original model (.h5 or .pt)")
+    parser.add_argument("--onnx", nargs="+", default=[], help="ONNX exports to compare (FP32, INT8, ...)")
+    parser.add_argument("--images", default=TEST_IMAGES_DIR)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0 = default)")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--child", nargs=3, metavar=("BACKEND", "PATH", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        backend, path, out = args.child
+        run_backend(args.task, backend, path, args.images, args.batch_size, args.repeats, args.threads, out)
+        return
+
+    runs = [(REFERENCE_BACKENDS[args.task], args.model)] + [("onnx", path) for path in args.onnx]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (backend, path) in enumerate(runs):
+            out = os.path.join(tmp, f"run{i}")
+            subprocess.run([
+                sys.executable, os.path.abspath(__file__), args.task, "--model", args.model,
+                "--images", args.images, "--batch-size", str(args.batch_size),
+                "--repeats", str(args.repeats), "--threads", str(args.threads),
+                "--child", backend, path, out
+            ], check=True)
+            with open(out + ".json") as f:
+                result = json.load(f)
+            reference = np.load(os.path.join(tmp, "run0.npz"))
+            result.update(drift(args.task, reference, np.load(out + ".npz")))
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# Benchmark: cost of the instrumentation layer (backend/modules/instrumentation.py)
+#
+# 1. Per-call cost of a stage timer (context manager and decorator) and of a
+#    histogram observation, and the time to render /metrics.
+# 2. Request overhead: a small FastAPI app served in-process over ASGI, with
+#    the endpoint doing --work-ms of CPU work in three timed stages, like a
+#    cheap real request. Requests alternate between instrumentation on and
+#    off (METRICS_ENABLED toggled at runtime), so machine noise hits both
+#    sides equally; overhead_pct compares the median latencies.
+#
+#   python benchmarks/bench_instrumentation.py --work-ms 0.5 2 10
+#
+# For the real services, compare two suite runs:
+#   METRICS_ENABLED=0 python benchmarks/run_suite.py --output off.json
+#   python benchmarks/run_suite.py --output on.json
+#   python benchmarks/run_suite.py --compare off.json on.json --threshold 0.01
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules"))
+
+
+def per_call_costs(n=200_000):
+    from instrumentation import metrics, stage, stage_seconds
+
+    def bare():
+        pass
+
+    @stage("decorated")
+    def decorated():
+        pass
+
+    def with_block():
+        with stage("block"):
+            pass
+
+    def observe():
+        stage_seconds.observe(0.001, "observe")
+
+    baseline = timeit.timeit(bare, number=n) / n
+    results = {
+        name: round((timeit.timeit(fn, number=n) / n - baseline) * 1e9, 1)
+        for name, fn in (("stage_decorator_ns", decorated), ("stage_context_ns", with_block), ("observe_ns", observe))
+    }
+
+    # A scrape with a realistic number of series
+    for i in range(200):
+        stage_seconds.observe(0.001, f"stage_{i}")
+    start = time.perf_counter()
+    text = metrics.render()
+    results["render_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["render_bytes"] = len(text)
+    return results
+
+
+def burn(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+async def request_latency(work_ms, n_requests):
+    import httpx
+    from fastapi import FastAPI
+    import instrumentation
+    from instrumentation import instrument_app, stage, TimedJSONResponse
+
+    app = FastAPI(default_response_class=TimedJSONResponse)
+    instrument_app(app, "bench")
+
+    @stage("inference")
+    def infer():
+        burn(work_ms / 1000 / 3)
+
+    @app.post("/work/{item}")
+    async def work(item: int):
+        with stage("decode"):
+            burn(work_ms / 1000 / 3)
+        with stage("preprocess"):
+            burn(work_ms / 1000 / 3)
+        infer()
+        return {"item": item, "scores": list(range(20))}
+
+    latencies = {True: [], False: []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(50):
+            await client.post(f"/work/{i}")
+        for i in range(2 * n_requests):
+            enabled = instrumentation.METRICS_ENABLED = i % 2 == 0
+            start = time.perf_counter()
+            await client.post(f"/work/{i}")
+            latencies[enabled].append(time.perf_counter() - start)
+    instrumentation.METRICS_ENABLED = True
+
+    off, on = (sorted(latencies[enabled])[n_requests // 2] for enabled in (False, True))
+    return {
+        "kind": "request",
+        "work_ms": work_ms,
+        "off_ms": round(off * 1000, 4),
+        "on_ms": round(on * 1000, 4),
+        "overhead_us": round((on - off) * 1e6, 1),
+        "overhead_pct": round((on / off - 1) * 100, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrumentation overhead benchmark")
+    parser.add_argument("--work-ms", type=float, nargs="+", default=[0.5, 2.0, 10.0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = [dict(kind="per_call", **per_call_costs())]
+    print(json.dumps(results[0]))
+
+    for work_ms in args.work_ms:
+        result = asyncio.run(request_latency(work_ms, args.requests))
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
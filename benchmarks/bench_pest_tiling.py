@@ -0,0 +1,150 @@
+# Benchmark: tiled pest detection (backend/modules/tiled_detection.py)
+#
+# Each image in backend/models/Test_images, upscaled by each --upscale factor
+# to stand in for a high-resolution field photo, is detected
+#   full       - resized to the 640 px input, as PEST_INFERENCE_MODE=full does
+#   reference  - in one pass at (nearly) native resolution, the longer side
+#                rounded up to a multiple of 32 and capped at --reference-max
+#   tiled      - TiledDetector, once per --min-detail (0 disables the pre-pass)
+# and reports latency, crops run and tiles skipped per mode. There are no
+# ground-truth labels, so accuracy is agreement with the reference pass:
+# recall and precision of same-class boxes matched at IoU >= --match-iou,
+# and the mean IoU of the matches.
+#
+#   python benchmarks/bench_pest_tiling.py --model backend/models/best.pt --upscale 1 2 4
+#   python benchmarks/bench_pest_tiling.py --backend onnx --model best.onnx --min-detail 0 3 6
+#
+# --backend stub times the tiling, pre-pass and merge around a fake detector
+# (its boxes are random, so its accuracy columns mean nothing).
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules")
+TEST_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "Test_images")
+sys.path.insert(0, MODULES_DIR)
+
+from bench_inference_backends import box_iou
+from image_preprocessing import BatchPreprocessor
+from tiled_detection import TiledDetector
+
+
+def make_detect_fn(detector, size):
+    """main.detect_pests with its own input size"""
+    preprocessor = BatchPreprocessor((size, size), letterbox=True)
+
+    def detect(images):
+        results = detector.detect(preprocessor.preprocess(images))
+        detections = []
+        for img, (boxes, confidences, classes) in zip(images, results):
+            detections.append({"boxes": preprocessor.to_image_coords(boxes, img.size).tolist(),
+                               "confidences": confidences.tolist(), "classes": classes.tolist()})
+        return detections
+
+    return detect
+
+
+def agreement(reference, candidate, match_iou):
+    """Greedy same-class matching of candidate boxes to reference boxes"""
+    ref_boxes = np.asarray(reference["boxes"], dtype=np.float32).reshape(-1, 4)
+    boxes = np.asarray(candidate["boxes"], dtype=np.float32).reshape(-1, 4)
+    if len(ref_boxes) == 0 or len(boxes) == 0:
+        return {"reference_boxes": len(ref_boxes), "boxes": len(boxes),
+                "recall": 1.0 if len(ref_boxes) == 0 else 0.0,
+                "precision": 1.0 if len(boxes) == 0 else 0.0, "mean_iou": None}
+
+    iou = box_iou(ref_boxes, boxes)
+    iou[np.asarray(reference["classes"])[:, None] != np.asarray(candidate["classes"])[None, :]] = 0
+    matched = []
+    for _ in range(min(iou.shape)):
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < match_iou:
+            break
+        matched.append(float(iou[i, j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return {"reference_boxes": len(ref_boxes), "boxes": len(boxes),
+            "recall": round(len(matched) / len(ref_boxes), 3), "precision": round(len(matched) / len(boxes), 3),
+            "mean_iou": round(float(np.mean(matched)), 3) if matched else None}
+
+
+def median_ms(fn, repeats):
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return round(sorted(times)[len(times) // 2] * 1000, 2), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled pest detection benchmark")
+    parser.add_argument("--backend", choices=["ultralytics", "onnx", "stub"], default="ultralytics")
+    parser.add_argument("--model", default=os.path.join(MODULES_DIR, "..", "models", "best.pt"))
+    parser.add_argument("--images", default=TEST_IMAGES_DIR)
+    parser.add_argument("--upscale", type=float, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--input-size", type=int, default=640)
+    parser.add_argument("--tile-size", type=int, default=640)
+    parser.add_argument("--overlap", type=int, default=128)
+    parser.add_argument("--min-detail", type=float, nargs="+", default=[0, 3])
+    parser.add_argument("--reference-max", type=int, default=3200)
+    parser.add_argument("--match-iou", type=float, default=0.5)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.backend == "stub":
+        from fixtures import StubDetector
+        detector = StubDetector(input_size=args.input_size)
+    else:
+        from inference_backends import load_detector
+        detector = load_detector(args.backend, args.model)
+    detect = make_detect_fn(detector, args.input_size)
+
+    results = []
+    for path in sorted(glob.glob(os.path.join(args.images, "*"))):
+        original = Image.open(path).convert("RGB")
+        for factor in args.upscale:
+            image = original.resize((round(original.width * factor), round(original.height * factor)),
+                                    Image.BICUBIC)
+            reference_size = min(args.reference_max, -(-max(image.size) // 32) * 32)
+            reference_detect = make_detect_fn(detector, reference_size)
+            reference_ms, reference = median_ms(lambda: reference_detect([image])[0], args.repeats)
+            base = {"image": os.path.basename(path), "upscale": factor, "size": list(image.size)}
+
+            result = {**base, "mode": "reference", "input_size": reference_size, "latency_ms": reference_ms,
+                      "boxes": len(reference["boxes"])}
+            results.append(result)
+            print(json.dumps(result))
+
+            full = TiledDetector(args.tile_size, args.overlap)
+            latency_ms, detections = median_ms(lambda: full.detect(detect, [(image, False)])[0], args.repeats)
+            result = {**base, "mode": "full", "input_size": args.input_size, "latency_ms": latency_ms,
+                      "crops": 1, **agreement(reference, detections, args.match_iou)}
+            results.append(result)
+            print(json.dumps(result))
+
+            for min_detail in args.min_detail:
+                tiler = TiledDetector(args.tile_size, args.overlap, min_detail=min_detail)
+                plan_ms, (windows, total) = median_ms(lambda: tiler.plan(image), args.repeats)
+                latency_ms, detections = median_ms(lambda: tiler.detect(detect, [(image, True)])[0], args.repeats)
+                result = {**base, "mode": "tiled", "min_detail": min_detail, "latency_ms": latency_ms,
+                          "plan_ms": plan_ms, "tiles": total, "tiles_skipped": total - len(windows) if total > 1 else 0,
+                          "crops": 1 + len(windows), **agreement(reference, detections, args.match_iou)}
+                results.append(result)
+                print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
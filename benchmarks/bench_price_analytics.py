@@ -0,0 +1,149 @@
+# Benchmark: analytics rollups (backend/models/market_price/price_rollups.py)
+#
+# Builds PriceRollups over a synthetic mandi price history (--rows; 730,000
+# rows is a year at ~2,000 rows a day), then times each query kind against
+# the same question answered by filtering and grouping the DataFrame, the
+# ingest of --ingest-days more days of rows one day at a time, and saving
+# and loading the rollups as the price snapshot does.
+#
+# It then ingests one more district, held back from the history entirely,
+# and checks that every commodity's summaries equal those of rollups
+# rebuilt from all the rows ("ingest_matches_rebuild").
+#
+#   python benchmarks/bench_price_analytics.py --rows 730000 --days 7 30 365
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "market_price"))
+
+from price_rollups import PriceRollups
+from bench_price_cold_start import write_synthetic_csv
+from price_index import clean_price_frame
+
+
+def median_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(sorted(times)[len(times) // 2] * 1000, 4)
+
+
+def pandas_summary(df, commodity, start, end, state=None):
+    rows = df[(df["commodity"] == commodity) & (df["arrival_date"] >= start) & (df["arrival_date"] <= end)]
+    if state is not None:
+        rows = rows[rows["state"] == state]
+    return rows.groupby(["state", "district"]).agg(
+        records=("modal_price", "size"), mean_modal_price=("modal_price", "mean"),
+        median_modal_price=("modal_price", "median"), min_price=("min_price", "min"), max_price=("max_price", "max"))
+
+
+def pandas_top_markets(df, commodity, start, end, k):
+    rows = df[(df["commodity"] == commodity) & (df["arrival_date"] >= start) & (df["arrival_date"] <= end)]
+    spread = (rows["max_price"] - rows["min_price"]).rename("spread")
+    return spread.groupby([rows["state"], rows["district"], rows["market"]]).mean().nlargest(k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price analytics rollups benchmark")
+    parser.add_argument("--rows", type=int, default=730_000)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 365])
+    parser.add_argument("--ingest-days", type=int, default=5)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "prices.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        df = clean_price_frame(pd.read_csv(csv_path))
+
+    # Hold the last days back to ingest them afterwards, and the (state, district)
+    # that sorts first, to ingest it as a district the rollups have not seen
+    held_back = sorted(df["arrival_date"].unique())[-args.ingest_days:]
+    first_state = df["state"] == df["state"].min()
+    late_district = first_state & (df["district"] == df.loc[first_state, "district"].min())
+    history = df[(df["arrival_date"] < held_back[0]) & ~late_district]
+
+    start = time.perf_counter()
+    rollups = PriceRollups(history)
+    results = [{"kind": "build", "rows": len(history), "seconds": round(time.perf_counter() - start, 3),
+                **rollups.stats()}]
+    print(json.dumps(results[0]))
+
+    commodity = history["commodity"].iloc[0]
+    state = history.loc[history["commodity"] == commodity, "state"].iloc[0]
+    district = history.loc[(history["commodity"] == commodity) & (history["state"] == state), "district"].iloc[0]
+    rollups.view(commodity)
+
+    for days in args.days:
+        start_day, end_day = rollups.date_range(days=days)
+        start_date = pd.Timestamp(start_day, unit="D")
+        end_date = pd.Timestamp(end_day, unit="D")
+        queries = {
+            "summary_district": (lambda: rollups.summaries(commodity, start_day, end_day, state, district), None),
+            "summary_state": (lambda: rollups.summaries(commodity, start_day, end_day, state),
+                              lambda: pandas_summary(history, commodity, start_date, end_date, state)),
+            "summary_all_districts": (lambda: rollups.summaries(commodity, start_day, end_day),
+                                      lambda: pandas_summary(history, commodity, start_date, end_date)),
+            "daily_district": (lambda: rollups.district(state, district, commodity).daily(start_day, end_day), None),
+            "top_markets": (lambda: rollups.top_markets(commodity, start_day, end_day, 10),
+                            lambda: pandas_top_markets(history, commodity, start_date, end_date, 10)),
+        }
+        for name, (rollup_query, pandas_query) in queries.items():
+            result = {"kind": "query", "query": name, "days": days,
+                      "rollups_ms": median_ms(rollup_query, args.repeats)}
+            if pandas_query is not None:
+                result["pandas_ms"] = median_ms(pandas_query, max(3, args.repeats // 10))
+                result["speedup"] = round(result["pandas_ms"] / result["rollups_ms"], 1)
+            results.append(result)
+            print(json.dumps(result))
+
+    for day in held_back:
+        new_day = df[(df["arrival_date"] == day) & ~late_district]
+        start = time.perf_counter()
+        rollups.ingest(new_day)
+        ingest_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        rollups.view(commodity)
+        result = {"kind": "ingest", "rows": len(new_day), "ingest_ms": round(ingest_seconds * 1000, 2),
+                  "view_rebuild_ms": round((time.perf_counter() - start) * 1000, 2)}
+        results.append(result)
+        print(json.dumps(result))
+
+    rollups.ingest(df[late_district])
+    rebuilt = PriceRollups(df)
+    start_day, end_day = rebuilt.date_range(start_date=df["arrival_date"].min())
+    mismatched = [commodity for commodity in df["commodity"].unique()
+                  if rollups.summaries(commodity, start_day, end_day) != rebuilt.summaries(commodity, start_day, end_day)]
+    result = {"kind": "check", "ingest_matches_rebuild": not mismatched, "mismatched_commodities": len(mismatched)}
+    results.append(result)
+    print(json.dumps(result))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        rollups.save(tmp)
+        save_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        PriceRollups.load(tmp)
+        result = {"kind": "snapshot", "save_ms": round(save_seconds * 1000, 2),
+                  "load_ms": round((time.perf_counter() - start) * 1000, 2)}
+    results.append(result)
+    print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Benchmark: price API data cold start, CSV parse vs columnar snapshot
+#
+# For each size a synthetic mandi price CSV is generated, then a fresh Python
+# process loads it (a) by parsing the CSV and building the index and (b) from
+# the snapshot written by the first load. The OS page cache is not dropped.
+#
+#   python benchmarks/bench_price_cold_start.py --rows 10000 1000000 10000000
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+MARKET_PRICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "market_price")
+
+LOAD_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {market_price_dir!r})
+from price_snapshot import load_price_data
+history, index, rollups, meta, source = load_price_data({csv_path!r}, {snapshot_dir!r})
+print(time.perf_counter() - start, len(history), len(index), source)
+"""
+
+
+def write_synthetic_csv(path, n_rows, seed=0):
+    """Mandi-price-shaped CSV: ~2,500 (state, district, commodity) keys over many days"""
+    rng = np.random.default_rng(seed)
+    states = np.array([f"State {i}" for i in range(30)])
+    districts = np.array([f"District {i}" for i in range(400)])
+    markets = np.array([f"Market {i}" for i in range(2000)])
+    commodities = np.array([f"Commodity {i}" for i in range(60)])
+
+    market_ids = rng.integers(0, markets.size, n_rows)
+    district_ids = market_ids % districts.size
+    days = rng.integers(0, max(n_rows // 2000, 6), n_rows)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(days, unit="D")
+    min_prices = rng.integers(500, 5000, n_rows)
+    spread = rng.integers(0, 2000, n_rows)
+
+    df = pd.DataFrame({
+        "state": states[district_ids % states.size],
+        "district": districts[district_ids],
+        "market": markets[market_ids],
+        "commodity": commodities[rng.integers(0, commodities.size, n_rows)],
+        "variety": "Other",
+        "grade": "FAQ",
+        "arrival_date": dates.strftime("%d-%m-%Y"),
+        "min_price": min_prices,
+        "max_price": (min_prices + spread).astype(float),
+        "modal_price": (min_prices + spread / 2).astype(float),
+    })
+    df.to_csv(path, index=False)
+
+
+def timed_load(csv_path, snapshot_dir):
+    script = LOAD_SCRIPT.format(market_price_dir=MARKET_PRICE_DIR, csv_path=csv_path, snapshot_dir=snapshot_dir)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    process_seconds = time.perf_counter() - start
+    load_seconds, n_rows, n_keys = output.split()[:3]
+    return {"load_s": round(float(load_seconds), 3), "process_s": round(process_seconds, 3),
+            "rows": int(n_rows), "keys": int(n_keys)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price history cold-start benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_rows in args.rows:
+            csv_path = os.path.join(tmp, f"prices_{n_rows}.csv")
+            snapshot_dir = csv_path + ".snapshot"
+            write_synthetic_csv(csv_path, n_rows)
+
+            csv_load = timed_load(csv_path, None)
+            # First load with a snapshot dir parses the CSV and writes the snapshot
+            build = timed_load(csv_path, snapshot_dir)
+            snapshot_load = timed_load(csv_path, snapshot_dir)
+
+            result = {
+                "rows": n_rows,
+                "csv_mb": round(os.path.getsize(csv_path) / 2**20, 1),
+                "csv_cold_start_s": csv_load["load_s"],
+                "snapshot_build_s": build["load_s"],
+                "snapshot_cold_start_s": snapshot_load["load_s"],
+                "speedup": round(csv_load["load_s"] / max(snapshot_load["load_s"], 1e-9), 1),
+            }
+            results.append(result)
+            print(json.dumps(result))
+
+            os.remove(csv_path)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
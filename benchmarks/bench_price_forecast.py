@@ -0,0 +1,114 @@
+# Benchmark: multi-day price forecasts (backend/models/market_price/price_forecast.py)
+#
+# For each district size, n markets are forecast --horizon days ahead
+# (a) with a nested loop, one model.predict per market per day, and
+# (b) with recursive_forecast, one model.predict per day over all markets.
+# Both give the same numbers; max_abs_diff checks that. The model is either
+# the linear stub used by the suite or a gradient-boosted regressor, whose
+# per-call overhead is closer to the real XGBoost model's.
+#
+#   python benchmarks/bench_price_forecast.py --markets 1 10 50 200 --horizon 7 14 --model gbm
+#
+# End to end, with the forecast cache disabled (the suite sets this):
+#   python benchmarks/run_suite.py --services price
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "market_price"))
+
+from price_forecast import LAG_1, LAG_2, MAX_PRICE, MIN_PRICE, ROLLING_MEAN_3, price_windows, recursive_forecast
+
+
+def make_model(kind, seed=0):
+    if kind == "stub":
+        from fixtures import StubPriceModel
+        return StubPriceModel(seed)
+
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(1000, 5000, (5000, 9))
+    y = 0.6 * X[:, LAG_1] + 0.4 * X[:, ROLLING_MEAN_3] + rng.normal(0, 50, 5000)
+    return HistGradientBoostingRegressor(max_iter=100).fit(X, y)
+
+
+def synthetic_markets(n, seed=0):
+    rng = np.random.default_rng(seed)
+    windows = rng.uniform(1000, 5000, (n, 3))
+    features = np.column_stack([
+        rng.integers(0, 30, n), rng.integers(0, 400, n), rng.integers(0, 2000, n), rng.integers(0, 60, n),
+        windows[:, 2] - 100, windows[:, 2] + 100, windows[:, 2], windows[:, 1], windows.mean(axis=1)
+    ]).astype(float)
+    return features, [list(window) for window in windows]
+
+
+def nested_loop_forecast(model, features, recent_prices, horizon):
+    """The straightforward version: every market and every day on its own"""
+    forecast = np.empty((len(features), horizon))
+    for row, (x, prices) in enumerate(zip(features, recent_prices)):
+        x = x.copy()
+        prices = list(prices)
+        for step in range(horizon):
+            predicted = float(model.predict(x.reshape(1, -1))[0])
+            forecast[row, step] = predicted
+            change = predicted - x[LAG_1]
+            x[MIN_PRICE] += change
+            x[MAX_PRICE] += change
+            x[LAG_2], x[LAG_1] = x[LAG_1], predicted
+            prices = (prices + [predicted])[-3:]
+            x[ROLLING_MEAN_3] = np.mean(prices)
+    return forecast
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-day price forecast benchmark")
+    parser.add_argument("--markets", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[7, 14])
+    parser.add_argument("--model", choices=["stub", "gbm"], default="gbm")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    model = make_model(args.model)
+    results = []
+    for n in args.markets:
+        features, recent_prices = synthetic_markets(n)
+        windows = price_windows(recent_prices)
+        for horizon in args.horizon:
+            loop_seconds, expected = best_of(
+                lambda: nested_loop_forecast(model, features, recent_prices, horizon), args.repeats)
+            vector_seconds, actual = best_of(
+                lambda: recursive_forecast(model, features, windows, horizon), args.repeats)
+            result = {
+                "model": args.model,
+                "markets": n,
+                "horizon": horizon,
+                "nested_loop_ms": round(loop_seconds * 1000, 3),
+                "vectorized_ms": round(vector_seconds * 1000, 3),
+                "speedup": round(loop_seconds / vector_seconds, 1),
+                "max_abs_diff": float(np.abs(expected - actual).max()),
+            }
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
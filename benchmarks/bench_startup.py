@@ -0,0 +1,104 @@
+# Benchmark: time from process start to first served request, and to readiness
+#
+# Starts a service under uvicorn and polls its health endpoint. "first_response"
+# is when the server answers anything (the registry reports 503 "loading" while
+# models load in the background); "ready" is when the health endpoint returns
+# 200. Run it on the commit before the model registry for the old numbers,
+# where both happen together once every model has loaded at import.
+#
+#   python benchmarks/bench_startup.py crop
+#   python benchmarks/bench_startup.py price --runs 5
+#   MODEL_OFFLINE=1 python benchmarks/bench_startup.py disease
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# name -> (working directory, app import string, health path)
+SERVICES = {
+    "crop": (REPO_ROOT, "app:app", "/health"),
+    "price": (os.path.join(REPO_ROOT, "backend", "models", "market_price"), "app:app", "/health"),
+    "pest": (os.path.join(REPO_ROOT, "backend", "modules"), "main:app", "/sih/health"),
+    "disease": (os.path.join(REPO_ROOT, "test"), "app:app", "/sih/health"),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def poll_status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, socket.timeout):
+        return None
+
+
+def measure(service, timeout, interval=0.01):
+    cwd, app, health_path = SERVICES[service]
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{health_path}"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    first_response = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{service} exited with code {process.returncode}")
+            status = poll_status(url)
+            if status is not None and first_response is None:
+                first_response = time.perf_counter() - start
+            if status == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(interval)
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {
+        "service": service,
+        "first_response_s": round(first_response, 3) if first_response is not None else None,
+        "ready_s": round(ready, 3) if ready is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service startup benchmark")
+    parser.add_argument("services", nargs="+", choices=sorted(SERVICES))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for service in args.services:
+        for _ in range(args.runs):
+            result = measure(service, args.timeout)
+            results.append(result)
+            print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
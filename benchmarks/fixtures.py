@@ -0,0 +1,133 @@
+# Synthetic fixtures and stub models for the offline benchmark suite
+#
+# Each setup_* function writes the artifacts a service reads at import time
+# into a work directory and points the service's environment variables at
+# them, so it must run before the service module is imported. Pest and
+# disease use in-memory stub models that are registered over the real
+# loaders (see run_suite.py); crop and price load synthetic sklearn models
+# through their normal loaders.
+
+import io
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+
+def synthetic_jpegs(n, size=(1024, 768), quality=90, seed=0):
+    """n distinct photo-sized JPEGs (smooth gradients plus noise, so they compress like photos)"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    images = []
+    for _ in range(n):
+        base = rng.uniform(0, 255, 3)
+        slope = rng.uniform(-0.2, 0.2, (2, 3))
+        pixels = base + x[..., None] * slope[0] + y[..., None] * slope[1] + rng.normal(0, 12, (height, width, 3))
+        buffer = io.BytesIO()
+        Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=quality)
+        images.append(buffer.getvalue())
+    return images
+
+
+def random_locations(n, seed=0):
+    """(latitudes, longitudes) spread over India"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(8, 37, n).round(4).tolist(), rng.uniform(68, 97, n).round(4).tolist()
+
+
+def setup_crop(workdir, n_crops=150, n_trees=50):
+    models_dir = os.path.join(workdir, "crop_models")
+    os.makedirs(models_dir, exist_ok=True)
+    os.environ["CROP_MODELS_DIR"] = models_dir
+    os.environ.pop("SOIL_CACHE_SNAPSHOT", None)
+    os.environ.pop("CROP_TILES", None)
+
+    # bench_crop_workers imports app, which reads CROP_MODELS_DIR, so import it after setting it
+    from bench_crop_workers import write_synthetic_models
+    write_synthetic_models(models_dir, n_crops=n_crops, n_trees=n_trees)
+
+
+class StubPriceModel:
+    """Stand-in for the XGBoost regressor: a fixed linear model over the 9 features"""
+
+    def __init__(self, seed=0):
+        self.coef = np.random.default_rng(seed).normal(0, 0.05, 9)
+        # Next-day price tracks lag_1 and the rolling mean, as the real model does
+        self.coef[6], self.coef[8] = 0.6, 0.4
+
+    def predict(self, X):
+        return np.asarray(X, dtype=float) @ self.coef
+
+
+def setup_price(workdir, n_rows=200_000):
+    """Writes the CSV, encoders and model; returns (state, district, commodity) keys with data"""
+    from bench_price_cold_start import write_synthetic_csv
+    from sklearn.preprocessing import LabelEncoder
+
+    price_dir = os.path.join(workdir, "price")
+    os.makedirs(price_dir, exist_ok=True)
+    csv_path = os.path.join(price_dir, "prices.csv")
+    write_synthetic_csv(csv_path, n_rows)
+
+    df = pd.read_csv(csv_path)
+    encoders = {column: LabelEncoder().fit(df[column]) for column in ("state", "district", "market", "commodity")}
+    joblib.dump(encoders, os.path.join(price_dir, "encoders.pkl"))
+    joblib.dump(StubPriceModel(), os.path.join(price_dir, "model.pkl"))
+
+    os.environ["PRICE_CSV_PATH"] = csv_path
+    os.environ["PRICE_SNAPSHOT_DIR"] = os.path.join(price_dir, "snapshot")
+    os.environ["PRICE_MODEL_PATH"] = os.path.join(price_dir, "model.pkl")
+    os.environ["PRICE_ENCODERS_PATH"] = os.path.join(price_dir, "encoders.pkl")
+
+    keys = df[["state", "district", "commodity"]].drop_duplicates()
+    return [tuple(key) for key in keys.itertuples(index=False)]
+
+
+class StubDetector:
+    """
+    Stand-in for the YOLO detector: a few boxes per image, with latency_ms
+    of simulated inference per batch plus per_image_ms per image.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_ms=20.0, per_image_ms=5.0, n_boxes=5, input_size=640, seed=0):
+        self.latency = latency_ms / 1000
+        self.per_image = per_image_ms / 1000
+        self.n_boxes = n_boxes
+        self.input_size = input_size
+        self.rng = np.random.default_rng(seed)
+
+    def detect(self, batch):
+        time.sleep(self.latency + self.per_image * len(batch))
+        detections = []
+        for _ in range(len(batch)):
+            xy = self.rng.uniform(0, self.input_size * 0.8, (self.n_boxes, 2))
+            wh = self.rng.uniform(10, self.input_size * 0.2, (self.n_boxes, 2))
+            boxes = np.hstack([xy, xy + wh]).astype(np.float32)
+            detections.append((boxes, self.rng.uniform(0.25, 1, self.n_boxes).astype(np.float32),
+                               self.rng.integers(0, 12, self.n_boxes).astype(np.float32)))
+        return detections
+
+
+class StubClassifier:
+    """
+    Stand-in for the disease CNN: one dense layer over the flattened input,
+    so inference cost still scales with batch size and image size.
+    """
+
+    name = "stub"
+
+    def __init__(self, input_shape=(128, 128, 3), n_classes=38, seed=0):
+        rng = np.random.default_rng(seed)
+        self.weights = rng.normal(0, 0.01, (int(np.prod(input_shape)), n_classes)).astype(np.float32)
+
+    def predict(self, batch):
+        logits = np.asarray(batch, dtype=np.float32).reshape(len(batch), -1) @ self.weights
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
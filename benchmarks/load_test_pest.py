@@ -0,0 +1,93 @@
+# Load test for the pest detector endpoint (/sih/predict)
+#
+# Start the service once without batching and once with it, then run this
+# script against each to compare throughput on a CPU-only machine:
+#
+#   cd backend/modules
+#   PEST_BATCH_SIZE=1 uvicorn main:app --port 8001        # baseline
+#   PEST_BATCH_SIZE=8 PEST_BATCH_WAIT_MS=10 uvicorn main:app --port 8001
+#
+#   python benchmarks/load_test_pest.py --url http://localhost:8001/sih/predict --concurrency 1 4 16
+
+import argparse
+import asyncio
+import base64
+import glob
+import json
+import os
+import time
+
+import httpx
+import numpy as np
+
+TEST_IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "models", "Test_images")
+
+
+def load_payloads(images_dir):
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(images_dir, "*"))):
+        with open(path, "rb") as f:
+            payloads.append({"image": base64.b64encode(f.read()).decode()})
+    if not payloads:
+        raise SystemExit(f"No images found in {images_dir}")
+    return payloads
+
+
+async def run_level(url, payloads, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(timeout=120.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def worker(worker_id):
+            nonlocal errors
+            i = worker_id
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payloads[i % len(payloads)])
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+                i += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 1) if latencies else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Pest detector load test")
+    parser.add_argument("--url", default="http://localhost:8001/sih/predict")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per concurrency level")
+    parser.add_argument("--images", default=TEST_IMAGES_DIR)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.images)
+    results = []
+    for concurrency in args.concurrency:
+        result = await run_level(args.url, payloads, concurrency, args.duration)
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
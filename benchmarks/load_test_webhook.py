@@ -0,0 +1,101 @@
+# Load test for the Twilio webhook (/sih/twilio-webhook) with offline fakes
+#
+# Posts Twilio-style form requests concurrently and reports how fast the
+# webhook acknowledges them, then polls /sih/health until the reply workers
+# have sent (or given up on) every message, for end-to-end reply throughput.
+# --unique controls how many distinct question texts are used, so the share
+# served from the response cache can be varied.
+#
+#   cd backend/modules && CHAT_BACKEND=fake REPLY_SENDER=fake FAKE_LLM_LATENCY_MS=800 \
+#       uvicorn main:app --port 8001
+#   python benchmarks/load_test_webhook.py --url http://localhost:8001 --requests 2000 --concurrency 50 --unique 200
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+
+
+async def post_messages(url, n_requests, concurrency, n_unique):
+    latencies = []
+    statuses = {}
+    counter = iter(range(n_requests))
+
+    async def worker(client):
+        for i in counter:
+            form = {
+                "From": f"whatsapp:+9100000{i % 10000:05d}",
+                "To": "whatsapp:+14155238886",
+                "Body": f"How do I treat leaf blight on crop {i % n_unique}?"
+            }
+            start = time.perf_counter()
+            response = await client.post(f"{url}/sih/twilio-webhook", data=form)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def wait_for_replies(url, baseline, expected, timeout):
+    async with httpx.AsyncClient(timeout=10) as client:
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            replies = (await client.get(f"{url}/sih/health")).json()["replies"]
+            if replies["sent"] + replies["failed"] - baseline >= expected:
+                return replies
+            await asyncio.sleep(0.05)
+        return replies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Twilio webhook load test")
+    parser.add_argument("--url", default="http://localhost:8001")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--unique", type=int, default=100, help="Distinct question texts")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=10) as client:
+        before = (await client.get(f"{args.url}/sih/health")).json()["replies"]
+    baseline = before["sent"] + before["failed"]
+
+    start = time.perf_counter()
+    latencies, statuses = await post_messages(args.url, args.requests, args.concurrency, args.unique)
+    ack_wall = time.perf_counter() - start
+    accepted = statuses.get(200, 0)
+    after = await wait_for_replies(args.url, baseline, accepted, args.timeout)
+    reply_wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "unique_questions": args.unique,
+        "statuses": statuses,
+        "ack_p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "ack_p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "ack_rps": round(args.requests / ack_wall, 1),
+        "replies_sent": after["sent"] - before["sent"],
+        "replies_failed": after["failed"] - before["failed"],
+        "reply_throughput_per_s": round((after["sent"] - before["sent"]) / reply_wall, 1),
+        "llm_calls": after["llm_calls"] - before["llm_calls"],
+        "cache_hit_rate": round(after["cache"]["hit_rate"], 3),
+        "avg_reply_ms": round(after["avg_reply_ms"], 1),
+    }
+    print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+# Load test for WebSocket group fan-out (/sih/ws/{group_name})
+#
+# For each group size, that many receivers join a fresh group (spread over
+# several client processes), then one sender publishes timestamped messages.
+# Reported per group size: delivery latency percentiles over every
+# (message, receiver) pair, the share of messages delivered, and how long the
+# last receiver waited. Optional slow clients join the group but never read,
+# to check that they do not hold back everyone else.
+#
+#   cd backend/modules && uvicorn main:app --port 8001
+#   python benchmarks/load_test_ws.py --url ws://localhost:8001/sih/ws --sizes 10 100 1000 4000 --slow 5
+#
+# Across several workers, members of one group land on different processes and
+# messages travel through the pub/sub broker:
+#
+#   cd backend/modules && python pubsub_broker.py &
+#   PUBSUB_BACKEND=unix uvicorn main:app --port 8001 --workers 4
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+
+import numpy as np
+import websockets
+
+
+async def receive_all(url, n_clients, n_messages, ready, timeout):
+    connections = []
+    for _ in range(n_clients):
+        connections.append(await websockets.connect(url, max_queue=None, open_timeout=60))
+    ready.put(n_clients)
+
+    async def receive(ws):
+        latencies = []
+        try:
+            while len(latencies) < n_messages:
+                raw = await ws.recv()
+                sent = json.loads(raw[raw.index("{"):])["sent"]
+                latencies.append(time.time() - sent)
+        except Exception:
+            pass
+        return latencies
+
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(receive(ws) for ws in connections)), timeout
+        )
+    except asyncio.TimeoutError:
+        results = []
+    for ws in connections:
+        await ws.close()
+    return [latency for latencies in results for latency in latencies]
+
+
+def client_process(url, n_clients, n_messages, ready, results, timeout):
+    results.put(asyncio.run(receive_all(url, n_clients, n_messages, ready, timeout)))
+
+
+async def hold_slow_clients(url, n_clients, duration):
+    # Connected but never reading: their server-side queues fill up
+    connections = [await websockets.connect(url, max_queue=1) for _ in range(n_clients)]
+    await asyncio.sleep(duration)
+    for ws in connections:
+        ws.transport.abort()
+
+
+async def send_messages(url, n_messages, interval):
+    async with websockets.connect(url) as ws:
+        for i in range(n_messages):
+            await ws.send(json.dumps({"seq": i, "sent": time.time()}))
+            await asyncio.sleep(interval)
+
+
+async def run_level(base_url, size, n_messages, interval, n_processes, n_slow, timeout):
+    url = f"{base_url}/bench-{size}-{uuid.uuid4().hex[:8]}"
+    ready, results = multiprocessing.Queue(), multiprocessing.Queue()
+
+    per_process = [size // n_processes + (1 if i < size % n_processes else 0) for i in range(n_processes)]
+    processes = [
+        multiprocessing.Process(target=client_process, args=(url, n, n_messages, ready, results, timeout))
+        for n in per_process if n
+    ]
+    for process in processes:
+        process.start()
+    loop = asyncio.get_running_loop()
+    for _ in processes:
+        await loop.run_in_executor(None, ready.get)
+
+    slow = asyncio.create_task(hold_slow_clients(url, n_slow, n_messages * interval + 5)) if n_slow else None
+    await asyncio.sleep(0.5)
+    start = time.time()
+    await send_messages(url, n_messages, interval)
+
+    latencies = []
+    for _ in processes:
+        latencies.extend(await loop.run_in_executor(None, results.get))
+    for process in processes:
+        process.join()
+    if slow is not None:
+        slow.cancel()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "group_size": size,
+        "slow_clients": n_slow,
+        "messages": n_messages,
+        "delivered_pct": round(100 * len(latencies) / (size * n_messages), 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2) if latencies else None,
+        "max_ms": round(float(latencies_ms.max()), 2) if latencies else None,
+        "wall_s": round(time.time() - start, 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test")
+    parser.add_argument("--url", default="ws://localhost:8001/sih/ws")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 4000])
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between sent messages")
+    parser.add_argument("--processes", type=int, default=max(1, multiprocessing.cpu_count() - 1))
+    parser.add_argument("--slow", type=int, default=0, help="Clients per group that never read")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = await run_level(args.url, size, args.messages, args.interval, args.processes, args.slow, args.timeout)
+        results.append(result)
+        print(json.dumps(result))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
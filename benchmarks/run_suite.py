@@ -0,0 +1,382 @@
+# Benchmark suite for all four services, fully offline
+#
+# For each service: micro-benchmarks of its hot functions, then an in-process
+# HTTP load test (httpx over ASGI, no sockets) of its main endpoints at
+# several concurrency levels, reporting p50/p95/p99 latency and throughput.
+# Models are synthetic (crop, price) or stubs (pest, disease), the Gemini and
+# Twilio clients are fakes and the weather API is stub_weather.py, so numbers
+# reflect the serving code rather than model weights. Each service runs in its
+# own subprocess, since three of them are modules named "app".
+#
+#   python benchmarks/run_suite.py --output results/$(git rev-parse --short HEAD).json
+#   python benchmarks/run_suite.py --services crop price --concurrency 1 16 --requests 500
+#   python benchmarks/run_suite.py --compare results/base.json results/head.json --threshold 0.1
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BENCHMARKS_DIR, ".."))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+# name -> (directory holding the service module, module name)
+SERVICES = {
+    "crop": (REPO_ROOT, "app"),
+    "price": (os.path.join(REPO_ROOT, "backend", "models", "market_price"), "app"),
+    "pest": (os.path.join(REPO_ROOT, "backend", "modules"), "main"),
+    "disease": (os.path.join(REPO_ROOT, "test"), "app"),
+}
+
+# Lower is better for these; higher is better for *_per_s
+LATENCY_METRICS = ("mean_ms", "p50_ms", "p95_ms", "p99_ms")
+THROUGHPUT_METRICS = ("ops_per_s", "rps")
+
+
+def summarize(latencies):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "count": len(latencies),
+        "mean_ms": round(float(latencies_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3),
+    }
+
+
+def micro(name, fn, inputs, min_time, min_calls=20, warmup=3):
+    """Call fn(*args) over inputs (cycled) for at least min_time seconds"""
+    for i in range(warmup):
+        fn(*inputs[i % len(inputs)])
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time or len(latencies) < min_calls:
+        args = inputs[len(latencies) % len(inputs)]
+        call_start = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - call_start)
+    wall = time.perf_counter() - start
+    result = {"kind": "micro", "name": name, **summarize(latencies),
+              "ops_per_s": round(len(latencies) / wall, 1)}
+    print(json.dumps(result), flush=True)
+    return result
+
+
+async def http_load(client, name, method, path, make_request, concurrency, n_requests, warmup=5):
+    """n_requests calls from `concurrency` concurrent workers; make_request(i) -> httpx kwargs"""
+    for i in range(warmup):
+        await client.request(method, path, **make_request(i))
+
+    latencies, statuses = [], {}
+    counter = iter(range(n_requests))
+
+    async def worker():
+        for i in counter:
+            request_start = time.perf_counter()
+            response = await client.request(method, path, **make_request(i))
+            latencies.append(time.perf_counter() - request_start)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    result = {"kind": "http", "name": name, "concurrency": concurrency, **summarize(latencies),
+              "rps": round(len(latencies) / wall, 1), "statuses": statuses}
+    print(json.dumps(result), flush=True)
+    return result
+
+
+def import_service(service):
+    directory, module_name = SERVICES[service]
+    sys.path.insert(0, directory)
+    os.chdir(directory)
+    import importlib
+    return importlib.import_module(module_name)
+
+
+# -------------------------------
+# Per-service setup and workloads
+# -------------------------------
+def crop_workload(workdir, args):
+    import fixtures
+    import stub_weather
+
+    # app reads the weather settings at import, and setup_crop imports it
+    weather_url, _ = stub_weather.serve_in_thread(latency_ms=args.weather_latency_ms)
+    os.environ["WEATHER_API_KEY"] = "stub"
+    os.environ["WEATHER_API_URL"] = weather_url
+    fixtures.setup_crop(workdir)
+    api = import_service("crop")
+
+    latitudes, longitudes = fixtures.random_locations(5000)
+    points = list(zip(latitudes, longitudes))
+    distributions = (api.convert_level_to_distribution("Medium"), api.convert_level_to_distribution("Low"),
+                     api.convert_level_to_distribution("High"), api.convert_level_to_distribution("Neutral", is_ph=True))
+
+    def micro_benchmarks():
+        return [
+            micro("crop.predict_soil_characteristics", api.predict_soil_characteristics, points, args.min_time),
+            micro("crop.predict_soil_characteristics_uncached", api.predict_soil_characteristics_uncached,
+                  points, args.min_time),
+            micro("crop.recommend_crops", lambda lat, lon: api.recommend_crops(lat, lon, *distributions),
+                  points, args.min_time),
+            micro("crop.recommend_crops_for_locations[100]", api.recommend_crops_for_locations,
+                  [(latitudes[i:i + 100], longitudes[i:i + 100]) for i in range(0, 5000, 100)], args.min_time),
+        ]
+
+    def one(i):
+        return {"json": {"lat": latitudes[i % 5000], "lon": longitudes[i % 5000]}}
+
+    def batch(i):
+        start = (i * 100) % 4900
+        return {"json": {"locations": [{"lat": lat, "lon": lon} for lat, lon in points[start:start + 100]]}}
+
+    endpoints = [("POST /recommend", "POST", "/recommend", one, 1),
+                 ("POST /recommend/batch[100]", "POST", "/recommend/batch", batch, 10)]
+    return api.app, api.models, micro_benchmarks, endpoints
+
+
+def price_workload(workdir, args):
+    import fixtures
+
+    keys = fixtures.setup_price(workdir, n_rows=args.price_rows)
+    api = import_service("price")
+    # Only keys with at least one forecastable market, so every request does real work
+    requests = [api.PriceRequest(state=s, district=d, commodity=c) for s, d, c in keys]
+    requests = [req for req in requests if api.predict_price(req).get("markets")]
+
+    forecasts = [api.ForecastRequest(state=req.state, district=req.district, commodity=req.commodity, horizon_days=14)
+                 for req in requests]
+
+    def micro_benchmarks():
+        return [micro("price.predict_price", api.predict_price, [(req,) for req in requests], args.min_time),
+                micro("price.forecast_price[14d]", api.forecast_price, [(req,) for req in forecasts], args.min_time)]
+
+    def one(i):
+        return {"json": requests[i % len(requests)].dict()}
+
+    def batch(i):
+        start = (i * 50) % max(1, len(requests) - 50)
+        return {"json": {"requests": [req.dict() for req in requests[start:start + 50]]}}
+
+    def forecast(i):
+        return {"json": forecasts[i % len(forecasts)].dict()}
+
+    endpoints = [("POST /predict", "POST", "/predict", one, 1),
+                 ("POST /predict/batch[50]", "POST", "/predict/batch", batch, 10),
+                 ("POST /forecast[14d]", "POST", "/forecast", forecast, 1)]
+    return api.app, api.models, micro_benchmarks, endpoints
+
+
+def pest_workload(workdir, args):
+    import fixtures
+
+    os.environ.setdefault("CHAT_BACKEND", "fake")
+    os.environ.setdefault("REPLY_SENDER", "fake")
+    os.environ.setdefault("FAKE_LLM_LATENCY_MS", "200")
+    os.environ.setdefault("FAKE_SEND_LATENCY_MS", "50")
+    api = import_service("pest")
+    api.models.register("pest", fixtures.StubDetector)
+
+    images = fixtures.synthetic_jpegs(args.images)
+    encoded = [base64.b64encode(image).decode() for image in images]
+
+    def detect_one(image_bytes):
+        return api.detect_pests([api.decode_image(image_bytes)[0]])
+
+    def micro_benchmarks():
+        api.models.get("pest")
+        return [
+            micro("pest.decode_image", api.decode_image, [(image,) for image in images], args.min_time),
+            micro("pest.detect_pests[1]", detect_one, [(image,) for image in images], args.min_time),
+        ]
+
+    def upload(i):
+        return {"content": images[i % len(images)], "headers": {"Content-Type": "image/jpeg"}}
+
+    def base64_body(i):
+        return {"json": {"image": encoded[i % len(encoded)]}}
+
+    def webhook(i):
+        return {"data": {"From": f"whatsapp:+91{i % 10000:010d}", "To": "whatsapp:+14155238886",
+                         "Body": f"How do I treat leaf blight on crop {i % 100}?"}}
+
+    endpoints = [("POST /sih/predict/upload", "POST", "/sih/predict/upload", upload, 1),
+                 ("POST /sih/predict", "POST", "/sih/predict", base64_body, 1),
+                 ("POST /sih/twilio-webhook", "POST", "/sih/twilio-webhook", webhook, 1)]
+    return api.app, api.models, micro_benchmarks, endpoints
+
+
+def disease_workload(workdir, args):
+    import fixtures
+
+    api = import_service("disease")
+    import main1
+    main1.models.register("disease", lambda: fixtures.StubClassifier(n_classes=len(main1.CLASS_NAMES)))
+
+    images = fixtures.synthetic_jpegs(args.images)
+    encoded = [base64.b64encode(image).decode() for image in images]
+
+    def micro_benchmarks():
+        main1.models.get("disease")
+        return [
+            micro("disease.preprocess_image", main1.preprocess_image, [(image,) for image in images], args.min_time),
+            micro("disease.predict_disease", main1.predict_disease, [(image,) for image in images], args.min_time),
+        ]
+
+    def upload(i):
+        return {"content": images[i % len(images)], "headers": {"Content-Type": "image/jpeg"}}
+
+    def base64_body(i):
+        return {"json": {"image_base64": encoded[i % len(encoded)]}}
+
+    endpoints = [("POST /sih/disease", "POST", "/sih/disease", upload, 1),
+                 ("POST /sih/disease_base64", "POST", "/sih/disease_base64", base64_body, 1)]
+    return api.app, main1.models, micro_benchmarks, endpoints
+
+
+WORKLOADS = {"crop": crop_workload, "price": price_workload, "pest": pest_workload, "disease": disease_workload}
+
+
+async def run_service(service, args):
+    import httpx
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app, models, micro_benchmarks, endpoints = WORKLOADS[service](workdir, args)
+        results = []
+        async with app.router.lifespan_context(app):
+            await models.wait(timeout=None)
+            if not args.skip_micro:
+                results.extend(await asyncio.to_thread(micro_benchmarks))
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+                for name, method, path, make_request, cost in endpoints:
+                    for concurrency in args.concurrency:
+                        # Heavier requests (batches) get fewer repetitions
+                        n_requests = max(concurrency * 2, args.requests // cost)
+                        results.append(await http_load(client, name, method, path, make_request, concurrency, n_requests))
+
+    for result in results:
+        result["service"] = service
+    return results
+
+
+# -------------------------------
+# Orchestration and comparison
+# -------------------------------
+def run_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_all(args):
+    results = []
+    for service in args.services:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+            child_output = f.name
+        command = [sys.executable, os.path.abspath(__file__), "--child", service, "--child-output", child_output,
+                   "--concurrency", *map(str, args.concurrency), "--requests", str(args.requests),
+                   "--min-time", str(args.min_time), "--images", str(args.images),
+                   "--price-rows", str(args.price_rows), "--weather-latency-ms", str(args.weather_latency_ms)]
+        if args.skip_micro:
+            command.append("--skip-micro")
+        print(f"# {service}", flush=True)
+        completed = subprocess.run(command, env=dict(os.environ, PYTHONWARNINGS="ignore"))
+        if completed.returncode != 0:
+            print(f"# {service} failed with exit code {completed.returncode}", flush=True)
+        elif os.path.getsize(child_output):
+            with open(child_output) as f:
+                results.extend(json.load(f))
+        os.remove(child_output)
+    return {"meta": run_metadata(), "results": results}
+
+
+def result_key(result):
+    return (result["service"], result["kind"], result["name"], result.get("concurrency"))
+
+
+def compare(base_path, head_path, threshold):
+    """Print the change of every metric; returns the number of regressions beyond threshold"""
+    with open(base_path) as f:
+        base = {result_key(result): result for result in json.load(f)["results"]}
+    with open(head_path) as f:
+        head = json.load(f)["results"]
+
+    regressions = 0
+    for result in head:
+        before = base.get(result_key(result))
+        if before is None:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            if metric not in result or not before.get(metric):
+                continue
+            change = result[metric] / before[metric] - 1
+            worse = change > threshold if metric in LATENCY_METRICS else change < -threshold
+            regressions += worse
+            row = {"service": result["service"], "name": result["name"], "concurrency": result.get("concurrency"),
+                   "metric": metric, "base": before[metric], "head": result[metric],
+                   "change_pct": round(change * 100, 1), "regression": worse}
+            print(json.dumps(row))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for the crop, price, pest and disease services")
+    parser.add_argument("--services", nargs="+", choices=sorted(SERVICES), default=list(SERVICES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=300, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds per micro-benchmark")
+    parser.add_argument("--images", type=int, default=32, help="Distinct synthetic images")
+    parser.add_argument("--price-rows", type=int, default=200_000)
+    parser.add_argument("--weather-latency-ms", type=float, default=50.0)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="Compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change counted as a regression")
+    parser.add_argument("--child", choices=sorted(SERVICES), help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        print(f"# {regressions} regression(s) beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+
+    if args.child:
+        # Repeated requests would otherwise be answered from the result caches
+        os.environ.setdefault("RESULT_CACHE_SIZE", "0")
+        os.environ.setdefault("FORECAST_CACHE_SIZE", "0")
+        results = asyncio.run(run_service(args.child, args))
+        with open(args.child_output, "w") as f:
+            json.dump(results, f)
+        return
+
+    report = run_all(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Stand-in for api.weatherapi.com's /v1/current.json, for offline benchmarks
+#
+# Answers after a configurable latency (plus optional jitter and error rate)
+# so /recommend's weather stage can be load-tested without the real API:
+#
+#   python benchmarks/stub_weather.py --port 8090 --latency-ms 80
+#   WEATHER_API_KEY=stub WEATHER_API_URL=http://127.0.0.1:8090 uvicorn app:app
+#
+# run_suite.py starts it on a background thread with serve_in_thread().
+
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+def create_app(latency_ms=50.0, jitter_ms=0.0, error_rate=0.0):
+    app = FastAPI(title="Stub weather API")
+    app.state.requests = 0
+
+    @app.get("/v1/current.json")
+    async def current(q: str, key: str = ""):
+        app.state.requests += 1
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+        if random.random() < error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "stub failure"}})
+        latitude, longitude = (float(value) for value in q.split(","))
+        return {
+            "location": {"lat": latitude, "lon": longitude},
+            "current": {
+                "temp_c": round(20 + (latitude % 15), 1),
+                "humidity": int(40 + (longitude % 50)),
+                "condition": {"text": "Partly cloudy"},
+                "wind_kph": 11.2,
+                "precip_mm": 0.4
+            }
+        }
+
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(latency_ms=50.0, jitter_ms=0.0, error_rate=0.0, port=None):
+    """Start the stub on a daemon thread; returns (base_url, server)"""
+    port = port or free_port()
+    config = uvicorn.Config(create_app(latency_ms, jitter_ms, error_rate), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, name="stub-weather", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub weather API")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.jitter_ms, args.error_rate), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Fused probability matrix for the MultiOutput crop recommender
+
+import numpy as np
+
+
+def multioutput_probability_matrix(model, X):
+    """
+    Reference implementation: run model.predict_proba (one classifier per
+    crop) and collect the class-1 probability of every output into an
+    (N, n_crops) matrix. Outputs whose classifier only saw a single class get
+    -inf so they are never recommended.
+    """
+    crop_probabilities = model.predict_proba(X)
+
+    prob_matrix = np.full((X.shape[0], len(crop_probabilities)), -np.inf)
+    for i, proba in enumerate(crop_probabilities):
+        # Make sure we have probabilities for both classes
+        if proba.shape[1] > 1:
+            prob_matrix[:, i] = proba[:, 1]
+    return prob_matrix
+
+
+# Upper bound on (rows x trees) node indices held in memory at once
+FOREST_CHUNK_ELEMENTS = 4_000_000
+
+
+class FusedCropModel:
+    """
+    Load-time restructuring of a fitted MultiOutputClassifier.
+
+    Degenerate single-class outputs are found once, at construction. When
+    every usable output is a forest of sklearn decision trees with the same
+    number of trees, all trees of all outputs are flattened into one set of
+    node arrays and evaluated together, level by level, for the whole batch.
+    Otherwise the usable estimators are called directly (skipping the
+    degenerate ones and the per-output list building).
+
+    predict_proba_matrix(X) returns the same (N, n_crops) matrix as
+    multioutput_probability_matrix(model, X).
+    """
+
+    def __init__(self, model):
+        estimators = list(model.estimators_)
+        self.n_outputs = len(estimators)
+
+        # Outputs whose classifier saw both classes (crop absent / present)
+        self.valid_outputs = np.array(
+            [i for i, est in enumerate(estimators) if len(est.classes_) > 1],
+            dtype=np.intp
+        )
+        self._valid_estimators = [estimators[i] for i in self.valid_outputs]
+
+        self.mode = "estimators"
+        if self._valid_estimators and self._can_fuse_forests(self._valid_estimators):
+            self._build_forest_arrays(self._valid_estimators)
+            self.mode = "fused_forest"
+
+    # -------------------------------
+    # Forest fusion
+    # -------------------------------
+    @staticmethod
+    def _can_fuse_forests(estimators):
+        n_trees = None
+        for est in estimators:
+            trees = getattr(est, "estimators_", None)
+            if not isinstance(trees, list) or not trees:
+                return False
+            if not all(hasattr(tree, "tree_") for tree in trees):
+                return False
+            # Plain averaging of per-tree probabilities only (RandomForest / ExtraTrees)
+            if type(est).__name__ not in ("RandomForestClassifier", "ExtraTreesClassifier"):
+                return False
+            if n_trees is None:
+                n_trees = len(trees)
+            elif len(trees) != n_trees:
+                return False
+        return True
+
+    def _build_forest_arrays(self, estimators):
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        # Trees are laid out output-major: output 0 trees, then output 1 trees, ...
+        for est in estimators:
+            for tree in est.estimators_:
+                t = tree.tree_
+                value = t.value[:, 0, :]
+
+                # DecisionTreeClassifier.predict_proba normalizes each leaf's value
+                normalizer = value.sum(axis=1)
+                normalizer[normalizer == 0.0] = 1.0
+
+                roots.append(offset)
+                features.append(t.feature)
+                thresholds.append(t.threshold)
+                # Leaves point to themselves so finished rows stay in place
+                node_ids = np.arange(t.node_count)
+                is_leaf = t.children_left == -1
+                lefts.append(np.where(is_leaf, node_ids, t.children_left) + offset)
+                rights.append(np.where(is_leaf, node_ids, t.children_right) + offset)
+                leaf_values.append(value[:, 1] / normalizer)
+                offset += t.node_count
+                max_depth = max(max_depth, t.max_depth)
+
+        self.n_trees = len(estimators[0].estimators_)
+        self.max_depth = max_depth
+        self.roots = np.array(roots, dtype=np.intp)
+        self.feature = np.maximum(np.concatenate(features), 0).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.leaf_value = np.concatenate(leaf_values)
+
+    def _forest_matrix(self, X):
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+
+        # Bound the (rows x trees) working set for large batches
+        chunk = max(1, FOREST_CHUNK_ELEMENTS // max(self.roots.size, 1))
+        if X.shape[0] > chunk:
+            return np.vstack([self._forest_matrix(X[i:i + chunk]) for i in range(0, X.shape[0], chunk)])
+
+        n = X.shape[0]
+        rows = np.arange(n)[:, None]
+
+        # Walk every tree for every row at once, one level per iteration
+        nodes = np.broadcast_to(self.roots, (n, self.roots.size)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # (N, n_valid_outputs, n_trees) per-tree probabilities
+        tree_proba = self.leaf_value[nodes].reshape(n, self.valid_outputs.size, self.n_trees)
+
+        # Accumulate trees in order, as the forest does, so results match exactly
+        proba = np.zeros((n, self.valid_outputs.size))
+        for t in range(self.n_trees):
+            proba += tree_proba[:, :, t]
+        proba /= self.n_trees
+        return proba
+
+    # -------------------------------
+    # Prediction
+    # -------------------------------
+    def predict_proba_matrix(self, X):
+        """(N, n_crops) class-1 probabilities, -inf for degenerate outputs"""
+        X = np.asarray(X, dtype=float)
+        prob_matrix = np.full((X.shape[0], self.n_outputs), -np.inf)
+        if self.valid_outputs.size == 0:
+            return prob_matrix
+
+        if self.mode == "fused_forest":
+            prob_matrix[:, self.valid_outputs] = self._forest_matrix(X)
+        else:
+            for column, est in zip(self.valid_outputs, self._valid_estimators):
+                prob_matrix[:, column] = est.predict_proba(X)[:, 1]
+        return prob_matrix
+
+    def matches(self, model, X, top_n=5):
+        """
+        Regression check against the MultiOutputClassifier on probe rows X:
+        the top_n ranking of every row must be identical and the
+        probabilities equal to floating point tolerance
+        """
+        expected = multioutput_probability_matrix(model, X)
+        actual = self.predict_proba_matrix(X)
+        if not np.allclose(actual, expected, rtol=0.0, atol=1e-12):
+            return False
+        expected_rank = np.argsort(-expected, axis=1, kind="stable")[:, :top_n]
+        actual_rank = np.argsort(-actual, axis=1, kind="stable")[:, :top_n]
+        return bool(np.array_equal(expected_rank, actual_rank))
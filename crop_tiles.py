@@ -0,0 +1,281 @@
+# Precomputed soil/crop raster tiles for the crop recommendation API
+#
+# Build tiles offline:
+#   python crop_tiles.py build --bbox 8.0 68.0 37.0 97.5 --resolution 0.01 --output tiles/india
+#
+# Serve them by pointing the API at the tile prefix:
+#   CROP_TILES=tiles/india CROP_TILES_MODE=nearest uvicorn app:app
+
+import argparse
+import json
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+TILE_FORMAT_VERSION = 1
+
+# Each array in the .bin file starts on a page boundary
+PAGE_SIZE = 4096
+
+# Probabilities are stored as uint8 in steps of 1/255
+PROB_SCALE = 255.0
+
+
+def _aligned(offset):
+    return (offset + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+
+class CropTileStore:
+    """
+    Read-only, memory-mapped raster of precomputed pipeline outputs.
+
+    Cell (i, j) holds the answer for the point
+    (min_lat + (i + 0.5) * resolution, min_lon + (j + 0.5) * resolution):
+      - soil:      uint8  (H, W, n_levels)  encoded soil level per soil model
+      - crop_idx:  uint16 (H, W, top_k)     indices into crop_classes
+      - crop_prob: uint8  (H, W, top_k)     probabilities quantized to 1/255
+
+    The arrays are np.memmap views of one file, so every worker process
+    reading the same tiles shares a single copy in the page cache.
+    """
+
+    def __init__(self, prefix, mode="nearest"):
+        if mode not in ("nearest", "bilinear"):
+            raise ValueError(f"Unknown tile lookup mode: {mode}")
+        self.mode = mode
+
+        with open(f"{prefix}.json") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") != TILE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported tile format version: {self.meta.get('format_version')}")
+
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = self.meta["bbox"]
+        self.resolution = self.meta["resolution"]
+        self.height, self.width = self.meta["shape"]
+        self.top_k = self.meta["top_k"]
+        self.soil_levels = self.meta["soil_levels"]
+        self.soil_classes = [np.array(self.meta["soil_classes"][level]) for level in self.soil_levels]
+        self.crop_classes = np.array(self.meta["crop_classes"])
+
+        arrays = {}
+        for name, spec in self.meta["arrays"].items():
+            arrays[name] = np.memmap(
+                f"{prefix}.bin", mode="r", dtype=spec["dtype"],
+                offset=spec["offset"], shape=tuple(spec["shape"])
+            )
+        self.soil = arrays["soil"]
+        self.crop_idx = arrays["crop_idx"]
+        self.crop_prob = arrays["crop_prob"]
+
+    def covers(self, latitude, longitude):
+        return (self.min_lat <= latitude < self.max_lat) and (self.min_lon <= longitude < self.max_lon)
+
+    def info(self):
+        return {
+            "bbox": [self.min_lat, self.min_lon, self.max_lat, self.max_lon],
+            "resolution": self.resolution,
+            "shape": [self.height, self.width],
+            "top_k": self.top_k,
+            "mode": self.mode
+        }
+
+    def lookup(self, latitude, longitude, top_n=5):
+        """
+        Returns (soil_characteristics, [(crop, probability), ...]) for a point
+        inside the covered area, or None if the point is outside it or top_n
+        is more crops than the tiles store (the caller runs the models then)
+        """
+        if top_n > self.top_k or not self.covers(latitude, longitude):
+            return None
+        if self.mode == "bilinear":
+            return self._lookup_bilinear(latitude, longitude, top_n)
+        return self._lookup_nearest(latitude, longitude, top_n)
+
+    def _cell(self, latitude, longitude):
+        i = min(int((latitude - self.min_lat) / self.resolution), self.height - 1)
+        j = min(int((longitude - self.min_lon) / self.resolution), self.width - 1)
+        return i, j
+
+    def _soil_names(self, codes):
+        return {
+            level: str(self.soil_classes[n][code])
+            for n, (level, code) in enumerate(zip(self.soil_levels, codes))
+        }
+
+    def _lookup_nearest(self, latitude, longitude, top_n):
+        i, j = self._cell(latitude, longitude)
+        crops = self.crop_classes[self.crop_idx[i, j, :top_n]]
+        probs = self.crop_prob[i, j, :top_n] / PROB_SCALE
+        return self._soil_names(self.soil[i, j]), list(zip(crops.tolist(), probs.tolist()))
+
+    def _lookup_bilinear(self, latitude, longitude, top_n):
+        # Continuous position relative to cell centres
+        y = (latitude - self.min_lat) / self.resolution - 0.5
+        x = (longitude - self.min_lon) / self.resolution - 0.5
+        i0, j0 = math.floor(y), math.floor(x)
+        dy, dx = y - i0, x - j0
+
+        neighbours = []
+        for di, wy in ((0, 1.0 - dy), (1, dy)):
+            for dj, wx in ((0, 1.0 - dx), (1, dx)):
+                weight = wy * wx
+                if weight <= 0.0:
+                    continue
+                i = min(max(i0 + di, 0), self.height - 1)
+                j = min(max(j0 + dj, 0), self.width - 1)
+                neighbours.append((i, j, weight))
+
+        # Soil classes are categorical: take the weighted majority per level
+        soil_codes = []
+        for n in range(len(self.soil_levels)):
+            votes = {}
+            for i, j, weight in neighbours:
+                code = int(self.soil[i, j, n])
+                votes[code] = votes.get(code, 0.0) + weight
+            soil_codes.append(max(votes, key=votes.get))
+
+        # Crop probabilities blend across the neighbours' stored top-k lists
+        scores = {}
+        for i, j, weight in neighbours:
+            for idx, prob in zip(self.crop_idx[i, j].tolist(), self.crop_prob[i, j].tolist()):
+                scores[idx] = scores.get(idx, 0.0) + weight * prob / PROB_SCALE
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_n]
+        crops = [(str(self.crop_classes[idx]), prob) for idx, prob in ranked]
+        return self._soil_names(soil_codes), crops
+
+
+# Load tiles configured through the environment, or None
+def load_tiles_from_env():
+    prefix = os.getenv("CROP_TILES")
+    if not prefix:
+        return None
+    return CropTileStore(prefix, mode=os.getenv("CROP_TILES_MODE", "nearest"))
+
+
+# -------------------------------
+# Offline build
+# -------------------------------
+def build_tiles(api, bbox, resolution, output, top_k=5, chunk_rows=64):
+    """
+    Evaluate the full soil -> crop pipeline of the loaded API module over
+    every cell centre of bbox and write <output>.json and <output>.bin
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox
+    height = int(math.ceil(round((max_lat - min_lat) / resolution, 9)))
+    width = int(math.ceil(round((max_lon - min_lon) / resolution, 9)))
+    if height <= 0 or width <= 0:
+        raise ValueError("Empty bounding box")
+
+    soil_levels = list(api.soil_encoders.keys())
+    soil_classes = {level: [str(c) for c in api.soil_encoders[level].classes_] for level in soil_levels}
+    crop_classes = [str(c) for c in api.mlb.classes_]
+    if max(len(c) for c in soil_classes.values()) > 256:
+        raise ValueError("Soil levels with more than 256 classes do not fit in uint8 tiles")
+    if len(crop_classes) > 65536:
+        raise ValueError("More than 65536 crop classes do not fit in uint16 tiles")
+
+    # Lay the three arrays out back to back, each page aligned
+    specs = {}
+    offset = 0
+    for name, dtype, depth in (("soil", "uint8", len(soil_levels)),
+                               ("crop_idx", "uint16", top_k),
+                               ("crop_prob", "uint8", top_k)):
+        offset = _aligned(offset)
+        shape = [height, width, depth]
+        specs[name] = {"dtype": dtype, "offset": offset, "shape": shape}
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    bin_path = f"{output}.bin"
+    with open(bin_path, "wb") as f:
+        f.truncate(offset)
+
+    arrays = {
+        name: np.memmap(bin_path, mode="r+", dtype=spec["dtype"],
+                        offset=spec["offset"], shape=tuple(spec["shape"]))
+        for name, spec in specs.items()
+    }
+
+    lons = min_lon + (np.arange(width) + 0.5) * resolution
+    stored_k = top_k
+    start = time.time()
+    for row_start in range(0, height, chunk_rows):
+        row_stop = min(row_start + chunk_rows, height)
+        lats = min_lat + (np.arange(row_start, row_stop) + 0.5) * resolution
+        grid_lat, grid_lon = np.meshgrid(lats, lons, indexing="ij")
+        flat_lat, flat_lon = grid_lat.ravel(), grid_lon.ravel()
+        n = flat_lat.size
+
+        # Soil models, bypassing the runtime soil cache
+        soil_codes = api.predict_soil_codes_batch(flat_lat, flat_lon)
+        soil_names = {
+            level: api.soil_encoders[level].inverse_transform(codes)
+            for level, codes in soil_codes.items()
+        }
+        top_idx, top_prob = api.recommend_crop_indices_batch(
+            flat_lat, flat_lon,
+            **api.soil_level_distributions(soil_names, n),
+            top_n=top_k
+        )
+
+        rows = row_stop - row_start
+        arrays["soil"][row_start:row_stop] = np.stack(
+            [soil_codes[level] for level in soil_levels], axis=-1
+        ).reshape(rows, width, -1)
+
+        # Fewer than top_k crops have a usable classifier: store only those
+        k = top_idx.shape[1]
+        stored_k = min(stored_k, k)
+        arrays["crop_idx"][row_start:row_stop, :, :k] = top_idx.reshape(rows, width, k)
+        arrays["crop_prob"][row_start:row_stop, :, :k] = np.rint(
+            np.clip(top_prob, 0.0, 1.0) * PROB_SCALE
+        ).reshape(rows, width, k)
+
+        print(f"Rows {row_stop}/{height} done ({time.time() - start:.1f}s)")
+
+    for array in arrays.values():
+        array.flush()
+
+    meta = {
+        "format_version": TILE_FORMAT_VERSION,
+        "created_date": datetime.now().isoformat(),
+        "bbox": [min_lat, min_lon, min_lat + height * resolution, min_lon + width * resolution],
+        "resolution": resolution,
+        "shape": [height, width],
+        "top_k": stored_k,
+        "soil_levels": soil_levels,
+        "soil_classes": soil_classes,
+        "crop_classes": crop_classes,
+        "arrays": specs
+    }
+    with open(f"{output}.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Wrote {height}x{width} tiles to {output}.bin / {output}.json")
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precomputed soil/crop tiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Evaluate the pipeline over a bounding-box grid")
+    build.add_argument("--bbox", nargs=4, type=float, required=True,
+                       metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    build.add_argument("--resolution", type=float, default=0.01, help="Cell size in degrees")
+    build.add_argument("--top-k", type=int, default=5, help="Crops stored per cell")
+    build.add_argument("--chunk-rows", type=int, default=64, help="Grid rows evaluated per model call")
+    build.add_argument("--output", required=True, help="Output prefix (writes .json and .bin)")
+
+    args = parser.parse_args()
+
+    import app as api
+    api.models.get("crop_service")
+    build_tiles(api, args.bbox, args.resolution, args.output,
+                top_k=args.top_k, chunk_rows=args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Process-pool inference workers sharing the crop models copy-on-write
+#
+# In process serving mode a single uvicorn process loads the models once and
+# forks CROP_PROCESS_WORKERS inference workers, which inherit the loaded
+# models without unpickling them again:
+#   CROP_SERVING_MODE=process CROP_PROCESS_WORKERS=8 uvicorn app:app --workers 1
+
+import gc
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+
+# Set by start_worker_pool before forking, so every worker inherits it
+_each_worker_barrier = None
+
+
+def load_model_file(path, mmap=False):
+    """
+    joblib.load a pickle. With mmap=True (process serving mode) the numpy
+    arrays it contains are memory-mapped when the file was written
+    uncompressed (joblib ignores mmap_mode otherwise); memory-mapped arrays
+    are backed by the page cache, so every process reading them shares one
+    physical copy.
+    """
+    return joblib.load(path, mmap_mode="r" if mmap else None)
+
+
+def _worker_pid(_):
+    return os.getpid()
+
+
+def start_worker_pool(n_workers):
+    """
+    Fork n_workers inference processes from the current (model-loaded)
+    process. Must be called after the models are loaded, while no other
+    thread is busy: fork copies only the calling thread, so a lock another
+    thread holds at that moment (logging, imports) stays locked in every
+    worker.
+    """
+    # Move everything allocated so far out of the collector's generations, so
+    # collections in the workers do not touch (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+    global _each_worker_barrier
+    context = multiprocessing.get_context("fork")
+    _each_worker_barrier = context.Barrier(n_workers)
+    pool = ProcessPoolExecutor(max_workers=n_workers, mp_context=context)
+    # With fork every worker starts on the first submit, from whichever thread
+    # submits; fork them all now, from the caller, before requests arrive
+    list(pool.map(_worker_pid, range(n_workers)))
+    return pool
+
+
+def _call_then_wait(fn, timeout):
+    result = fn()
+    _each_worker_barrier.wait(timeout)
+    return result
+
+
+def run_on_each_worker(pool, fn, timeout=30):
+    """
+    Call fn() once in every worker of a pool started by start_worker_pool and
+    return the results. A worker that has made its call waits at a barrier
+    until all of them have, so no worker takes two of the calls. Blocks;
+    raises threading.BrokenBarrierError if a worker stays busy for timeout
+    seconds.
+    """
+    futures = [pool.submit(_call_then_wait, fn, timeout) for _ in worker_pids(pool)]
+    return [future.result() for future in futures]
+
+
+def worker_pids(pool):
+    """PIDs of the worker processes of a pool started by start_worker_pool"""
+    return sorted(pool._processes.keys())
+
+
+def process_memory(pid):
+    """
+    Resident (RSS) and proportional (PSS, shared pages split between the
+    processes sharing them) memory of a process in MB, from /proc (Linux)
+    """
+    memory = {"rss_mb": None, "pss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    memory["rss_mb"] = int(line.split()[1]) / 1024
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["pss_mb"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return memory
+
+
+def split_batch(n, n_chunks, min_chunk=256):
+    """
+    Split range(n) into at most n_chunks contiguous (start, stop) slices of
+    at least min_chunk rows each (the last one may be shorter)
+    """
+    if n == 0:
+        return []
+    n_chunks = max(1, min(n_chunks, -(-n // min_chunk)))
+    size = -(-n // n_chunks)
+    return [(start, min(start + size, n)) for start in range(0, n, size)]
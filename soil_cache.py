@@ -0,0 +1,206 @@
+# Spatial cache for soil predictions used by the crop recommendation API
+
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+class SpatialSoilCache:
+    """
+    LRU cache of soil predictions keyed on a quantized lat/lon grid cell.
+
+    Every location is snapped to the centre of its cell before the soil models
+    run, so a cached answer is exactly what the models return for that centre.
+    """
+
+    def __init__(self, resolution=0.01, max_size=100000, snapshot_path=None, signature=None):
+        self.resolution = float(resolution)
+        self.max_size = int(max_size)
+        self.snapshot_path = snapshot_path
+        # Identifies the models the cached answers came from (e.g. file versions)
+        self.signature = signature
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # -------------------------------
+    # Grid quantization
+    # -------------------------------
+    def cell(self, latitude, longitude):
+        """Grid cell (row, col) containing a location"""
+        # Rounding first keeps values like 0.29 / 0.01 = 28.999... in the right cell
+        return (
+            math.floor(round(latitude / self.resolution, 9)),
+            math.floor(round(longitude / self.resolution, 9))
+        )
+
+    def cells(self, latitudes, longitudes):
+        """Vectorized cell(): returns (rows, cols) integer arrays"""
+        rows = np.floor(np.round(np.asarray(latitudes, dtype=float) / self.resolution, 9)).astype(np.int64)
+        cols = np.floor(np.round(np.asarray(longitudes, dtype=float) / self.resolution, 9)).astype(np.int64)
+        return rows, cols
+
+    def cell_centre(self, cell):
+        """Latitude and longitude of the centre of a cell"""
+        return (
+            (cell[0] + 0.5) * self.resolution,
+            (cell[1] + 0.5) * self.resolution
+        )
+
+    # -------------------------------
+    # LRU storage
+    # -------------------------------
+    def _get(self, cell):
+        # Caller holds the lock
+        value = self._entries.get(cell)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(cell)
+        self.hits += 1
+        return value
+
+    def _put(self, cell, value):
+        # Caller holds the lock
+        self._entries[cell] = value
+        self._entries.move_to_end(cell)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_predict(self, latitude, longitude, predict_fn):
+        """
+        Soil prediction for one location. predict_fn(lat, lon) is called with
+        the cell centre on a miss and must return a dict of level names.
+        """
+        cell = self.cell(latitude, longitude)
+        with self._lock:
+            value = self._get(cell)
+        if value is not None:
+            return dict(value)
+
+        value = predict_fn(*self.cell_centre(cell))
+        with self._lock:
+            self._put(cell, dict(value))
+        return value
+
+    def get_or_predict_batch(self, latitudes, longitudes, predict_batch_fn):
+        """
+        Soil predictions for N locations. Misses are deduplicated by cell and
+        predicted in one predict_batch_fn(lats, lons) call at the cell centres,
+        which must return a dict mapping each level to an array of names.
+        Returns a dict mapping each level to an array of N names.
+        """
+        rows, cols = self.cells(latitudes, longitudes)
+        cells = list(zip(rows.tolist(), cols.tolist()))
+
+        values = [None] * len(cells)
+        missing = OrderedDict()
+        with self._lock:
+            for i, cell in enumerate(cells):
+                value = self._get(cell)
+                if value is None:
+                    missing.setdefault(cell, []).append(i)
+                else:
+                    values[i] = value
+
+        if missing:
+            centres = [self.cell_centre(cell) for cell in missing]
+            predicted = predict_batch_fn(
+                [centre[0] for centre in centres],
+                [centre[1] for centre in centres]
+            )
+            predicted_columns = {level: list(names) for level, names in predicted.items()}
+            with self._lock:
+                for j, (cell, positions) in enumerate(missing.items()):
+                    value = {level: names[j] for level, names in predicted_columns.items()}
+                    self._put(cell, value)
+                    for i in positions:
+                        values[i] = value
+
+        levels = values[0].keys() if values else []
+        return {level: np.array([value[level] for value in values]) for level in levels}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters exposed on /health"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "resolution": self.resolution,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    # -------------------------------
+    # On-disk snapshot
+    # -------------------------------
+    def save_snapshot(self, path=None):
+        """Write the cache (in LRU order) to disk so a restarted worker starts warm"""
+        path = path or self.snapshot_path
+        if not path:
+            return False
+
+        snapshot = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "resolution": self.resolution,
+            "signature": self.signature,
+            "entries": self.export()
+        }
+
+        # Write to a temporary file first so a crash never leaves a torn snapshot
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
+        return True
+
+    def load_snapshot(self, path=None):
+        """
+        Load a snapshot written by save_snapshot. Snapshots taken with another
+        format, cell resolution or model signature are ignored: their cells or
+        answers would not match this cache's. Returns the number of entries loaded.
+        """
+        path = path or self.snapshot_path
+        if not path or not os.path.exists(path):
+            return 0
+
+        with open(path) as f:
+            snapshot = json.load(f)
+        if (snapshot.get("format_version"), snapshot.get("resolution"), snapshot.get("signature")) != (
+                SNAPSHOT_FORMAT_VERSION, self.resolution, self.signature):
+            return 0
+
+        return self.merge(snapshot.get("entries", []))
+
+    def export(self):
+        """The cached cells as [row, col, value] in LRU order (oldest first)"""
+        with self._lock:
+            return [[cell[0], cell[1], value] for cell, value in self._entries.items()]
+
+    def merge(self, entries):
+        """
+        Add cells exported by export() (from a snapshot or another process's
+        cache) as the most recently used ones. Returns the number of entries
+        cached afterwards.
+        """
+        with self._lock:
+            for row, col, value in entries:
+                self._put((row, col), value)
+            return len(self._entries)
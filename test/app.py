@@ -1,8 +1,19 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Dict
+from fastapi.responses import JSONResponse
 import base64
-from main1 import predict_disease
+import os
+import sys
+from main1 import predict_disease, predict_disease_image, disease_cache, models, TARGET_SIZE
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules"))
+from image_upload import read_image_upload, decode_upload
+from model_registry import ModelNotReadyError
+from instrumentation import configure_logging, instrument_app, stage, metrics, TimedJSONResponse
+
+log = configure_logging("disease")
 
 class ImagePayload(BaseModel):
     image_base64: str
@@ -10,25 +21,83 @@ class ImagePayload(BaseModel):
 app = FastAPI(
     title="Plant Disease Detection API (Base64)",
     description="Send a Base64 encoded image of a plant leaf to predict its disease.",
-    version="1.1.0"
+    version="1.1.0",
+    default_response_class=TimedJSONResponse
 )
+instrument_app(app, "disease", registry=models)
+metrics.gauge("result_cache_hit_ratio", "Share of predictions served from the result cache",
+              lambda: disease_cache.stats()["hit_rate"])
+
+# Load the model in the background so the server starts accepting requests right away
+@app.on_event("startup")
+def start_model_loading():
+    models.start()
+
+async def wait_for_model():
+    try:
+        await models.wait("disease")
+    except ModelNotReadyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.post("/sih/disease_base64", response_model=Dict[str, str])
 async def detect_disease_from_base64(payload: ImagePayload):
 
+    await wait_for_model()
     image_bytes = base64.b64decode(payload.image_base64)
-    disease, confidence = predict_disease(image_bytes)
-    print(disease)
+    disease, confidence = await run_in_threadpool(predict_disease, image_bytes)
+    log.info("Disease predicted", extra={"disease": disease, "confidence": round(confidence, 3)})
     return {
         "predicted_disease": disease,
         "confidence": f"{confidence:.2f}"
     }
 
 
+# DISEASE_DRAFT_DECODE=1 decodes JPEG uploads at a reduced scale close to the model's
+# 128x128 input: faster for large photos, but not identical to a full decode
+DISEASE_DRAFT_DECODE = os.getenv("DISEASE_DRAFT_DECODE", "0") == "1"
+
+def decode_disease_upload(upload):
+    with stage("decode"):
+        return decode_upload(upload, TARGET_SIZE if DISEASE_DRAFT_DECODE else None)[0]
+
+def predict_disease_upload(upload):
+    # The decode path is part of the key: a draft-decoded result is not the exact one
+    key = disease_cache.key(upload) + ("draft" if DISEASE_DRAFT_DECODE else "exact",)
+    return disease_cache.get_or_compute(
+        key, lambda: predict_disease_image(decode_disease_upload(upload))
+    )
+
+@app.post("/sih/disease", response_model=Dict[str, str])
+async def detect_disease_from_upload(request: Request):
+    # Raw image/* body or multipart file, no base64
+    await wait_for_model()
+    upload = await read_image_upload(request)
+    disease, confidence = await run_in_threadpool(predict_disease_upload, upload)
+    log.info("Disease predicted", extra={"disease": disease, "confidence": round(confidence, 3)})
+    return {
+        "predicted_disease": disease,
+        "confidence": f"{confidence:.2f}"
+    }
+
+
+@app.get("/sih/health")
+def health():
+    # 503 until the model has loaded, so load balancers hold traffic back
+    status = models.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content={
+            "status": "ok" if status["ready"] else status["state"],
+            "models": status,
+            "disease_cache": disease_cache.stats()
+        }
+    )
+
+
 @app.get("/")
 def root():
     return {
-        "message": "API is running. POST to /sih/disease_base64 with a JSON payload.",
+        "message": "API is running. POST to /sih/disease_base64 with a JSON payload, or an image body or multipart upload to /sih/disease.",
         "docs_url": "/docs"
     }
 
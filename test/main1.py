@@ -1,12 +1,43 @@
 import numpy as np
-import io
-from keras.preprocessing import image
-from keras.models import load_model 
+import os
+import sys
 from PIL import Image
-from huggingface_hub import hf_hub_download
 
-model_path = hf_hub_download(repo_id="calvinCandieC137/Plant_Disease", filename="plant_disease_model_finetuned.h5")
-model = load_model(model_path, compile=False)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "modules"))
+from image_preprocessing import BatchPreprocessor
+from result_cache import PredictionCache, model_file_version
+from inference_backends import load_classifier
+from model_registry import ModelRegistry, resolve_artifact
+from instrumentation import stage
+
+# DISEASE_BACKEND=keras runs the .h5 model, DISEASE_BACKEND=onnx runs the export_onnx.py output
+DISEASE_BACKEND = os.getenv("DISEASE_BACKEND", "keras")
+
+# Predictions for recently seen images; the loaded model file's version is part of every key
+disease_cache = PredictionCache(
+    None,
+    max_size=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+    mode=os.getenv("RESULT_CACHE_MODE", "exact"),
+    name="disease"
+)
+
+def load_disease_model():
+    # From MODEL_DIR (or DISEASE_MODEL_PATH / DISEASE_ONNX_PATH); the .h5 is downloaded once if missing
+    if DISEASE_BACKEND == "onnx":
+        model_path = resolve_artifact("plant_disease.onnx", env_var="DISEASE_ONNX_PATH")
+    else:
+        model_path = resolve_artifact(
+            "plant_disease_model_finetuned.h5",
+            env_var="DISEASE_MODEL_PATH",
+            hf_repo_id="calvinCandieC137/Plant_Disease"
+        )
+    classifier = load_classifier(DISEASE_BACKEND, model_path)
+    disease_cache.set_model_version(model_file_version(model_path))
+    return classifier
+
+# Loaded in the background when the API starts, or on first use
+models = ModelRegistry()
+models.register("disease", load_disease_model)
 
 CLASS_NAMES = [
     "Apple__Apple_scab", "Apple_Black_rot", "Apple_Cedar_apple_rust", "Apple__healthy",
@@ -26,24 +57,42 @@ CLASS_NAMES = [
 
 TARGET_SIZE = (128, 128)
 
-def preprocess_image(image_bytes: bytes, target_size: tuple) -> np.ndarray:
+preprocessor = BatchPreprocessor(TARGET_SIZE, workers=int(os.getenv("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1)))))
+
+def preprocess_image(image_bytes: bytes, target_size: tuple = TARGET_SIZE) -> np.ndarray:
+
+    return preprocess_images([image_bytes], target_size)
+
+def preprocess_pil_image(img: Image.Image, target_size: tuple = TARGET_SIZE) -> np.ndarray:
 
-    img = Image.open(io.BytesIO(image_bytes))
-    if img.mode != "RGB":
-        img = img.convert("RGB")
-    img = img.resize(target_size)
-    img_array = image.img_to_array(img)
-    img_array = img_array / 255.0  
-    img_array = np.expand_dims(img_array, axis=0)  
-    return img_array
+    return preprocess_images([img], target_size)
+
+@stage("preprocess")
+def preprocess_images(images: list, target_size: tuple = TARGET_SIZE) -> np.ndarray:
+
+    # float32 NHWC batch scaled to [0, 1], written into a reused buffer
+    if tuple(target_size) != preprocessor.target_size:
+        return BatchPreprocessor(target_size).preprocess(images)
+    return preprocessor.preprocess(images)
 
 def predict_disease(image_bytes: bytes) -> tuple:
 
-    if model is None:
-        raise RuntimeError("Model is not loaded. Cannot perform prediction.")
-        
-    img_array = preprocess_image(image_bytes, TARGET_SIZE)
-    predictions = model.predict(img_array)
+    models.get("disease")  # the cache key needs the loaded model's version
+    # Base64 images are decoded in full; draft-decoded uploads have keys of their own
+    key = disease_cache.key(image_bytes) + ("exact",)
+    return disease_cache.get_or_compute(
+        key, lambda: predict_disease_array(preprocess_image(image_bytes, TARGET_SIZE))
+    )
+
+def predict_disease_image(img: Image.Image) -> tuple:
+
+    return predict_disease_array(preprocess_pil_image(img, TARGET_SIZE))
+
+def predict_disease_array(img_array: np.ndarray) -> tuple:
+
+    model = models.get("disease")
+    with stage("inference"):
+        predictions = model.predict(img_array)
     
     predicted_class_index = np.argmax(predictions, axis=1)[0]
     confidence = float(np.max(predictions))
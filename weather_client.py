@@ -0,0 +1,233 @@
+# Asynchronous, pooled and cached weather client for the crop recommendation API
+
+import asyncio
+import logging
+import math
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import httpx
+
+log = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Skips calls to a failing upstream.
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call is skipped for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the breaker, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class WeatherClient:
+    """
+    Fetches current weather from weatherapi.com through one shared, pooled
+    httpx.AsyncClient.
+
+    Results are cached for cache_ttl seconds per quantized location cell, and
+    concurrent requests for the same cell share one in-flight fetch.
+    """
+
+    def __init__(self, api_key, base_url="https://api.weatherapi.com", timeout=10.0,
+                 resolution=0.05, cache_ttl=600.0, cache_size=10000, max_connections=20,
+                 breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.resolution = resolution
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+
+        self._client = None
+        self._cache = OrderedDict()   # cell -> (expires_at, weather_data)
+        self._inflight = {}           # cell -> asyncio.Task
+
+        # Metrics
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.short_circuited = 0
+        self.failures = 0
+        self.fetches = 0
+        self._latencies = deque(maxlen=1000)
+
+    async def start(self):
+        """Create the shared connection pool (call once at startup)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def cell(self, latitude, longitude):
+        return (
+            math.floor(round(latitude / self.resolution, 9)),
+            math.floor(round(longitude / self.resolution, 9))
+        )
+
+    async def get(self, latitude, longitude):
+        """
+        Weather data for a location, or None if it is unavailable
+        """
+        self.requests += 1
+        cell = self.cell(latitude, longitude)
+
+        # Fresh cache entry
+        entry = self._cache.get(cell)
+        if entry is not None:
+            expires_at, weather_data = entry
+            if expires_at > time.monotonic():
+                self._cache.move_to_end(cell)
+                self.hits += 1
+                return self._for_location(weather_data, latitude, longitude)
+            del self._cache[cell]
+        self.misses += 1
+
+        # Share a fetch that is already running for this cell
+        task = self._inflight.get(cell)
+        if task is not None:
+            self.coalesced += 1
+            weather_data = await asyncio.shield(task)
+            return self._for_location(weather_data, latitude, longitude)
+
+        # Skip the call while the provider keeps failing
+        if not self.breaker.allow():
+            self.short_circuited += 1
+            return None
+
+        # The task removes itself from _inflight when it finishes; shielding it
+        # keeps a cancelled caller from cancelling the fetch for everyone else
+        task = asyncio.ensure_future(self._fetch(cell, latitude, longitude))
+        self._inflight[cell] = task
+        weather_data = await asyncio.shield(task)
+        return self._for_location(weather_data, latitude, longitude)
+
+    async def _fetch(self, cell, latitude, longitude):
+        if self._client is None:
+            await self.start()
+
+        self.fetches += 1
+        start = time.perf_counter()
+        try:
+            response = await self._client.get(
+                "/v1/current.json",
+                params={"key": self.api_key, "q": f"{latitude},{longitude}"}
+            )
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(
+                    f"Weather API returned {response.status_code}",
+                    request=response.request, response=response
+                )
+            data = response.json()
+
+            # Extract relevant weather information
+            weather_data = {
+                "lat": latitude,
+                "lon": longitude,
+                "temperature": data["current"]["temp_c"],
+                "humidity": data["current"]["humidity"],
+                "description": data["current"]["condition"]["text"],
+                "wind_speed": data["current"]["wind_kph"] / 3.6,  # Convert to m/s
+                "rainfall": data["current"]["precip_mm"],
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            log.warning("Error fetching weather data", extra={"error": str(e)})
+            return None
+        finally:
+            self._latencies.append(time.perf_counter() - start)
+            self._inflight.pop(cell, None)
+
+        self.breaker.record_success()
+        self._cache[cell] = (time.monotonic() + self.cache_ttl, weather_data)
+        self._cache.move_to_end(cell)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return weather_data
+
+    @staticmethod
+    def _for_location(weather_data, latitude, longitude):
+        # A cached entry may have been fetched for another point in the same cell
+        if weather_data is None:
+            return None
+        return dict(weather_data, lat=latitude, lon=longitude)
+
+    def metrics(self):
+        """Latency and hit-rate metrics reported on /health"""
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            "requests": self.requests,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "hit_rate": self.hits / self.requests if self.requests else 0.0,
+            "coalesced": self.coalesced,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+            "circuit_state": self.breaker.state,
+            "cache_size": len(self._cache),
+            "fetch_latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else None
+            }
+        }